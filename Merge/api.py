@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+HTTP API for blog generation, research PDF conversion and content checks.
+
+Work runs as durable background jobs (see ``jobs``); every endpoint
+returns straight away with a job id. Progress is streamed as server-sent
+events and finished artifacts are downloaded by name. The ``X-User-Id``
+header names the user for fair scheduling.
+
+    POST /jobs/blog                    JSON blog inputs
+    POST /jobs/pdf                     multipart upload: file, translate, formats
+    POST /jobs/checks                  JSON {content, checks}
+    GET  /jobs/{id}                    status, result and artifact names
+    GET  /jobs/{id}/events             server-sent progress events
+    GET  /jobs/{id}/artifacts/{name}   download an artifact
+
+Usage:
+    python Merge/api.py --host 0.0.0.0 --port 8000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from contextlib import asynccontextmanager
+from typing import List, Literal
+
+try:
+    from deploy_helper import setup_python_path
+    setup_python_path()
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from batch import DEFAULT_INPUTS
+from blog_pipeline import MAX_RESEARCH_WIDTH
+from jobs import FINAL_STATUSES, ensure_workers, get_job_store
+
+load_dotenv()
+
+API_VERSION = "1.0.0"
+MAX_UPLOAD_BYTES = int(float(os.getenv('API_MAX_UPLOAD_MB', '50')) * 1024 * 1024)
+EVENT_KEEPALIVE_SECONDS = 15.0
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Workers can also run on their own with `python Merge/jobs.py`
+    pool = ensure_workers()
+    yield
+    if pool is not None:
+        pool.stop()
+
+
+app = FastAPI(title="AI Content Tools API", version=API_VERSION, lifespan=lifespan)
+
+Format = Literal['html', 'pdf']
+
+
+class BlogJobRequest(BaseModel):
+    topic: str = Field(min_length=1, max_length=2000)
+    audience: str = Field(DEFAULT_INPUTS['audience'], min_length=1, max_length=100)
+    tone: str = Field(DEFAULT_INPUTS['tone'], min_length=1, max_length=100)
+    industry: str = Field(DEFAULT_INPUTS['industry'], min_length=1, max_length=100)
+    blog_type: str = Field(DEFAULT_INPUTS['blog_type'], min_length=1, max_length=100)
+    content_goal: str = Field(DEFAULT_INPUTS['content_goal'], min_length=1, max_length=100)
+    word_limit: int = Field(DEFAULT_INPUTS['word_limit'], ge=100, le=5000)
+    research_width: int = Field(1, ge=1, le=MAX_RESEARCH_WIDTH)
+    fit_length: bool = False
+    use_cache: bool = True
+    formats: List[Format] = Field(default_factory=lambda: ['html', 'pdf'], min_length=1)
+    # 'batch' jobs (bulk rows) give way to interactive ones for Gemini capacity
+    priority: Literal['interactive', 'batch'] = 'interactive'
+    agents: Literal['merge', 'root'] = 'merge'
+
+
+class ChecksJobRequest(BaseModel):
+    content: str = Field(min_length=1, max_length=200_000)
+    checks: List[Literal['analysis', 'plagiarism']] = Field(
+        default_factory=lambda: ['analysis', 'plagiarism'], min_length=1
+    )
+
+
+def _get_job(job_id):
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+
+def _owner(request):
+    return request.headers.get('x-user-id') or (request.client.host if request.client else 'anonymous')
+
+
+@app.get("/health")
+def health():
+    return {'status': 'ok', 'version': API_VERSION}
+
+
+@app.post("/jobs/blog", status_code=202)
+def create_blog_job(body: BlogJobRequest, request: Request):
+    params = body.model_dump()
+    params['topic'] = params['topic'].strip()
+    params['formats'] = list(dict.fromkeys(params['formats']))
+    return get_job_store().submit('blog', params, owner=_owner(request))
+
+
+@app.post("/jobs/pdf", status_code=202)
+async def create_pdf_job(
+    request: Request,
+    file: UploadFile = File(...),
+    translate: bool = Form(True),
+    formats: str = Form('pdf,html'),
+):
+    requested = [fmt.strip() for fmt in formats.split(',') if fmt.strip()]
+    if not requested or any(fmt not in ('pdf', 'html') for fmt in requested):
+        raise HTTPException(status_code=422, detail="formats must be a comma-separated list of 'pdf' and 'html'")
+    data = await file.read(MAX_UPLOAD_BYTES + 1)
+    if len(data) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"PDF is larger than {MAX_UPLOAD_BYTES} bytes")
+    if not data.startswith(b'%PDF'):
+        raise HTTPException(status_code=422, detail="The uploaded file is not a PDF")
+    params = {
+        'filename': os.path.basename(file.filename or 'document.pdf'),
+        'translate': translate,
+        'formats': list(dict.fromkeys(requested)),
+    }
+    return get_job_store().submit('pdf', params, data, owner=_owner(request))
+
+
+@app.post("/jobs/checks", status_code=202)
+def create_checks_job(body: ChecksJobRequest, request: Request):
+    params = body.model_dump()
+    params['checks'] = list(dict.fromkeys(params['checks']))
+    return get_job_store().submit('checks', params, owner=_owner(request))
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    return _get_job(job_id)
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str, request: Request, after: int = 0):
+    """
+    Stream the job's progress as server-sent events, ending after its final status.
+
+    Reconnecting clients resume from ``Last-Event-ID`` (or ``?after=``).
+    """
+    _get_job(job_id)
+    last_seen = request.headers.get('last-event-id')
+    if last_seen and last_seen.isdigit():
+        after = max(after, int(last_seen))
+
+    async def stream():
+        nonlocal after
+        store = get_job_store()
+        while not await request.is_disconnected():
+            try:
+                events = await asyncio.to_thread(store.wait_events, job_id, after, EVENT_KEEPALIVE_SECONDS)
+            except KeyError:
+                return
+            if not events:
+                if store.get(job_id)['status'] in FINAL_STATUSES:
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            for event in events:
+                after = event['seq']
+                yield f"id: {event['seq']}\nevent: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+                if event['type'] == 'status' and event['status'] in FINAL_STATUSES:
+                    return
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={'Cache-Control': 'no-cache'})
+
+
+@app.get("/jobs/{job_id}/artifacts")
+def list_artifacts(job_id: str):
+    return {'artifacts': _get_job(job_id)['artifacts']}
+
+
+@app.get("/jobs/{job_id}/artifacts/{name}")
+def download_artifact(job_id: str, name: str):
+    job = _get_job(job_id)
+    # Only names listed for the job are served, so no path can escape its directory
+    if name not in job['artifacts']:
+        raise HTTPException(status_code=404, detail=f"No artifact {name} for job {job_id}")
+    return FileResponse(get_job_store().job_dir(job_id) / name, filename=name)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the AI Content Tools HTTP API.")
+    parser.add_argument('--host', default=os.getenv('API_HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('API_PORT', '8000')))
+    args = parser.parse_args(argv)
+    uvicorn.run(app, host=args.host, port=args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -6,16 +6,15 @@ os.environ["CHROMA_DB_IMPL"] = "duckdb"
 os.environ["ANONYMIZED_TELEMETRY"] = "False"
 os.environ["CHROMA_TELEMETRY_ENABLED"] = "False"
 
-import tempfile
 import base64
 from pathlib import Path
-import traceback
 import uuid
 import shutil
-import time
-import chardet
 import io
 import sys
+import functools
+import importlib.util
+from concurrent.futures import as_completed
 
 # Import deployment helper to setup Python path
 try:
@@ -40,83 +39,31 @@ print(f"Python path: {sys.path[:3]}...")
 print(f"Current directory: {current_dir}")
 print(f"Parent directory: {parent_dir}")
 
-from crewai import Crew, Task
-from PyPDF2 import PdfWriter, PdfReader
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
-import google.generativeai as genai
-from dotenv import load_dotenv
-import re
-
-# Import custom modules with error handling and multiple fallback strategies
-try:
-    # Try direct import first
-    from Blog.agents import BlogAgents
-    from whitepaper.main import ResearchConverter
-    from whitepaper.tools import ResearchTools
-    from whitepaper.agents import ResearchAgents
-    from whitepaper.tasks import ResearchTasks
-    from whitepaper.crews import ResearchCrews
-    from whitepaper.exporters import ContentExporters
-    print("✓ All modules imported successfully")
-except ImportError as e:
-    print(f"First import attempt failed: {e}")
+# Only light modules are imported here. crewai, langchain, PyPDF2, reportlab and
+# the Gemini SDK are imported by the page that needs them, the first time it is
+# opened, so the sidebar appears without waiting for them.
+import startup_profile
+from startup_profile import step as startup_step
+
+with startup_step("import dotenv, llm_pool"):
+    from dotenv import load_dotenv
+    from llm_pool import BACKEND_MODE, configure_genai
+
+with startup_step("import module_loader, job_client"):
+    from module_loader import load_modules
+    from job_client import API_URL
+
+def page_modules(page):
+    """
+    Return the Blog/whitepaper classes for a page, importing them on first use.
+
+    Imports are cached for the process; a failed import is retried on the
+    next rerun.
+    """
     try:
-        # Try with explicit path
-        import importlib.util
-        
-        # Import Blog.agents
-        blog_agents_path = os.path.join(current_dir, 'Blog', 'agents.py')
-        spec = importlib.util.spec_from_file_location("BlogAgents", blog_agents_path)
-        blog_agents_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(blog_agents_module)
-        BlogAgents = blog_agents_module.BlogAgents
-        
-        # Import whitepaper modules
-        whitepaper_main_path = os.path.join(current_dir, 'whitepaper', 'main.py')
-        spec = importlib.util.spec_from_file_location("ResearchConverter", whitepaper_main_path)
-        whitepaper_main_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(whitepaper_main_module)
-        ResearchConverter = whitepaper_main_module.ResearchConverter
-        
-        # Import other whitepaper modules
-        whitepaper_tools_path = os.path.join(current_dir, 'whitepaper', 'tools.py')
-        spec = importlib.util.spec_from_file_location("ResearchTools", whitepaper_tools_path)
-        whitepaper_tools_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(whitepaper_tools_module)
-        ResearchTools = whitepaper_tools_module.ResearchTools
-        
-        whitepaper_agents_path = os.path.join(current_dir, 'whitepaper', 'agents.py')
-        spec = importlib.util.spec_from_file_location("ResearchAgents", whitepaper_agents_path)
-        whitepaper_agents_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(whitepaper_agents_module)
-        ResearchAgents = whitepaper_agents_module.ResearchAgents
-        
-        whitepaper_tasks_path = os.path.join(current_dir, 'whitepaper', 'tasks.py')
-        spec = importlib.util.spec_from_file_location("ResearchTasks", whitepaper_tasks_path)
-        whitepaper_tasks_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(whitepaper_tasks_module)
-        ResearchTasks = whitepaper_tasks_module.ResearchTasks
-        
-        whitepaper_crews_path = os.path.join(current_dir, 'whitepaper', 'crews.py')
-        spec = importlib.util.spec_from_file_location("ResearchCrews", whitepaper_crews_path)
-        whitepaper_crews_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(whitepaper_crews_module)
-        ResearchCrews = whitepaper_crews_module.ResearchCrews
-        
-        whitepaper_exporters_path = os.path.join(current_dir, 'whitepaper', 'exporters.py')
-        spec = importlib.util.spec_from_file_location("ContentExporters", whitepaper_exporters_path)
-        whitepaper_exporters_module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(whitepaper_exporters_module)
-        ContentExporters = whitepaper_exporters_module.ContentExporters
-        
-        print("✓ All modules imported successfully using fallback method")
-    except Exception as e2:
+        return load_modules(page)
+    except Exception as e:
         st.error(f"Failed to import required modules: {str(e)}")
-        st.error(f"Fallback import also failed: {str(e2)}")
         st.error("Please ensure all required packages are installed and the module structure is correct.")
         st.error(f"Current directory: {current_dir}")
         st.error(f"Python path: {sys.path[:3]}...")
@@ -125,54 +72,99 @@ except ImportError as e:
 # Load environment variables
 load_dotenv()
 
-# Configure Gemini API
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if GOOGLE_API_KEY:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-
 # App version
 APP_VERSION = "1.0.0"
 
 # Helper functions
-def clean_markdown(text):
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\*(.*?)\*', r'\1', text)
-    text = re.sub(r'[#*_~`]', '', text)
-    return text
-
-def get_binary_file_downloader_html(bin_file, file_label='File'):
-    with open(bin_file, 'rb') as f:
-        data = f.read()
-    bin_str = base64.b64encode(data).decode()
-    href = f'<a href="data:application/octet-stream;base64,{bin_str}" download="{os.path.basename(bin_file)}">Download {file_label}</a>'
-    return href
+DOWNLOAD_MIME_TYPES = {'.pdf': 'application/pdf', '.html': 'text/html'}
+
+def file_download_button(file_path, file_label='File'):
+    """
+    Offer a file through st.download_button.
+
+    Streamlit serves the bytes from its media endpoint when the button is
+    clicked, so reruns only send a URL to the browser, not the file itself.
+    """
+    file_path = Path(file_path)
+    st.download_button(
+        label=f"Download {file_label}",
+        data=file_path.read_bytes(),
+        file_name=file_path.name,
+        mime=DOWNLOAD_MIME_TYPES.get(file_path.suffix.lower(), 'application/octet-stream'),
+        key=f"download-{file_path}"
+    )
+
+def _step_preview_page(key, delta, total):
+    st.session_state[key] = min(max(1, st.session_state.get(key, 1) + delta), total)
 
 def display_pdf(pdf_path):
-    with open(pdf_path, "rb") as f:
-        base64_pdf = base64.b64encode(f.read()).decode('utf-8')
-    pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}" width="100%" height="600" type="application/pdf"></iframe>'
-    st.markdown(pdf_display, unsafe_allow_html=True)
+    """Preview one page of the PDF at a time, with page navigation."""
+    import pdf_preview
+
+    total = pdf_preview.page_count(pdf_path)
+    if total == 0:
+        st.warning("The PDF has no pages.")
+        return
+
+    page_key = f"preview-page-{pdf_path}"
+    if st.session_state.get(page_key, 1) > total:
+        st.session_state[page_key] = 1
+
+    modes = ["Page", "Text"]
+    if pdf_preview.image_preview_available():
+        modes.insert(0, "Image")
+
+    col1, col2, col3, col4 = st.columns([1, 2, 1, 3])
+    with col1:
+        st.button("◀ Prev", key=f"{page_key}-prev", on_click=_step_preview_page, args=(page_key, -1, total))
+    with col2:
+        page_number = st.number_input(
+            f"Page (of {total})", min_value=1, max_value=total, key=page_key, label_visibility="collapsed"
+        )
+    with col3:
+        st.button("Next ▶", key=f"{page_key}-next", on_click=_step_preview_page, args=(page_key, 1, total))
+    with col4:
+        mode = st.radio("Preview as", modes, horizontal=True, key=f"{page_key}-mode", label_visibility="collapsed")
+    st.caption(f"Page {page_number} of {total}")
+
+    if mode == "Image":
+        st.image(pdf_preview.get_page(pdf_path, page_number, 'png'), use_column_width=True)
+    elif mode == "Text":
+        st.text_area("Page text", pdf_preview.get_page(pdf_path, page_number, 'text'), height=600)
+    else:
+        # Only the current page is embedded, not the whole document
+        page_pdf = base64.b64encode(pdf_preview.get_page(pdf_path, page_number, 'pdf')).decode('utf-8')
+        pdf_display = f'<iframe src="data:application/pdf;base64,{page_pdf}" width="100%" height="600" type="application/pdf"></iframe>'
+        st.markdown(pdf_display, unsafe_allow_html=True)
 
 def display_html(html_path):
     with open(html_path, 'r', encoding='utf-8') as f:
         html_content = f.read()
     st.components.v1.html(html_content, height=600, scrolling=True)
 
+REQUIRED_MODULES = ('crewai', 'crewai_tools', 'langchain', 'langchain_google_genai', 'fpdf', 'markdown')
+
+@functools.lru_cache(maxsize=None)
+def missing_dependencies():
+    """Required packages that are not installed, found without importing them; checked once per process."""
+    with startup_step("dependency check"):
+        return tuple(name for name in REQUIRED_MODULES if importlib.util.find_spec(name) is None)
+
 def check_dependencies():
-    try:
-        import crewai
-        import crewai_tools
-        import langchain
-        import langchain_google_genai
-        import fpdf
-        import markdown
-        return True
-    except ImportError as e:
-        st.error(f"Missing dependency: {str(e)}")
+    missing = missing_dependencies()
+    if missing:
+        st.error(f"Missing dependency: {', '.join(missing)}")
         st.info("Please install all dependencies with: pip install -r requirements.txt")
         return False
+    return True
+
+def show_startup_profile():
+    """List the timed startup steps of this server process in the sidebar."""
+    with st.sidebar.expander("Startup profile"):
+        st.table([
+            {'Step': label, 'Started at (s)': f"{started:.2f}", 'Took (ms)': f"{took * 1000:.0f}"}
+            for label, started, took in startup_profile.steps()
+        ])
 
 def ensure_export_dir():
     export_dir = Path("exports")
@@ -180,23 +172,6 @@ def ensure_export_dir():
         export_dir.mkdir(parents=True, exist_ok=True)
     return export_dir
 
-def detect_encoding(text_bytes):
-    """Detect the encoding of the given bytes."""
-    result = chardet.detect(text_bytes)
-    return result
-
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF file."""
-    try:
-        pdf_reader = PdfReader(pdf_file)
-        text = ""
-        for page in pdf_reader.pages:
-            text += page.extract_text()
-        return text.encode('utf-8')  # Convert to bytes for encoding detection
-    except Exception as e:
-        st.error(f"Error reading PDF: {str(e)}")
-        return None
-
 def show_encoding_details(text_bytes, encoding_result):
     """Show detailed information about the encoding detection and decoding process."""
     st.subheader("Encoding Detection Details")
@@ -238,10 +213,265 @@ def show_encoding_details(text_bytes, encoding_result):
     
     return patterns
 
+CHECK_LABELS = {'analysis': "Content analysis", 'plagiarism': "Plagiarism check"}
+
+def show_content_analysis(slot):
+    """Render the content analysis report into the given placeholder, if available."""
+    if st.session_state.content_analysis:
+        with slot.container():
+            st.subheader("Content Analysis Report")
+            st.write(st.session_state.content_analysis)
+
+def show_plagiarism_analysis(slot):
+    """Render the plagiarism analysis into the given placeholder, if available."""
+    if not st.session_state.plagiarism_score:
+        return
+    with slot.container():
+        st.subheader("Plagiarism Analysis")
+        
+        # Create tabs for different aspects of the analysis
+        tab1, tab2 = st.tabs(["Score Summary", "Detailed Analysis"])
+        
+        with tab1:
+            # Extract and display the overall score
+            score_text = st.session_state.plagiarism_score
+            if "Score:" in score_text:
+                score = score_text.split("Score:")[1].split("\n")[0].strip()
+                st.metric("Originality Score", score)
+            
+            # Display score interpretation
+            st.write("Score Interpretation:")
+            st.write("""
+            - 90-100: Highly original
+            - 70-89: Mostly original
+            - 50-69: Moderately original
+            - 30-49: Needs improvement
+            - 0-29: Significant concerns
+            """)
+        
+        with tab2:
+            # Display the detailed analysis
+            st.write(st.session_state.plagiarism_score)
+
+def show_corpus_overlap():
+    """Show how much of the blog overlaps with previously generated content."""
+    overlap = st.session_state.get('corpus_overlap')
+    if overlap is None:
+        return
+    st.subheader("Corpus Overlap")
+    st.metric(
+        "Local Originality Score", f"{overlap['score']}/100",
+        help="Share of the post not found in earlier blogs or exported documents."
+    )
+    if not overlap['matches']:
+        st.write("No overlapping passages found in previously generated content.")
+    for match in overlap['matches']:
+        with st.expander(f"{match['title'] or match['source']} — {match['overlap']:.0%} overlap"):
+            st.caption(match['source'])
+            for passage in match['passages']:
+                st.markdown(f"> {passage}")
+
+def show_stage_usage():
+    """Show the tokens each pipeline stage sent and received."""
+    from blog_pipeline import STAGE_LABELS
+
+    usage = st.session_state.get('stage_usage')
+    if not usage:
+        return
+    with st.expander("Token usage by stage"):
+        if st.session_state.get('trace_run_id'):
+            st.caption(f"Trace run id: {st.session_state.trace_run_id}")
+        st.table([
+            {
+                'Stage': STAGE_LABELS[entry['stage']] + (f": {entry['question']}" if entry.get('question') else "")
+                         + (" (cached)" if entry['cached'] else ""),
+                'Context tokens': f"{entry['context_tokens_before']} → {entry['context_tokens']}",
+                'Tokens in': entry['tokens_in'],
+                'Tokens out': entry['tokens_out'],
+            }
+            for entry in usage
+        ])
+
+def show_section_editor(use_stage_cache):
+    """Rewrite one section of the current post without rerunning the whole pipeline."""
+    from llm_pool import INTERACTIVE_LEASE_TIMEOUT, PoolTimeout, get_agent_pool
+    from sections import count_words, draft_content, find_section, regenerate_section
+    from tracing import start_run
+
+    BlogAgents = page_modules('blog')['BlogAgents']
+    draft = st.session_state.get('blog_draft')
+    if not draft or not draft['sections']:
+        return
+    with st.expander("Edit a section"):
+        titles = {
+            section.key: f"{section.title} ({count_words(section.text)} words)" for section in draft['sections']
+        }
+        key = st.selectbox("Section", list(titles), format_func=titles.get, key="edit_section_key")
+        action = st.radio(
+            "Change",
+            ['regenerate', 'technical', 'shorten', 'extend', 'custom'],
+            format_func={
+                'regenerate': "Regenerate",
+                'technical': "Make more technical",
+                'shorten': "Shorten",
+                'extend': "Lengthen",
+                'custom': "Custom instruction",
+            }.get,
+            horizontal=True,
+            key="edit_section_action"
+        )
+        words = None
+        instruction = None
+        if action in ('shorten', 'extend'):
+            _, section = find_section(draft, key)
+            current = count_words(section.text)
+            default = current // 2 if action == 'shorten' else current * 3 // 2
+            words = st.number_input(
+                f"Target words (now {current})", min_value=20, value=max(20, default), step=10
+            )
+        elif action == 'custom':
+            instruction = st.text_input("Instruction", placeholder="e.g. Add a concrete example from retail")
+
+        if st.button("Rewrite section"):
+            try:
+                with st.spinner(f"Rewriting {titles[key]}..."), \
+                        start_run('rewrite_section', section=key, action=action), \
+                        get_agent_pool(BlogAgents).lease(INTERACTIVE_LEASE_TIMEOUT) as blog_agents:
+                    draft = regenerate_section(
+                        draft, key, blog_agents, action=action, words=words,
+                        instruction=instruction, use_cache=use_stage_cache
+                    )
+            except PoolTimeout:
+                st.warning("All writers are busy right now. Please try again in a moment.")
+                return
+            except ValueError as e:
+                st.error(str(e))
+                return
+            st.session_state.blog_draft = draft
+            st.session_state.blog_content = draft_content(draft)
+            st.session_state.content_analysis = None
+            st.session_state.plagiarism_score = None
+            st.session_state.check_jobs = None
+            st.rerun()
+
+def session_owner():
+    """
+    Id of this browser's user, for fair scheduling of their jobs.
+
+    It is kept in the URL, so it survives refreshes and reconnects.
+    """
+    owner = st.query_params.get('user')
+    if not owner:
+        owner = uuid.uuid4().hex[:12]
+        st.query_params['user'] = owner
+    return owner
+
+def follow_blog_job(job_id, stream_output):
+    """
+    Show a blog job's progress and, once it is done, store its post.
+
+    Events are replayed from the start, so a page refreshed mid-run catches
+    up with the job. Returns ``(done, streamed)``.
+    """
+    from batch import INPUT_FIELDS
+    from blog_pipeline import STAGE_LABELS
+    from job_client import get_job, iter_events
+    from sections import count_stream_words, create_draft
+
+    job = get_job(job_id)
+    params = job['params']
+    status = st.status(
+        "Waiting for a worker..." if job['status'] == 'queued' else "Researching topic...",
+        expanded=stream_output
+    )
+    cached_stages = []
+    events = iter_events(job_id)
+    requeued = False
+
+    def chunks():
+        # Ends early when the job is requeued, so the retry's post replaces the dead attempt's
+        nonlocal requeued
+        for event in events:
+            if event['type'] == 'status' and event['status'] == 'requeued':
+                status.update(label="The worker stopped, retrying...")
+                cached_stages.clear()
+                requeued = True
+                return
+            if event['type'] == 'status' and event['status'] == 'running':
+                status.update(label="Researching topic...")
+            elif event['type'] == 'stage' and event['stage'] in STAGE_LABELS:
+                status.write(f"✓ {STAGE_LABELS[event['stage']]}" + (" (cached)" if event['cached'] else ""))
+                if event['cached']:
+                    cached_stages.append(event['stage'])
+                if event['stage'] == 'research':
+                    status.update(label="Analyzing research...")
+                elif event['stage'] == 'nlp':
+                    status.update(label="Writing blog post...")
+            elif event['type'] == 'stage' and event['stage'] == 'fit_length':
+                status.update(label="Fitting the post to the word limit...")
+            elif event['type'] == 'chunk':
+                yield event['text']
+
+    def on_words(words):
+        status.update(label=f"Writing blog post... {words}/{params['word_limit']} words")
+
+    if stream_output:
+        st.subheader("Generated Blog Post")
+        stream_slot = st.empty()
+    while True:
+        requeued = False
+        if stream_output:
+            with stream_slot.container():
+                st.write_stream(count_stream_words(chunks(), on_words))
+        else:
+            for _ in chunks():
+                pass
+        if not requeued:
+            break
+
+    job = get_job(job_id)
+    if job['status'] != 'done':
+        status.update(label="Blog generation failed", state="error")
+        st.error(f"Blog generation failed: {job['error']}")
+        return False, False
+    status.update(label="Blog post generated", state="complete", expanded=False)
+
+    result = job['result']
+    inputs = {field: params[field] for field in INPUT_FIELDS}
+    st.session_state.blog_content = result['content']
+    st.session_state.blog_draft = create_draft(
+        result['content'], inputs, params['research_width'], result.get('writer_context')
+    )
+    st.session_state.stage_usage = result['usage']
+    # The job compared the post with the corpus before adding it
+    st.session_state.corpus_overlap = result['corpus_overlap']
+    st.session_state.trace_run_id = job['run_id']
+    st.session_state.content_analysis = None
+    st.session_state.plagiarism_score = None
+    st.session_state.check_jobs = None
+
+    streamed = stream_output
+    if cached_stages and not stream_output:
+        st.caption(f"Reused cached output for: {', '.join(cached_stages)}")
+    if result['length_changes']:
+        if streamed:
+            # Show the resized post in place of the streamed one
+            stream_slot.empty()
+            streamed = False
+        st.caption("Resized to fit the word limit: " + ", ".join(
+            f"{c['key']} ({c['before']} → {c['after']} words)" for c in result['length_changes']
+        ))
+    return True, streamed
+
 def blog_writer_page():
     st.title("AI Blog Writer")
     st.write("Generate high-quality blog posts using AI agents")
 
+    with startup_step("import AI Blog Writer"):
+        from blog_pipeline import MAX_RESEARCH_WIDTH
+        from blog_export import render_blog
+        import job_client
+
     # Initialize session state for blog
     if 'blog_content' not in st.session_state:
         st.session_state.blog_content = None
@@ -293,417 +523,303 @@ def blog_writer_page():
             help="Set the desired word count for the generated blog post."
         )
 
+    use_stage_cache = st.checkbox(
+        "Reuse cached research",
+        value=True,
+        help="Skip the research and NLP agents when their inputs have not changed since an earlier run."
+    )
+    stream_output = st.checkbox(
+        "Stream output",
+        value=True,
+        help="Show stage progress and display the blog post as it is written."
+    )
+    fit_length = st.checkbox(
+        "Fit to word limit",
+        value=True,
+        help="After generation, trim or extend only the sections that put the post off its word limit."
+    )
+    research_width = st.slider(
+        "Research breadth",
+        min_value=1,
+        max_value=MAX_RESEARCH_WIDTH,
+        value=1,
+        help="Split the topic into this many sub-questions and research them in parallel. 1 runs a single research pass."
+    )
+    auto_checks = st.checkbox(
+        "Analyze and check plagiarism automatically",
+        value=False,
+        help="Start both checks in the background as soon as the blog post is generated."
+    )
+
+    streamed = False
     if st.button("Generate Blog"):
         if topic:
-            with st.spinner("Generating your blog post..."):
-                # Initialize agents
-                blog_agents = BlogAgents()
-                research_agent = blog_agents.create_research_agent()
-                nlp_agent = blog_agents.create_nlp_agent()
-                writer_agent = blog_agents.create_writer_agent()
-
-                # Create tasks
-                research_task = Task(
-                    description=f"""Research and gather information about: {topic}
-                    Target Audience: {audience}
-                    Industry/Domain: {industry}
-                    Blog Type: {blog_type}
-                    Content Goal: {content_goal}""",
-                    agent=research_agent,
-                    expected_output="A comprehensive research summary with key points, statistics, and relevant information about the topic."
-                )
-
-                nlp_task = Task(
-                    description=f"""Process and analyze the gathered information using NLP techniques.
-                    Consider the following parameters:
-                    - Target Audience: {audience}
-                    - Writing Tone: {tone}
-                    - Industry/Domain: {industry}
-                    - Blog Type: {blog_type}
-                    - Content Goal: {content_goal}""",
-                    agent=nlp_agent,
-                    expected_output="An analyzed and structured outline with key points organized for blog writing, incorporating NLP insights."
-                )
-
-                writing_task = Task(
-                    description=f"""Write an engaging blog post based on the processed information.
-                    Follow these guidelines:
-                    - Target Audience: {audience}
-                    - Writing Tone: {tone}
-                    - Industry/Domain: {industry}
-                    - Blog Type: {blog_type}
-                    - Content Goal: {content_goal}
-                    - Word Limit: {word_limit} words (strictly adhere to this range)
-                    Ensure the content is well-structured and meets the specified requirements.""",
-                    agent=writer_agent,
-                    expected_output="A complete, well-structured blog post that meets all specified requirements and guidelines."
-                )
-
-                # Create and run the crew
-                crew = Crew(
-                    agents=[research_agent, nlp_agent, writer_agent],
-                    tasks=[research_task, nlp_task, writing_task],
-                    verbose=True
-                )
-
-                result = crew.kickoff()
-                st.session_state.blog_content = result
-
+            inputs = {
+                'topic': topic,
+                'audience': audience,
+                'tone': tone,
+                'industry': industry,
+                'blog_type': blog_type,
+                'content_goal': content_goal,
+                'word_limit': word_limit,
+            }
+            job = job_client.submit_blog(
+                inputs, owner=session_owner(), use_cache=use_stage_cache,
+                research_width=research_width, fit_length=fit_length
+            )
+            # The job id lives in the URL, so a refresh follows the same job instead of starting over
+            st.query_params['blog_job'] = job['id']
         else:
             st.error("Please enter a topic to generate a blog post.")
 
+    job_id = st.query_params.get('blog_job')
+    if job_id:
+        try:
+            done, streamed = follow_blog_job(job_id, stream_output)
+        except job_client.ApiError as e:
+            st.error(f"Blog generation failed: {str(e)}")
+            done = False
+        del st.query_params['blog_job']
+        if done and auto_checks:
+            st.session_state.check_jobs = job_client.start_checks(
+                st.session_state.blog_content, owner=session_owner()
+            )
+
     # Display results
     if st.session_state.blog_content:
-        st.subheader("Generated Blog Post")
-        st.write(st.session_state.blog_content)
-
-        # Clean markdown from content
-        cleaned_content = clean_markdown(st.session_state.blog_content)
-
-        # Generate HTML with minimal styling
-        html_template = '<html><head></head><body><h1>{0}</h1><div>{1}</div></body></html>'
+        if not streamed:
+            st.subheader("Generated Blog Post")
+            st.write(st.session_state.blog_content)
+
+        # Rendered bytes are cached by content hash, so reruns skip the PDF build
+        html_bytes = render_blog(topic, st.session_state.blog_content, 'html')
+        pdf_bytes = render_blog(topic, st.session_state.blog_content, 'pdf')
+
+        # Display download buttons
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("Download HTML", data=html_bytes, file_name="blog_post.html", mime="text/html")
+        with col2:
+            st.download_button("Download PDF", data=pdf_bytes, file_name="blog_post.pdf", mime="application/pdf")
+
+        show_stage_usage()
+        if not API_URL:
+            show_section_editor(use_stage_cache)
+
+        # Add content analysis and plagiarism check buttons
+        st.subheader("Content Analysis Tools")
+        col1, col2 = st.columns(2)
         
-        html_content = html_template.format(
-            topic,
-            cleaned_content.replace('\n', '<br>')
-        )
-
-        # Create HTML and PDF outputs
-        with tempfile.TemporaryDirectory() as temp_dir:
-            # Save files
-            html_path = os.path.join(temp_dir, "blog_post.html")
-            with open(html_path, 'w') as f:
-                f.write(html_content)
+        with col1:
+            if st.button("Analyze Content"):
+                with st.spinner("Analyzing content..."):
+                    st.session_state.content_analysis = job_client.run_check(
+                        st.session_state.blog_content, 'analysis', owner=session_owner()
+                    )
+
+        with col2:
+            if st.button("Check Plagiarism"):
+                with st.spinner("Checking for plagiarism..."):
+                    st.session_state.plagiarism_score = job_client.run_check(
+                        st.session_state.blog_content, 'plagiarism', owner=session_owner()
+                    )
+
+        analysis_slot = st.empty()
+        plagiarism_slot = st.empty()
+        show_content_analysis(analysis_slot)
+        show_plagiarism_analysis(plagiarism_slot)
+        show_corpus_overlap()
+
+        # Fill in each panel as its background check finishes
+        check_jobs = st.session_state.get('check_jobs')
+        if check_jobs:
+            names = {future: name for name, future in check_jobs.items()}
+            with st.spinner("Running content analysis and plagiarism check..."):
+                for future in as_completed(names):
+                    name = names[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        st.error(f"{CHECK_LABELS[name]} failed: {str(e)}")
+                        continue
+                    if name == 'analysis':
+                        st.session_state.content_analysis = result
+                        show_content_analysis(analysis_slot)
+                    else:
+                        st.session_state.plagiarism_score = result
+                        show_plagiarism_analysis(plagiarism_slot)
+            st.session_state.check_jobs = None
+
+def bulk_blog_page():
+    st.title("Bulk Blog Generator")
+    st.write("Generate many blog posts at once from a CSV or JSONL file")
+
+    with startup_step("import Bulk Blog Generator"):
+        from batch import DEFAULT_INPUTS, parse_rows
+        import job_client
+    st.caption(
+        "Each row needs a `topic`. Optional columns: " + ", ".join(f"`{k}`" for k in DEFAULT_INPUTS)
+        + ". Missing values use the Blog Writer defaults."
+    )
 
-            pdf_path = os.path.join(temp_dir, "blog_post.pdf")
-            
-            # Generate PDF
-            doc = SimpleDocTemplate(
-                pdf_path,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72
-            )
+    uploaded_rows = st.file_uploader("Choose a topics file", type=["csv", "jsonl"])
+    col1, col2 = st.columns(2)
+    with col1:
+        retries = st.slider("Retries per row", min_value=0, max_value=5, value=2)
+    with col2:
+        output_format = st.radio("Output format", ["pdf", "html", "both"], index=2, key="bulk_output_format")
+    use_stage_cache = st.checkbox("Reuse cached research", value=True, key="bulk_use_cache")
 
-            styles = getSampleStyleSheet()
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=24,
-                spaceAfter=30
-            )
-            body_style = ParagraphStyle(
-                'CustomBody',
-                parent=styles['Normal'],
-                fontSize=12,
-                spaceAfter=12
-            )
+    if uploaded_rows is None:
+        return
 
-            content = []
-            content.append(Paragraph(topic, title_style))
-            content.append(Spacer(1, 12))
+    fmt = 'jsonl' if uploaded_rows.name.lower().endswith('.jsonl') else 'csv'
+    try:
+        rows = parse_rows(uploaded_rows.getvalue().decode('utf-8'), fmt)
+    except (ValueError, UnicodeDecodeError) as e:
+        st.error(f"Could not read topics file: {str(e)}")
+        return
+    st.write(f"{len(rows)} rows loaded")
+    st.dataframe(rows, use_container_width=True)
+
+    # Same file name -> same directory, so a rerun resumes finished rows
+    export_dir = ensure_export_dir() / f"batch-{Path(uploaded_rows.name).stem}"
+    st.caption(
+        f"Rows run as background jobs behind interactive requests. Artifacts are written to `{export_dir}` "
+        "as each row finishes; jobs keep running if this page is closed, and starting the same file again "
+        "picks them up."
+    )
 
-            for paragraph in cleaned_content.split('\n\n'):
-                if paragraph.strip():
-                    content.append(Paragraph(paragraph, body_style))
-                    content.append(Spacer(1, 12))
+    if st.button("Start Batch"):
+        formats = ('html', 'pdf') if output_format == "both" else (output_format,)
+        progress_bar = st.progress(0.0)
+        log = st.container()
+        finished = failed = 0
+        for result in job_client.run_batch(rows, export_dir, retries=retries, formats=formats,
+                                           use_cache=use_stage_cache, owner=session_owner()):
+            finished += 1
+            progress_bar.progress(finished / len(rows), text=f"{finished}/{len(rows)} rows finished")
+            if result['status'] == 'failed':
+                failed += 1
+                log.error(f"Row {result['index']} ({result['topic']}) failed after {result['attempts']} attempts: {result['error']}")
+            else:
+                names = ", ".join(Path(p).name for p in result['outputs'])
+                log.write(f"✓ Row {result['index']} ({result['topic']}) {result['status']}: {names}")
+        if failed:
+            st.warning(f"{failed} of {len(rows)} rows failed. Start the batch again to retry them.")
+        else:
+            st.success(f"All {len(rows)} rows generated.")
 
-            doc.build(content)
+def show_document_analysis(translate):
+    """Show the extracted, processed and translated text with its encoding analysis."""
+    from text_processing import detect_encoding
 
-            # Display download buttons
-            col1, col2 = st.columns(2)
+    with st.expander("View Document Analysis"):
+        if translate:
+            col1, col2, col3 = st.columns(3)
             with col1:
-                st.markdown(get_binary_file_downloader_html(html_path, "HTML"), unsafe_allow_html=True)
+                st.subheader("Raw Text")
+                st.text_area("Raw Content Preview", 
+                           st.session_state.raw_text[:1000] + "...", 
+                           height=200)
             with col2:
-                st.markdown(get_binary_file_downloader_html(pdf_path, "PDF"), unsafe_allow_html=True)
-
-            # Add content analysis and plagiarism check buttons
-            st.subheader("Content Analysis Tools")
+                st.subheader("Processed Hindi Text")
+                st.text_area("Processed Content Preview", 
+                           st.session_state.processed_text[:1000] + "...", 
+                           height=200)
+            with col3:
+                st.subheader("Translated Text")
+                st.text_area("English Translation", 
+                           st.session_state.translated_text[:1000] + "...", 
+                           height=200)
+        else:
             col1, col2 = st.columns(2)
-            
             with col1:
-                if st.button("Analyze Content"):
-                    with st.spinner("Analyzing content..."):
-                        prompt = f"""Analyze the following blog content and provide a detailed report including:
-                        1. Content Quality Assessment
-                        2. Key Points and Main Arguments
-                        3. Writing Style Analysis
-                        4. Potential Improvements
-                        5. Originality Assessment (based on common patterns and structures)
-
-                        Blog Content:
-                        {st.session_state.blog_content}
-                        """
-                        
-                        response = model.generate_content(prompt)
-                        st.session_state.content_analysis = response.text
-
+                st.subheader("Raw Text")
+                st.text_area("Raw Content Preview", 
+                           st.session_state.raw_text[:1000] + "...", 
+                           height=200)
             with col2:
-                if st.button("Check Plagiarism"):
-                    with st.spinner("Checking for plagiarism..."):
-                        # Initialize plagiarism checker agent
-                        blog_agents = BlogAgents()
-                        plagiarism_agent = blog_agents.create_plagiarism_checker_agent()
-                        
-                        # Create plagiarism check task
-                        plagiarism_task = Task(
-                            description=f"""Analyze the following content and provide:
-                            1. A plagiarism score (0-100, where 100 is completely original)
-                            2. Detailed analysis of writing patterns
-                            3. Specific areas that might need improvement
-                            4. Recommendations for enhancing originality
-
-                            Content to analyze:
-                            {st.session_state.blog_content}
-                            """,
-                            agent=plagiarism_agent,
-                            expected_output="A detailed plagiarism analysis report with score and recommendations."
-                        )
-                        
-                        # Run the plagiarism check
-                        result = plagiarism_task.execute()
-                        st.session_state.plagiarism_score = result
-
-            # Display content analysis if available
-            if st.session_state.content_analysis:
-                st.subheader("Content Analysis Report")
-                st.write(st.session_state.content_analysis)
-
-            # Display plagiarism score if available
-            if st.session_state.plagiarism_score:
-                st.subheader("Plagiarism Analysis")
-                
-                # Create tabs for different aspects of the analysis
-                tab1, tab2 = st.tabs(["Score Summary", "Detailed Analysis"])
-                
-                with tab1:
-                    # Extract and display the overall score
-                    score_text = st.session_state.plagiarism_score
-                    if "Score:" in score_text:
-                        score = score_text.split("Score:")[1].split("\n")[0].strip()
-                        st.metric("Originality Score", score)
-                    
-                    # Display score interpretation
-                    st.write("Score Interpretation:")
-                    st.write("""
-                    - 90-100: Highly original
-                    - 70-89: Mostly original
-                    - 50-69: Moderately original
-                    - 30-49: Needs improvement
-                    - 0-29: Significant concerns
-                    """)
-                
-                with tab2:
-                    # Display the detailed analysis
-                    st.write(st.session_state.plagiarism_score)
-
-def decode_indic_text(text):
-    """Try multiple encodings to decode text, with special handling for Indic scripts."""
-    # Common patterns to detect and fix
-    replacements = {
-        # Common Devanagari patterns
-        '(R)': 'र',
-        '+/-': 'ल',
-        'É': 'ा',
-        'è': 'ै',
-        'ú': 'र',
-        'ù': 'द',
-        'þ': 'ह',
-        'ò': 'क',
-        'ä': 'े',
-        'æ': 'ो',
-        'Î': 'ि',
-        'õ': 'ट',
-        '¨': 'म',
-        '½': 'ह',
-        'Ê': 'ि',
-        'º': 'स',
-        'Æ': 'ं',
-        'Ç': 'च',
-        'ª': 'य',
-        '¦': 'भ',
-        'P': 'श',
-        'ÿ': 'ह',
-        'Ò': 'ी',
-        'Ó': 'ी',
-        'Ô': 'ी',
-        'Õ': 'ी',
-        'Ö': 'ी',
-        '×': 'ी',
-        'Ø': 'ी',
-        'Ù': 'ी',
-        'Ú': 'ी',
-        'Û': 'ी',
-        'Ü': 'ी',
-        'Ý': 'ी',
-        'Þ': 'ी',
-        'ß': 'ी',
-        'à': 'ी',
-        'á': 'ी',
-        'â': 'ी',
-        'ã': 'ी',
-        'ä': 'े',
-        'å': 'े',
-        'æ': 'ो',
-        'ç': 'ो',
-        'è': 'ै',
-        'é': 'ै',
-        'ê': 'ै',
-        'ë': 'ै',
-        'ì': 'ै',
-        'í': 'ै',
-        'î': 'ै',
-        'ï': 'ै',
-        'ð': 'ै',
-        'ñ': 'ै',
-        'ò': 'क',
-        'ó': 'क',
-        'ô': 'क',
-        'õ': 'ट',
-        'ö': 'ट',
-        '÷': 'ट',
-        'ø': 'ट',
-        'ù': 'द',
-        'ú': 'र',
-        'û': 'र',
-        'ü': 'र',
-        'ý': 'र',
-        'þ': 'ह',
-        'ÿ': 'ह'
-    }
-    
-    # First try to detect if it's Indic text by checking for common patterns
-    indic_markers = ['É', 'ú', 'ù', 'þ', 'ò', 'ä', 'æ', 'Î', 'õ']
-    is_indic = any(marker in text for marker in indic_markers)
-    
-    if is_indic:
-        # Apply character replacements
-        for old, new in replacements.items():
-            text = text.replace(old, new)
+                st.subheader("Processed Text")
+                st.text_area("Processed Content Preview", 
+                           st.session_state.processed_text[:1000] + "...", 
+                           height=200)
         
-        # Try to decode as ISCII if it still looks encoded
-        try:
-            # Convert to bytes if it's a string
-            if isinstance(text, str):
-                text = text.encode('utf-8', errors='ignore')
-            
-            # Try ISCII decoding
-            decoded = text.decode('iscii', errors='replace')
-            if sum(c.isprintable() for c in decoded) / len(decoded) > 0.8:
-                return decoded
-        except:
-            pass
-    
-    # If not Indic or ISCII decoding failed, try other encodings
-    encodings_to_try = [
-        'utf-8',
-        'utf-16',
-        'utf-32',
-        'iso-8859-1',
-        'cp1252',
-        'ascii',
-        'latin1',
-        'latin_1',
-        'iso-8859-15',
-        'windows-1252',
-        'mac_roman'
-    ]
-    
-    # First try chardet
-    if isinstance(text, str):
-        text = text.encode('utf-8', errors='ignore')
-    
-    detected = chardet.detect(text)
-    if detected['confidence'] > 0.8:
-        try:
-            return text.decode(detected['encoding'])
-        except:
-            pass
-    
-    # Try each encoding
-    for encoding in encodings_to_try:
-        try:
-            decoded = text.decode(encoding) if isinstance(text, bytes) else text.encode('utf-8').decode(encoding)
-            if sum(c.isprintable() for c in decoded) / len(decoded) > 0.8:
-                return decoded
-        except:
-            continue
-    
-    # If all fails, use utf-8 with replace
-    return text.decode('utf-8', errors='replace') if isinstance(text, bytes) else text
-
-def normalize_text(text):
-    """Normalize text by removing control characters and normalizing whitespace."""
-    # Remove control characters except newlines and tabs
-    text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
-    
-    # Normalize whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
-    # Fix common encoding artifacts
-    text = text.replace('â€™', "'")
-    text = text.replace('â€œ', '"')
-    text = text.replace('â€', '"')
-    text = text.replace('Â', '')
-    
-    # Fix common Indic text artifacts
-    text = text.replace('degü', 'deg')
-    text = text.replace('(c)', '©')
-    text = re.sub(r'\s+', ' ', text)  # Remove multiple spaces
-    text = re.sub(r'\n\s*\n', '\n\n', text)  # Normalize multiple newlines
-    
-    return text.strip()
+        # Show encoding analysis
+        st.subheader("Encoding Analysis")
+        raw_bytes = st.session_state.raw_text.encode('utf-8', errors='ignore')
+        processed_bytes = st.session_state.processed_text.encode('utf-8', errors='ignore')
+        
+        # Detected from a sample and cached per text, so reruns do not detect again
+        processed_encoding = detect_encoding(processed_bytes)
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("Raw Text Encoding:")
+            st.json(detect_encoding(raw_bytes))
+        with col2:
+            st.write("Processed Text Encoding:")
+            st.json(processed_encoding)
+        
+        show_encoding_details(processed_bytes, processed_encoding)
+
+PDF_STAGE_LABELS = {
+    'extract': "Extracting text...",
+    'translate': "Translating text...",
+    'crew': "Processing document...",
+    'export': "Exporting...",
+}
+
+def follow_pdf_job(job_id):
+    """Follow a PDF job to the end and store its text and artifacts in the session."""
+    from job_client import ApiError, download_artifacts, get_job, wait_for_job
+
+    job = get_job(job_id)
+    status = st.status(
+        "Waiting for a worker..." if job['status'] == 'queued' else "Extracting text...", expanded=True
+    )
+    with status:
+        preview = st.empty()
+
+    def on_event(event):
+        if event['type'] == 'status' and event['status'] == 'requeued':
+            status.update(label="The worker stopped, retrying...")
+            preview.empty()
+        elif event['type'] == 'stage':
+            status.update(label=PDF_STAGE_LABELS.get(event['stage'], event['stage']))
+            if event['stage'] != 'extract':
+                preview.empty()
+        elif event['type'] == 'page':
+            # Pages arrive in order as they are extracted; show the latest one
+            status.update(label=f"Extracting text... page {event['page']}")
+            preview.text(f"Page {event['page']}\n\n{event.get('text', '')}")
 
-def translate_to_english(text, model):
-    """Translate Hindi text to English using Gemini."""
     try:
-        prompt = f"""Translate the following Hindi/Devanagari text to English. 
-Keep technical terms as is, and maintain any numerical values or measurements exactly.
-Preserve formatting and structure of the text.
-
-Text to translate:
-{text}
-
-Please provide a clear and accurate translation while keeping technical terminology intact."""
-
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"Translation error: {str(e)}")
-        return text
+        job = wait_for_job(job_id, on_event)
+    except ApiError as e:
+        status.update(label="Processing failed", state="error")
+        st.error(f"Error during processing: {str(e)}")
+        return
+    status.update(label="Document processed", state="complete", expanded=False)
 
-def create_search_tool(text):
-    """Create a search tool that works with decoded/translated text."""
-    def search_tool(query):
-        """Custom search tool that searches through our processed text."""
-        try:
-            # If query is a dict with "extract all", return full text
-            if isinstance(query, dict) and query.get("extract all"):
-                return text
-            
-            # If it's a string query, do semantic search
-            # For now, return full text as we don't have semantic search implemented
-            return text
-            
-        except Exception as e:
-            print(f"Search error: {str(e)}")
-            return text
-    
-    return search_tool
+    st.session_state.raw_text = job['result']['raw_text']
+    st.session_state.processed_text = job['result']['processed_text']
+    st.session_state.translated_text = job['result']['translated_text']
+    st.session_state.current_outputs = download_artifacts(job, ensure_export_dir() / job['id'])
+    st.success(f"Successfully processed: {job['params']['filename']}")
 
 def research_converter_page():
     st.title("Research PDF Converter")
     st.markdown("Upload a research PDF to convert it into structured, plain content")
 
+    with startup_step("import Research PDF Converter"):
+        from job_client import submit_pdf
+
     # Initialize session state
     if 'session_id' not in st.session_state:
         st.session_state.session_id = str(uuid.uuid4())
         st.session_state.current_outputs = None
         st.session_state.processed_text = None
         st.session_state.translated_text = None
-        st.session_state.search_tool = None
 
     # Ensure the exports directory exists
     ensure_export_dir()
@@ -719,201 +835,23 @@ def research_converter_page():
     
     output_format = st.radio("Output format", ["pdf", "html", "both"], index=2)
     translate = st.checkbox("Translate to English", value=True)
+    formats = ("pdf", "html") if output_format == "both" else (output_format,)
     
-    if uploaded_file is not None:
-        # Process PDF with encoding detection
-        with st.spinner("Analyzing document encoding..."):
-            pdf_bytes = uploaded_file.getvalue()
-            
-            # Create temp directory for processing
-            with tempfile.TemporaryDirectory() as temp_dir:
-                temp_dir_path = Path(temp_dir)
-                temp_pdf_path = temp_dir_path / uploaded_file.name
-                
-                # Save PDF for processing
-                with open(temp_pdf_path, "wb") as f:
-                    f.write(pdf_bytes)
-
-                try:
-                    # Extract text using PyPDF2
-                    pdf_reader = PdfReader(temp_pdf_path)
-                    processed_text = ""
-                    raw_text = ""
-                    
-                    for i, page in enumerate(pdf_reader.pages, 1):
-                        page_text = page.extract_text()
-                        if page_text:
-                            # Store raw text for debugging
-                            raw_text += f"\n=== Page {i} Raw ===\n{page_text}\n"
-                            
-                            # First try to decode any special encodings
-                            decoded_text = decode_indic_text(page_text)
-                            
-                            # Normalize the decoded text
-                            normalized_text = normalize_text(decoded_text)
-                            
-                            # Finally clean the text for display
-                            cleaned_text = ContentExporters.clean_text(normalized_text)
-                            processed_text += f"\n=== Page {i} ===\n{cleaned_text}\n"
-                    
-                    # Store both raw and processed text in session state
-                    st.session_state.raw_text = raw_text
-                    st.session_state.processed_text = processed_text
-                    
-                    # Translate if requested
-                    if translate:
-                        with st.spinner("Translating text..."):
-                            translated_text = translate_to_english(processed_text, model)
-                            st.session_state.translated_text = translated_text
-                            # Create search tool with translated text
-                            st.session_state.search_tool = create_search_tool(translated_text)
-                    else:
-                        # Create search tool with processed text
-                        st.session_state.search_tool = create_search_tool(processed_text)
-                    
-                    # Show document analysis
-                    with st.expander("View Document Analysis"):
-                        if translate:
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.subheader("Raw Text")
-                                st.text_area("Raw Content Preview", 
-                                           st.session_state.raw_text[:1000] + "...", 
-                                           height=200)
-                            with col2:
-                                st.subheader("Processed Hindi Text")
-                                st.text_area("Processed Content Preview", 
-                                           st.session_state.processed_text[:1000] + "...", 
-                                           height=200)
-                            with col3:
-                                st.subheader("Translated Text")
-                                st.text_area("English Translation", 
-                                           st.session_state.translated_text[:1000] + "...", 
-                                           height=200)
-                        else:
-                            col1, col2 = st.columns(2)
-                            with col1:
-                                st.subheader("Raw Text")
-                                st.text_area("Raw Content Preview", 
-                                           st.session_state.raw_text[:1000] + "...", 
-                                           height=200)
-                            with col2:
-                                st.subheader("Processed Text")
-                                st.text_area("Processed Content Preview", 
-                                           st.session_state.processed_text[:1000] + "...", 
-                                           height=200)
-                        
-                        # Show encoding analysis
-                        st.subheader("Encoding Analysis")
-                        raw_bytes = raw_text.encode('utf-8', errors='ignore')
-                        processed_bytes = processed_text.encode('utf-8', errors='ignore')
-                        
-                        col1, col2 = st.columns(2)
-                        with col1:
-                            st.write("Raw Text Encoding:")
-                            st.json(chardet.detect(raw_bytes))
-                        with col2:
-                            st.write("Processed Text Encoding:")
-                            st.json(chardet.detect(processed_bytes))
-                        
-                        show_encoding_details(processed_bytes, chardet.detect(processed_bytes))
-
-                    if st.button("Process PDF"):
-                        try:
-                            # Initialize ResearchConverter
-                            converter = ResearchConverter(gemini_api_key=GOOGLE_API_KEY, 
-                                                       output_dir=temp_dir_path)
-                            
-                            # Use our custom search tool instead of the default one
-                            researcher = ResearchAgents.create_researcher(converter.llm, st.session_state.search_tool)
-                            content_creator = ResearchAgents.create_content_creator(converter.llm)
-                            formatter = ResearchAgents.create_formatter(converter.llm)
-                            
-                            # Create tasks with explicit content passing
-                            research_task = Task(
-                                description=f"""Extract and organize the following content exactly as it appears in the document.
-Use the search tool to extract content - it will provide either Hindi or English text depending on the translation setting.
-
-CRITICAL RULES:
-1. DO NOT add any information that is not in the document
-2. DO NOT make creative interpretations or expansions
-3. DO NOT reorganize or restructure the content's original flow
-4. Copy text verbatim where possible, maintaining exact wording
-5. Preserve all numerical data, statistics, and figures exactly as they appear
-
-Extract and organize the following sections IN ORDER:
-1. Title (from the beginning of the document)
-2. Authors (if present)
-3. Abstract/Introduction
-4. Main Content (maintaining original structure)
-5. Conclusions
-6. References
-
-For each section:
-- Use exact quotes from the document
-- Maintain original paragraph structure
-- Keep all numerical values unchanged
-- Preserve technical terminology exactly
-- Keep citations in their original format""",
-                                agent=researcher,
-                                expected_output="A faithful, verbatim reproduction of the source document's content, maintaining original structure, wording, and data."
-                            )
-                            
-                            creation_task = ResearchTasks.create_content_creation_task(
-                                content_creator, research_task, ""
-                            )
-                            formatting_task = ResearchTasks.create_formatting_task(
-                                formatter, creation_task
-                            )
-                            
-                            # Create and run crew
-                            crew = ResearchCrews.create_research_to_content_crew(
-                                agents=[researcher, content_creator, formatter],
-                                tasks=[research_task, creation_task, formatting_task]
-                            )
-                            
-                            with st.spinner("Processing document..."):
-                                result = crew.kickoff()
-                                
-                                if result:
-                                    # Use ContentExporters for file generation
-                                    outputs = []
-                                    filename_base = Path(uploaded_file.name).stem
-                                    if translate:
-                                        filename_base += "_english"
-                                    unique_id = f"{int(time.time())}"
-                                    export_dir = ensure_export_dir() / unique_id
-                                    export_dir.mkdir(exist_ok=True)
-                                    
-                                    if output_format in ["pdf", "both"]:
-                                        pdf_path = ContentExporters.export_as_pdf(
-                                            result, filename_base, export_dir
-                                        )
-                                        if pdf_path:
-                                            outputs.append(pdf_path)
-                                    
-                                    if output_format in ["html", "both"]:
-                                        html_path = ContentExporters.export_as_html(
-                                            result, filename_base, export_dir
-                                        )
-                                        if html_path:
-                                            outputs.append(html_path)
-                                    
-                                    if outputs:
-                                        st.session_state.current_outputs = outputs
-                                        st.success(f"Successfully processed: {uploaded_file.name}")
-                                    else:
-                                        st.error("No outputs were generated during conversion.")
-                                else:
-                                    st.error("Failed to process the document.")
-                                    
-                        except Exception as e:
-                            st.error(f"Error during processing: {str(e)}")
-                            st.error(traceback.format_exc())
-                            
-                except Exception as e:
-                    st.error(f"Error reading PDF: {str(e)}")
-                    st.error(traceback.format_exc())
+    if uploaded_file is not None and st.button("Process PDF"):
+        # A worker runs the whole conversion; this page only uploads and shows progress
+        job = submit_pdf(
+            uploaded_file.name, uploaded_file.getvalue(), translate=translate, formats=formats,
+            owner=session_owner()
+        )
+        # Kept in the URL so a refresh keeps following the job
+        st.query_params['pdf_job'] = job['id']
+
+    job_id = st.query_params.get('pdf_job')
+    if job_id:
+        follow_pdf_job(job_id)
+        del st.query_params['pdf_job']
+    if st.session_state.get('raw_text') is not None:
+        show_document_analysis(st.session_state.translated_text is not None)
     
     # Display outputs if they exist
     if st.session_state.get('current_outputs'):
@@ -925,7 +863,7 @@ For each section:
                 st.subheader("PDF Preview")
                 display_pdf(pdf_output[0])
                 filename = uploaded_file.name if uploaded_file else "output"
-                st.markdown(get_binary_file_downloader_html(pdf_output[0], f"PDF - {filename}"), unsafe_allow_html=True)
+                file_download_button(pdf_output[0], f"PDF - {filename}")
             else:
                 st.warning("PDF output not available.")
         
@@ -935,7 +873,7 @@ For each section:
                 st.subheader("HTML Preview")
                 display_html(html_output[0])
                 filename = uploaded_file.name if uploaded_file else "output"
-                st.markdown(get_binary_file_downloader_html(html_output[0], f"HTML - {filename}"), unsafe_allow_html=True)
+                file_download_button(html_output[0], f"HTML - {filename}")
             else:
                 st.warning("HTML output not available.")
 
@@ -946,32 +884,38 @@ def main():
         layout="wide"
     )
 
+    # Sidebar navigation
+    st.sidebar.title("Navigation")
+    page = st.sidebar.radio("Choose a tool:", ["AI Blog Writer", "Bulk Blog Generator", "Research PDF Converter"])
+    
+    # Reset button in sidebar
+    if st.sidebar.button("Reset App"):
+        st.session_state.clear()
+        st.experimental_rerun()
+
+    if startup_profile.ENABLED:
+        show_startup_profile()
+
     # Check for API key
-    if not GOOGLE_API_KEY:
+    # The key is needed where the models run: in this server's workers, unless an API is configured
+    if not API_URL and not os.getenv('GOOGLE_API_KEY') and BACKEND_MODE not in ('replay', 'synthetic'):
         st.warning("Google API key not found! Please make sure it's set in .env file or environment variables.")
         api_key = st.text_input("Enter your Google API key:", type="password")
         if api_key:
             os.environ["GOOGLE_API_KEY"] = api_key
-            genai.configure(api_key=api_key)
+            configure_genai(api_key)
         else:
             return
 
-    # Check dependencies
-    if not check_dependencies():
+    # Check dependencies; with an API configured the crews run on its workers instead
+    if not API_URL and not check_dependencies():
         return
 
-    # Sidebar navigation
-    st.sidebar.title("Navigation")
-    page = st.sidebar.radio("Choose a tool:", ["AI Blog Writer", "Research PDF Converter"])
-    
-    # Reset button in sidebar
-    if st.sidebar.button("Reset App"):
-        st.session_state.clear()
-        st.experimental_rerun()
-
     # Display selected page
     if page == "AI Blog Writer":
         blog_writer_page()
+    elif page == "Bulk Blog Generator":
+        bulk_blog_page()
     else:
         research_converter_page()
 
@@ -0,0 +1,257 @@
+"""
+Client for background jobs.
+
+With ``CONTENT_API_URL`` set, jobs are submitted to the HTTP API in
+``api.py``. Otherwise they go straight into the local job store and are
+run by worker processes started from this process (see ``jobs``). Either
+way the Streamlit pages only submit work and follow its progress, so a
+rerun or a dropped connection does not lose it.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+API_URL = os.getenv('CONTENT_API_URL', '').rstrip('/')
+REQUEST_TIMEOUT = float(os.getenv('CONTENT_API_TIMEOUT', '30'))
+FINAL_STATUSES = ('done', 'failed')
+BLOG_DEFAULTS = {'research_width': 1, 'fit_length': False, 'use_cache': True, 'formats': ['html', 'pdf']}
+# How often a bulk run checks on its row jobs
+BATCH_POLL_SECONDS = 2.0
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='job-client')
+
+
+class ApiError(RuntimeError):
+    pass
+
+
+def _check(response):
+    if response.status_code >= 400:
+        try:
+            detail = response.json().get('detail')
+        except ValueError:
+            detail = response.text
+        raise ApiError(f"API error {response.status_code}: {detail}")
+    return response
+
+
+def _request(method, path, owner=None, **kwargs):
+    import requests
+
+    headers = {'X-User-Id': owner} if owner else {}
+    return _check(requests.request(method, f"{API_URL}{path}", headers=headers, **kwargs))
+
+
+def _local_store():
+    from jobs import ensure_workers, get_job_store
+
+    ensure_workers()
+    return get_job_store()
+
+
+def submit_blog(inputs, owner=None, **options):
+    """
+    Start a blog job.
+
+    ``options`` are research_width, fit_length, use_cache, formats,
+    priority ('interactive' or 'batch') and agents ('merge' for the Merge
+    app's Blog crew, 'root' for the root app's ``agents``).
+    """
+    params = dict(BLOG_DEFAULTS, **inputs, **options)
+    if not API_URL:
+        return _local_store().submit('blog', params, owner=owner or 'anonymous')
+    return _request('POST', '/jobs/blog', owner, json=params, timeout=REQUEST_TIMEOUT).json()
+
+
+def submit_pdf(filename, pdf_bytes, translate=True, formats=('pdf', 'html'), owner=None):
+    if not API_URL:
+        params = {'filename': os.path.basename(filename), 'translate': bool(translate), 'formats': list(formats)}
+        return _local_store().submit('pdf', params, pdf_bytes, owner=owner or 'anonymous')
+    return _request(
+        'POST', '/jobs/pdf', owner,
+        files={'file': (filename, pdf_bytes, 'application/pdf')},
+        data={'translate': str(bool(translate)).lower(), 'formats': ','.join(formats)},
+        timeout=REQUEST_TIMEOUT,
+    ).json()
+
+
+def submit_checks(content, checks=('analysis', 'plagiarism'), owner=None):
+    params = {'content': content, 'checks': list(checks)}
+    if not API_URL:
+        return _local_store().submit('checks', params, owner=owner or 'anonymous')
+    return _request('POST', '/jobs/checks', owner, json=params, timeout=REQUEST_TIMEOUT).json()
+
+
+def get_job(job_id):
+    """Return the job as a dict; raises ApiError for an unknown job."""
+    if not API_URL:
+        job = _local_store().get(job_id)
+        if job is None:
+            raise ApiError(f"No job {job_id}")
+        return job
+    return _request('GET', f"/jobs/{job_id}", timeout=REQUEST_TIMEOUT).json()
+
+
+def _local_events(job_id, after):
+    store = _local_store()
+    while True:
+        try:
+            events = store.wait_events(job_id, after)
+        except KeyError:
+            raise ApiError(f"No job {job_id}")
+        if not events and store.get(job_id)['status'] in FINAL_STATUSES:
+            return
+        for event in events:
+            after = event['seq']
+            yield event
+
+
+def _remote_events(job_id, after):
+    import requests
+
+    with requests.get(
+        f"{API_URL}/jobs/{job_id}/events", params={'after': after}, stream=True,
+        timeout=(REQUEST_TIMEOUT, None)
+    ) as response:
+        _check(response)
+        for line in response.iter_lines(decode_unicode=True):
+            if line and line.startswith('data: '):
+                yield json.loads(line[len('data: '):])
+
+
+def iter_events(job_id, after=0):
+    """
+    Yield the job's progress events, from the start or after ``after``, until its final status.
+
+    A 'requeued' status means the worker running the job died and the job
+    will run again: output built from the events before it should be dropped.
+    """
+    events = _local_events(job_id, after) if not API_URL else _remote_events(job_id, after)
+    for event in events:
+        yield event
+        if event['type'] == 'status' and event['status'] in FINAL_STATUSES:
+            return
+
+
+def wait_for_job(job_id, on_event=None):
+    """Follow a job's events to the end and return the finished job; raises ApiError if it failed."""
+    for event in iter_events(job_id):
+        if on_event:
+            on_event(event)
+    job = get_job(job_id)
+    if job['status'] != 'done':
+        raise ApiError(job.get('error') or f"Job {job_id} did not finish")
+    return job
+
+
+def download_artifacts(job, out_dir):
+    """
+    Return local paths of a finished job's artifacts.
+
+    Artifacts of local jobs are already on disk; those of API jobs are
+    saved under ``out_dir``.
+    """
+    if not API_URL:
+        from jobs import JobStore
+
+        return [str(JobStore.job_dir(job['id']) / name) for name in job['artifacts']]
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for name in job['artifacts']:
+        response = _request('GET', f"/jobs/{job['id']}/artifacts/{name}", timeout=REQUEST_TIMEOUT)
+        path = os.path.join(out_dir, name)
+        with open(path, 'wb') as f:
+            f.write(response.content)
+        paths.append(path)
+    return paths
+
+
+def run_check(content, name, owner=None):
+    """Run one content check as a job and return its report."""
+    job = submit_checks(content, [name], owner=owner)
+    return wait_for_job(job['id'])['result'][name]
+
+
+def start_checks(content, checks=('analysis', 'plagiarism'), owner=None):
+    """Like ``content_checks.start_checks``, but each check runs as a job."""
+    return {name: _executor.submit(run_check, content, name, owner) for name in checks}
+
+
+def _copy_artifacts(job, out_dir, base_name):
+    """Copy a finished blog job's artifacts to ``out_dir`` as ``base_name.<ext>`` and return their paths."""
+    outputs = []
+    with tempfile.TemporaryDirectory() as download_dir:
+        for path in download_artifacts(job, download_dir):
+            target = Path(out_dir) / f"{base_name}{Path(path).suffix}"
+            part = target.with_name(target.name + '.part')
+            shutil.copyfile(path, part)
+            os.replace(part, target)
+            outputs.append(str(target))
+    return outputs
+
+
+def _find_job(job_id):
+    try:
+        return get_job(job_id)
+    except ApiError:
+        return None
+
+
+def run_batch(rows, out_dir, retries=2, formats=('html', 'pdf'), use_cache=True, owner=None):
+    """
+    Like ``batch.run_batch``, but each row runs as a batch-priority blog job.
+
+    Rows already marked done in the output directory's progress file are
+    yielded straight away with status 'skipped'. Rows whose job an earlier,
+    interrupted run submitted follow that job instead of starting another.
+    Each finished row's artifacts are copied to ``out_dir``, and a failed
+    row is submitted again up to ``retries`` times.
+    """
+    from batch import BatchProgress, row_base_name, row_id
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    progress = BatchProgress(out_dir)
+
+    def submit(index, row, attempts):
+        job = submit_blog(row, owner=owner, use_cache=use_cache, formats=list(formats), priority='batch')
+        progress.record({'row_id': row_id(row), 'index': index, 'topic': row['topic'], 'status': 'submitted',
+                         'attempts': attempts, 'job_id': job['id']})
+        return job['id']
+
+    pending = {}
+    for index, row in enumerate(rows, 1):
+        rid = row_id(row)
+        if rid in progress.done:
+            yield dict(progress.done[rid], status='skipped', index=index)
+            continue
+        submitted = progress.jobs.get(rid)
+        if submitted is not None and _find_job(submitted['job_id']) is not None:
+            pending[submitted['job_id']] = (index, row, submitted['attempts'])
+        else:
+            pending[submit(index, row, 1)] = (index, row, 1)
+
+    while pending:
+        for job_id in list(pending):
+            job = _find_job(job_id)
+            if job is not None and job['status'] not in FINAL_STATUSES:
+                continue
+            index, row, attempts = pending.pop(job_id)
+            result = {'row_id': row_id(row), 'index': index, 'topic': row['topic'], 'attempts': attempts}
+            if job is not None and job['status'] == 'done':
+                result.update(status='done', outputs=_copy_artifacts(job, out_dir, row_base_name(index, row)))
+            elif attempts <= retries:
+                pending[submit(index, row, attempts + 1)] = (index, row, attempts + 1)
+                continue
+            else:
+                result.update(status='failed', error=job['error'] if job is not None else f"Job {job_id} was lost")
+            result['finished_at'] = time.time()
+            progress.record(result)
+            yield result
+        if pending:
+            time.sleep(BATCH_POLL_SECONDS)
@@ -0,0 +1,548 @@
+"""
+Durable background jobs.
+
+A job has an id, a kind ('blog', 'pdf' or 'checks'), validated
+parameters, the user who submitted it, a status (queued → running →
+done/failed) and an ordered list of progress events. Jobs and events live
+in SQLite (``JOB_DB``, default ``.cache/jobs.sqlite3``), so they survive
+Streamlit reruns, browser refreshes and server restarts, and any process
+can follow a job by id.
+
+Jobs are run by worker processes (``WorkerPool``, or ``python
+Merge/jobs.py --workers N``). A worker claims the next job fairly:
+interactive jobs go before batch ones (``params['priority']``), then users
+with the fewest running jobs, then the user served least recently, then
+the oldest job. At most ``JOB_MAX_RUNNING`` jobs run at
+once across all workers, and at most ``JOB_MAX_PER_USER`` per user. A job
+whose worker stops heartbeating is requeued, up to ``JOB_MAX_ATTEMPTS``
+runs. Artifacts are written to ``<JOBS_DIR>/<job id>/``.
+
+Runners take ``(params, data, job_dir, emit)`` and return a JSON-ready
+result; ``emit(type, **fields)`` records a progress event.
+"""
+
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+
+try:
+    from deploy_helper import setup_python_path
+    setup_python_path()
+except ImportError:
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rate_limit import PRIORITIES, priority
+from stage_cache import CACHE_DIR
+from tracing import start_run
+
+JOB_DB = Path(os.getenv('JOB_DB', CACHE_DIR / 'jobs.sqlite3'))
+JOBS_DIR = Path(os.getenv('JOBS_DIR', os.path.join('exports', 'jobs')))
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_RUNNING = int(os.getenv('JOB_MAX_RUNNING', '4'))
+JOB_MAX_PER_USER = int(os.getenv('JOB_MAX_PER_USER', '2'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '2'))
+JOB_TTL_SECONDS = float(os.getenv('JOB_TTL_HOURS', '24')) * 3600
+HEARTBEAT_SECONDS = 5.0
+STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '60'))
+POLL_SECONDS = 0.25
+FINAL_STATUSES = ('done', 'failed')
+# Page events carry the start of the page's text for a live preview
+PAGE_PREVIEW_CHARS = 2000
+
+
+def blog_agents_class(name='merge'):
+    """The BlogAgents a blog job runs with: the Merge app's Blog crew, or the root app's ``agents`` ('root')."""
+    if name == 'root':
+        from agents import BlogAgents
+
+        return BlogAgents
+    from module_loader import load_modules
+
+    return load_modules('blog')['BlogAgents']
+
+
+def run_blog_job(params, data, job_dir, emit):
+    """Generate a blog post, streaming the writer's output as 'chunk' events."""
+    from batch import INPUT_FIELDS, export_blog
+    from blog_pipeline import stream_blog
+    from llm_pool import get_agent_pool
+    from originality import get_originality_index, originality_score
+    from sections import create_draft, draft_content, fit_to_length
+
+    inputs = {field: params[field] for field in INPUT_FIELDS}
+    pool = get_agent_pool(blog_agents_class(params.get('agents', 'merge')))
+    usage = []
+    contexts = {}
+    chunks = []
+    with pool.lease() as blog_agents:
+        for chunk in stream_blog(
+            inputs, blog_agents, use_cache=params['use_cache'],
+            on_stage=lambda stage, cached: emit('stage', stage=stage, cached=cached),
+            usage=usage, research_width=params['research_width'], contexts=contexts
+        ):
+            chunks.append(chunk)
+            emit('chunk', text=chunk)
+        content = ''.join(chunks)
+
+        changes = []
+        if params['fit_length']:
+            draft, changes = fit_to_length(
+                create_draft(content, inputs, params['research_width'], contexts['writer']), blog_agents,
+                use_cache=params['use_cache']
+            )
+            if changes:
+                content = draft_content(draft)
+                emit('stage', stage='fit_length', cached=False, changes=changes)
+
+    export_blog(inputs['topic'], content, job_dir, 'blog', params['formats'])
+
+    # Compare against earlier content, then add this post to the corpus
+    originality_index = get_originality_index()
+    matches = originality_index.query(content)
+    originality_index.add(content, source=f"blog:{inputs['topic']}", title=inputs['topic'])
+    return {
+        'content': content,
+        'usage': usage,
+        'length_changes': changes,
+        # Kept in the page's draft so section rewrites do not rebuild it
+        'writer_context': contexts['writer'],
+        'corpus_overlap': {'score': originality_score(matches), 'matches': matches},
+    }
+
+
+def run_pdf_job(params, data, job_dir, emit):
+    """Extract → decode → normalize → translate → crew → export for an uploaded PDF."""
+    from llm_pool import get_generative_model
+    from research_pipeline import (
+        create_search_tool, export_research_result, extract_pdf_text, run_research_crew, translate_to_english
+    )
+
+    emit('stage', stage='extract')
+    raw_text, processed_text = extract_pdf_text(
+        data, on_page=lambda page, text: emit('page', page=page, text=text[:PAGE_PREVIEW_CHARS])
+    )
+    text = processed_text
+    translated_text = None
+    if params['translate']:
+        emit('stage', stage='translate')
+        translated_text = translate_to_english(processed_text, get_generative_model('gemini-2.0-flash'))
+        text = translated_text
+
+    emit('stage', stage='crew')
+    result = run_research_crew(create_search_tool(text), job_dir)
+    if not result:
+        raise RuntimeError("The research crew returned no result")
+
+    emit('stage', stage='export')
+    filename_base = Path(params['filename']).stem + ("_english" if params['translate'] else "")
+    outputs = export_research_result(result, filename_base, job_dir, params['formats'])
+    if not outputs:
+        raise RuntimeError("No outputs were generated during conversion")
+    return {'raw_text': raw_text, 'processed_text': processed_text, 'translated_text': translated_text}
+
+
+def run_checks_job(params, data, job_dir, emit):
+    """
+    Run the requested content checks concurrently and return their reports by name.
+
+    A check that fails does not lose the others' reports: its error is
+    kept under ``errors`` and the job fails only if every check failed.
+    """
+    from content_checks import start_checks
+    from llm_pool import get_agent_pool, get_generative_model
+
+    futures = start_checks(
+        params['content'], get_generative_model('gemini-2.0-flash'),
+        get_agent_pool(blog_agents_class()), checks=params['checks']
+    )
+    results = {}
+    errors = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = f'{type(e).__name__}: {e}'
+            emit('check', check=name, error=errors[name])
+        else:
+            emit('check', check=name)
+    if not results:
+        raise RuntimeError('; '.join(f'{name}: {error}' for name, error in errors.items()))
+    if errors:
+        results['errors'] = errors
+    return results
+
+
+RUNNERS = {
+    'blog': run_blog_job,
+    'pdf': run_pdf_job,
+    'checks': run_checks_job,
+}
+
+
+class JobStore:
+    """SQLite-backed jobs and events, shared by every process that opens the same file."""
+
+    def __init__(self, path=JOB_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                owner TEXT NOT NULL,
+                status TEXT NOT NULL,
+                params TEXT NOT NULL,
+                data BLOB,
+                result TEXT,
+                error TEXT,
+                run_id TEXT,
+                worker TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                heartbeat_at REAL,
+                priority INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        self._add_column('jobs', 'priority', 'INTEGER NOT NULL DEFAULT 0')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS job_events (
+                job_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                type TEXT NOT NULL,
+                time REAL NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (job_id, seq)
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, owner)')
+
+    def _add_column(self, table, column, definition):
+        # Stores created before the column existed get it added in place
+        columns = {row[1] for row in self._conn.execute(f'PRAGMA table_info({table})').fetchall()}
+        if column not in columns:
+            try:
+                self._conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            except sqlite3.OperationalError:
+                # Another process added it first
+                pass
+
+    def submit(self, kind, params, data=None, owner='anonymous'):
+        """Queue a job and return it as a dict."""
+        if kind not in RUNNERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        rank = PRIORITIES.index(params.get('priority', 'interactive'))
+        with self._lock:
+            self._prune()
+            self._conn.execute(
+                'INSERT INTO jobs (id, kind, owner, status, params, data, created_at, priority) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind, str(owner), 'queued', json.dumps(params), data, time.time(), rank)
+            )
+        self.emit(job_id, 'status', status='queued')
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return the job as a dict, or None if there is no such job."""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, kind, owner, status, params, result, error, run_id, attempts, '
+                'created_at, started_at, finished_at FROM jobs WHERE id = ?', (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(
+            ('id', 'kind', 'owner', 'status', 'params', 'result', 'error', 'run_id', 'attempts',
+             'created_at', 'started_at', 'finished_at'), row
+        ))
+        job['params'] = json.loads(job['params'])
+        job['result'] = json.loads(job['result']) if job['result'] is not None else None
+        job['artifacts'] = self.artifacts(job_id) if job['status'] == 'done' else []
+        return job
+
+    @staticmethod
+    def job_dir(job_id):
+        return JOBS_DIR / job_id
+
+    def artifacts(self, job_id):
+        job_dir = self.job_dir(job_id)
+        if not job_dir.is_dir():
+            return []
+        return sorted(path.name for path in job_dir.iterdir() if path.is_file() and not path.name.endswith('.part'))
+
+    def events(self, job_id, after=0):
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT seq, type, time, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq',
+                (job_id, after)
+            ).fetchall()
+        return [{'seq': seq, 'type': event_type, 'time': at, **json.loads(data)} for seq, event_type, at, data in rows]
+
+    def wait_events(self, job_id, after=0, timeout=15.0):
+        """
+        Return the job's events numbered above ``after``, polling up to ``timeout`` for one.
+
+        Raises KeyError for an unknown job.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            events = self.events(job_id, after)
+            if events:
+                return events
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job['status'] in FINAL_STATUSES or time.monotonic() >= deadline:
+                return []
+            time.sleep(POLL_SECONDS)
+
+    def emit(self, job_id, event_type, **fields):
+        with self._lock:
+            self._insert_event(job_id, event_type, fields)
+
+    def _insert_event(self, job_id, event_type, fields):
+        self._conn.execute(
+            'INSERT INTO job_events (job_id, seq, type, time, data) '
+            'SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ? FROM job_events WHERE job_id = ?',
+            (job_id, event_type, time.time(), json.dumps(fields, default=str), job_id)
+        )
+
+    def claim(self, worker, max_running=JOB_MAX_RUNNING, max_per_user=JOB_MAX_PER_USER):
+        """
+        Mark the next job to run as running for ``worker`` and return it, or None.
+
+        Returns ``(job_id, kind, params, data)``.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                self._requeue_stale(now)
+                running = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'running'").fetchone()[0]
+                row = None
+                if running < max_running:
+                    row = self._conn.execute("""
+                        SELECT j.id, j.kind, j.params, j.data FROM jobs j
+                        LEFT JOIN (
+                            SELECT owner,
+                                   SUM(status = 'running') AS running,
+                                   MAX(COALESCE(started_at, 0)) AS served_at
+                            FROM jobs GROUP BY owner
+                        ) u ON u.owner = j.owner
+                        WHERE j.status = 'queued' AND COALESCE(u.running, 0) < ?
+                        ORDER BY j.priority, COALESCE(u.running, 0), COALESCE(u.served_at, 0), j.created_at
+                        LIMIT 1
+                    """, (max_per_user,)).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (worker, now, now, row[0])
+                    )
+                    attempt = self._conn.execute('SELECT attempts FROM jobs WHERE id = ?', (row[0],)).fetchone()[0]
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        if row is None:
+            return None
+        job_id, kind, params, data = row
+        self.emit(job_id, 'status', status='running', worker=worker, attempt=attempt)
+        return job_id, kind, json.loads(params), data
+
+    def heartbeat(self, job_id):
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET heartbeat_at = ? WHERE id = ?', (time.time(), job_id))
+
+    def set_run_id(self, job_id, run_id):
+        with self._lock:
+            self._conn.execute('UPDATE jobs SET run_id = ? WHERE id = ?', (run_id, job_id))
+
+    def finish(self, job_id, result=None, error=None):
+        """Record a job's result or error; uploaded data is dropped either way."""
+        status = 'failed' if error else 'done'
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, data = NULL, finished_at = ? WHERE id = ?',
+                (status, json.dumps(result, default=str) if error is None else None, error, time.time(), job_id)
+            )
+        self.emit(job_id, 'status', status=status, **({'error': error} if error else {}))
+
+    def _requeue_stale(self, now):
+        # A worker that stopped heartbeating has died; retry its job or give up on it.
+        # The dead attempt's events stay (sequence numbers never go back), so the
+        # 'requeued' status tells clients to drop what they built from them.
+        stale = self._conn.execute(
+            "SELECT id, attempts FROM jobs WHERE status = 'running' AND heartbeat_at < ?", (now - STALE_SECONDS,)
+        ).fetchall()
+        for job_id, attempts in stale:
+            if attempts < JOB_MAX_ATTEMPTS:
+                self._conn.execute("UPDATE jobs SET status = 'queued', worker = NULL WHERE id = ?", (job_id,))
+                self._insert_event(job_id, 'status', {'status': 'requeued', 'attempt': attempts})
+            else:
+                error = "The worker running this job stopped"
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, data = NULL, finished_at = ? WHERE id = ?",
+                    (error, now, job_id)
+                )
+                self._insert_event(job_id, 'status', {'status': 'failed', 'error': error})
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?", (cutoff,)
+        ).fetchall()]
+        for job_id in expired:
+            self._conn.execute('DELETE FROM job_events WHERE job_id = ?', (job_id,))
+            self._conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store():
+    """Return this process's connection to the job store, opening it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JobStore()
+        return _store
+
+
+def run_job(store, worker, job_id, kind, params, data):
+    """Run one claimed job to completion, heartbeating while it runs."""
+    job_dir = store.job_dir(job_id)
+    job_dir.mkdir(parents=True, exist_ok=True)
+    running = threading.Event()
+
+    def beat():
+        while not running.wait(HEARTBEAT_SECONDS):
+            store.heartbeat(job_id)
+
+    threading.Thread(target=beat, daemon=True).start()
+    try:
+        # Bulk rows yield Gemini capacity to interactive requests (see ``rate_limit``)
+        with start_run(f'job_{kind}', job_id=job_id, worker=worker) as trace, \
+                priority(params.get('priority', 'interactive')):
+            store.set_run_id(job_id, trace.run.run_id)
+            try:
+                result = RUNNERS[kind](
+                    params, data, job_dir, lambda event_type, **fields: store.emit(job_id, event_type, **fields)
+                )
+            except Exception as e:
+                store.finish(job_id, error=f'{type(e).__name__}: {e}')
+                return
+        store.finish(job_id, result=result)
+    finally:
+        running.set()
+
+
+def _exit_with_parent(parent):
+    parent.join()
+    os._exit(0)
+
+
+def worker_main(stop=None):
+    """Claim and run jobs until ``stop`` is set; the body of each worker process."""
+    from dotenv import load_dotenv
+    from text_processing import page_workers_for, set_page_workers
+
+    load_dotenv()
+    # At most JOB_MAX_RUNNING jobs extract at once across every worker on the
+    # host, so each one's PDF page pool gets that share of the cores
+    set_page_workers(page_workers_for(JOB_MAX_RUNNING))
+    # Workers are not daemons (they start PDF page pools), so they watch for their parent going away
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=_exit_with_parent, args=(parent,), daemon=True).start()
+    store = get_job_store()
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    while stop is None or not stop.is_set():
+        claimed = store.claim(worker)
+        if claimed is None:
+            time.sleep(POLL_SECONDS * 4)
+            continue
+        run_job(store, worker, *claimed)
+
+
+class WorkerPool:
+    """A set of worker processes draining the job store."""
+
+    def __init__(self, workers=JOB_WORKERS):
+        self.workers = max(1, workers)
+        self._context = multiprocessing.get_context('spawn')
+        self._stop = self._context.Event()
+        self._processes = []
+
+    def start(self):
+        for n in range(self.workers):
+            process = self._context.Process(target=worker_main, args=(self._stop,), name=f'job-worker-{n}')
+            process.start()
+            self._processes.append(process)
+        return self
+
+    def alive(self):
+        return sum(process.is_alive() for process in self._processes)
+
+    def stop(self, timeout=5.0):
+        """Stop claiming new jobs; a job still running is requeued once its heartbeat goes stale."""
+        self._stop.set()
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def ensure_workers(workers=JOB_WORKERS):
+    """Start this process's worker pool on first use, unless ``JOB_AUTOSTART_WORKERS=0``."""
+    global _pool
+    if os.getenv('JOB_AUTOSTART_WORKERS', '1') == '0':
+        return None
+    with _pool_lock:
+        if _pool is None or _pool.alive() == 0:
+            _pool = WorkerPool(workers).start()
+            atexit.register(_pool.stop)
+        return _pool
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run job worker processes until interrupted.")
+    parser.add_argument('--workers', type=int, default=JOB_WORKERS, help="Worker processes to start")
+    args = parser.parse_args(argv)
+    pool = WorkerPool(args.workers).start()
+    print(f"{pool.workers} workers running on {JOB_DB}")
+    try:
+        while pool.alive():
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,55 @@
+"""
+Lazy loading of the Blog and whitepaper classes.
+
+Each group is imported the first time it is asked for and then kept for
+the process, so the Streamlit pages and the HTTP API only pay for crewai
+and the crews they actually use.
+"""
+
+import functools
+import importlib
+import importlib.util
+import os
+
+from startup_profile import step as startup_step
+
+MODULE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Classes in each group: name -> (module, file under this directory)
+MODULE_GROUPS = {
+    'blog': {
+        'BlogAgents': ('Blog.agents', ('Blog', 'agents.py')),
+    },
+    'research': {
+        'ResearchConverter': ('whitepaper.main', ('whitepaper', 'main.py')),
+        'ResearchTools': ('whitepaper.tools', ('whitepaper', 'tools.py')),
+        'ResearchAgents': ('whitepaper.agents', ('whitepaper', 'agents.py')),
+        'ResearchTasks': ('whitepaper.tasks', ('whitepaper', 'tasks.py')),
+        'ResearchCrews': ('whitepaper.crews', ('whitepaper', 'crews.py')),
+        'ContentExporters': ('whitepaper.exporters', ('whitepaper', 'exporters.py')),
+    },
+}
+
+
+def _import_attr(attr, module_name, relative_path):
+    """Import ``attr`` from ``module_name``, falling back to loading the file directly."""
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"Import of {module_name} failed ({e}), loading it from its file")
+        path = os.path.join(MODULE_DIR, *relative_path)
+        spec = importlib.util.spec_from_file_location(attr, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    return getattr(module, attr)
+
+
+@functools.lru_cache(maxsize=None)
+def load_modules(group):
+    """
+    Return ``{class name: class}`` for a group, importing it on first use.
+
+    A failed import raises and is retried on the next call.
+    """
+    with startup_step(f"import {group} modules"):
+        return {attr: _import_attr(attr, *source) for attr, source in MODULE_GROUPS[group].items()}
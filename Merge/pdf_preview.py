@@ -0,0 +1,97 @@
+"""
+Page-at-a-time preview for large PDFs.
+
+Only the requested page is extracted, either as a one-page PDF, a PNG
+(when PyMuPDF is installed) or plain text, so opening a 300-page
+document costs one page instead of the whole file. Parsed readers and
+recently viewed pages are kept in small LRU caches.
+"""
+
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from PyPDF2 import PdfReader, PdfWriter
+
+try:
+    import fitz  # PyMuPDF, optional: enables image previews
+except ImportError:
+    fitz = None
+
+PAGE_CACHE_SIZE = int(os.getenv('PDF_PREVIEW_CACHE_PAGES', '24'))
+READER_CACHE_SIZE = 4
+
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key, create):
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                return self._items[key]
+        value = create()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+        return value
+
+
+_readers = _LRU(READER_CACHE_SIZE)
+_reader_lock = threading.RLock()
+_pages = _LRU(PAGE_CACHE_SIZE)
+
+
+def _file_key(pdf_path):
+    pdf_path = str(pdf_path)
+    return pdf_path, os.path.getmtime(pdf_path)
+
+
+def _reader(pdf_path):
+    return _readers.get_or_create(_file_key(pdf_path), lambda: PdfReader(str(pdf_path)))
+
+
+def page_count(pdf_path):
+    with _reader_lock:
+        return len(_reader(pdf_path).pages)
+
+
+def image_preview_available():
+    return fitz is not None
+
+
+def get_page(pdf_path, page_number, mode='pdf'):
+    """
+    Return one page (1-based) of the PDF.
+
+    ``mode`` is 'pdf' for a one-page PDF, 'png' for a rendered image
+    (requires PyMuPDF) or 'text' for the page's extracted text.
+    """
+    key = _file_key(pdf_path) + (page_number, mode)
+    return _pages.get_or_create(key, lambda: _render_page(pdf_path, page_number, mode))
+
+
+def _render_page(pdf_path, page_number, mode):
+    if mode == 'png':
+        if fitz is None:
+            raise RuntimeError("Image previews require PyMuPDF (pip install pymupdf)")
+        with fitz.open(str(pdf_path)) as doc:
+            return doc.load_page(page_number - 1).get_pixmap(dpi=110).tobytes('png')
+
+    # Readers are shared between sessions and PyPDF2 reads from a single stream
+    with _reader_lock:
+        page = _reader(pdf_path).pages[page_number - 1]
+        if mode == 'text':
+            return page.extract_text() or ''
+
+        writer = PdfWriter()
+        writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+    return buffer.getvalue()
@@ -0,0 +1,149 @@
+"""
+Research PDF conversion, independent of Streamlit.
+
+A PDF is extracted, decoded and normalized page by page
+(``text_processing``), optionally translated to English, run through the
+research → content → formatting crew and exported as PDF and/or HTML. The
+Research PDF Converter page and the HTTP API both run it from here.
+"""
+
+import os
+
+from document import export_document
+from llm_pool import rate_limited
+from module_loader import load_modules
+from originality import get_originality_index
+from text_processing import iter_pdf_pages
+from tracing import span
+
+EXTRACTION_TASK_DESCRIPTION = """Extract and organize the following content exactly as it appears in the document.
+Use the search tool to extract content - it will provide either Hindi or English text depending on the translation setting.
+
+CRITICAL RULES:
+1. DO NOT add any information that is not in the document
+2. DO NOT make creative interpretations or expansions
+3. DO NOT reorganize or restructure the content's original flow
+4. Copy text verbatim where possible, maintaining exact wording
+5. Preserve all numerical data, statistics, and figures exactly as they appear
+
+Extract and organize the following sections IN ORDER:
+1. Title (from the beginning of the document)
+2. Authors (if present)
+3. Abstract/Introduction
+4. Main Content (maintaining original structure)
+5. Conclusions
+6. References
+
+For each section:
+- Use exact quotes from the document
+- Maintain original paragraph structure
+- Keep all numerical values unchanged
+- Preserve technical terminology exactly
+- Keep citations in their original format"""
+
+
+def translate_to_english(text, model):
+    """
+    Translate Hindi text to English using Gemini.
+
+    Errors are raised rather than returning the untranslated text; quota
+    errors have already been retried by the model's rate limiter.
+    """
+    prompt = f"""Translate the following Hindi/Devanagari text to English.
+Keep technical terms as is, and maintain any numerical values or measurements exactly.
+Preserve formatting and structure of the text.
+
+Text to translate:
+{text}
+
+Please provide a clear and accurate translation while keeping technical terminology intact."""
+
+    response = model.generate_content(prompt)
+    return response.text
+
+
+def create_search_tool(text):
+    """Create a search tool that works with decoded/translated text."""
+    def search_tool(query):
+        """Custom search tool that searches through our processed text."""
+        try:
+            # If query is a dict with "extract all", return full text
+            if isinstance(query, dict) and query.get("extract all"):
+                return text
+
+            # If it's a string query, do semantic search
+            # For now, return full text as we don't have semantic search implemented
+            return text
+
+        except Exception as e:
+            print(f"Search error: {str(e)}")
+            return text
+
+    return search_tool
+
+
+def extract_pdf_text(pdf_bytes, on_page=None):
+    """
+    Extract, decode, normalize and clean every page of a PDF.
+
+    Returns ``(raw_text, processed_text)`` with a header per page. Pages
+    are processed in parallel for long documents (see ``iter_pdf_pages``)
+    and arrive in order; ``on_page(page_number, cleaned_text)`` is called
+    as each page with text arrives.
+    """
+    clean_text = load_modules('research')['ContentExporters'].clean_text
+    raw_parts = []
+    processed_parts = []
+    for i, page_text, cleaned_text in iter_pdf_pages(pdf_bytes, clean=clean_text):
+        # Store raw text for debugging
+        raw_parts.append(f"\n=== Page {i} Raw ===\n{page_text}\n")
+        processed_parts.append(f"\n=== Page {i} ===\n{cleaned_text}\n")
+        if on_page:
+            on_page(i, cleaned_text)
+    return ''.join(raw_parts), ''.join(processed_parts)
+
+
+def run_research_crew(search_tool, output_dir, api_key=None):
+    """Run the research → content → formatting crew over the text behind ``search_tool``."""
+    from crewai import Task
+
+    modules = load_modules('research')
+    ResearchAgents = modules['ResearchAgents']
+    ResearchTasks = modules['ResearchTasks']
+    ResearchCrews = modules['ResearchCrews']
+
+    converter = modules['ResearchConverter'](
+        gemini_api_key=api_key or os.getenv('GOOGLE_API_KEY'), output_dir=output_dir
+    )
+
+    # The converter builds its own Gemini client; share the process-wide limit with it
+    llm = rate_limited(converter.llm)
+
+    # Use our custom search tool instead of the default one
+    researcher = ResearchAgents.create_researcher(llm, search_tool)
+    content_creator = ResearchAgents.create_content_creator(llm)
+    formatter = ResearchAgents.create_formatter(llm)
+
+    # Create tasks with explicit content passing
+    research_task = Task(
+        description=EXTRACTION_TASK_DESCRIPTION,
+        agent=researcher,
+        expected_output="A faithful, verbatim reproduction of the source document's content, maintaining original structure, wording, and data."
+    )
+    creation_task = ResearchTasks.create_content_creation_task(content_creator, research_task, "")
+    formatting_task = ResearchTasks.create_formatting_task(formatter, creation_task)
+
+    crew = ResearchCrews.create_research_to_content_crew(
+        agents=[researcher, content_creator, formatter],
+        tasks=[research_task, creation_task, formatting_task]
+    )
+    with span('crew.kickoff', crew='research_to_content'):
+        return crew.kickoff()
+
+
+def export_research_result(result, filename_base, export_dir, formats, index_dir='exports'):
+    """Render the crew's result in each format and add the files to the originality index."""
+    outputs = export_document(str(result), filename_base, export_dir, formats)
+    if outputs:
+        get_originality_index(str(index_dir)).index_directory(export_dir)
+    return outputs
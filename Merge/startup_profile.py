@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Startup timing for the Streamlit app.
+
+Inside the app, ``step(label)`` times a phase of startup or a page's first
+module load and keeps the result for the life of the process, so the
+sidebar can show where a cold start went (set ``STARTUP_PROFILE=1``).
+
+Run as a script, it reports the slowest imports of the app module and of
+each page's modules using ``python -X importtime`` in a fresh interpreter:
+
+    python Merge/startup_profile.py --top 15 --json startup.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+ENABLED = os.getenv('STARTUP_PROFILE', '0') == '1'
+PROCESS_START = time.perf_counter()
+
+_steps = []
+_lock = threading.Lock()
+
+
+@contextmanager
+def step(label):
+    """Time a startup phase; each label is recorded once per process."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            first = not any(existing == label for existing, _, _ in _steps)
+            if first:
+                _steps.append((label, start - PROCESS_START, elapsed))
+        if first and ENABLED:
+            print(f"[startup] {label}: {elapsed * 1000:.0f} ms")
+
+
+def steps():
+    """Return ``[(label, started_at_s, duration_s)]`` in the order they ran."""
+    with _lock:
+        return list(_steps)
+
+
+# Modules each page needs, for the command-line report
+PAGE_IMPORTS = {
+    'startup': ['streamlit', 'app'],
+    'AI Blog Writer': ['blog_pipeline', 'blog_export', 'sections', 'content_checks', 'originality', 'agents'],
+    'Bulk Blog Generator': ['batch', 'agents'],
+    'Research PDF Converter': ['text_processing', 'document', 'pdf_preview', 'originality', 'crewai'],
+}
+
+
+def parse_importtime(stderr):
+    """Parse ``-X importtime`` output into ``{module: (self_us, cumulative_us)}``."""
+    timings = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            timings[name.strip()] = (int(self_us), int(cumulative_us))
+        except ValueError:
+            continue
+    return timings
+
+
+def profile_imports(modules, cwd=None):
+    """Import ``modules`` in a fresh interpreter; return wall time and per-module timings."""
+    code = 'import importlib\n' + ''.join(f'importlib.import_module({name!r})\n' for name in modules)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [
+        os.path.dirname(os.path.abspath(__file__)),
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        os.environ.get('PYTHONPATH'),
+    ])))
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        capture_output=True, text=True, cwd=cwd, env=env
+    )
+    wall = time.perf_counter() - start
+    error = result.stderr.strip().splitlines()[-1] if result.returncode else None
+    return {'wall_s': wall, 'error': error, 'timings': parse_importtime(result.stderr)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report the slowest imports of each app page.")
+    parser.add_argument('--top', type=int, default=10, help="Modules to list per page")
+    parser.add_argument('--json', help="Also write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for page, modules in PAGE_IMPORTS.items():
+        result = profile_imports(modules)
+        top_level = {name: result['timings'].get(name, (0, 0))[1] for name in modules}
+        slowest = sorted(result['timings'].items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+        report[page] = {
+            'wall_s': round(result['wall_s'], 3),
+            'error': result['error'],
+            'modules_ms': {name: round(us / 1000, 1) for name, us in top_level.items()},
+            'slowest_ms': [(name, round(cumulative / 1000, 1)) for name, (_, cumulative) in slowest],
+        }
+
+        print(f"\n{page}: {result['wall_s']:.2f}s in a fresh interpreter")
+        if result['error']:
+            print(f"  import failed: {result['error']}")
+        for name, ms in report[page]['modules_ms'].items():
+            print(f"  {name:<40} {ms:>9.1f} ms")
+        print("  slowest (cumulative):")
+        for name, ms in report[page]['slowest_ms']:
+            print(f"    {name:<38} {ms:>9.1f} ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
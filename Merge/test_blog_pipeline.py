@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Smoke test: build the blog pipeline's tasks with the BlogAgents the Merge app loads.
+"""
+
+import os
+import sys
+
+# Never reach Gemini from a smoke test
+os.environ.setdefault('LLM_BACKEND', 'synthetic')
+os.environ.setdefault('TRACE_ENABLED', '0')
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+sys.path.insert(0, os.path.dirname(current_dir))
+
+INPUTS = {
+    'topic': 'Electrical resistance',
+    'audience': 'Students',
+    'tone': 'Conversational',
+    'industry': 'Education',
+    'blog_type': 'How-to',
+    'content_goal': 'Educate',
+    'word_limit': 800,
+}
+
+
+def test_pipeline_builds_with_merge_blog_agents():
+    try:
+        from blog_pipeline import (
+            build_writer_prompt, create_nlp_task, create_research_task, create_writing_task
+        )
+        from llm_pool import bundle_agent, bundle_llm, get_agent_pool
+        from module_loader import load_modules
+
+        BlogAgents = load_modules('blog')['BlogAgents']
+    except (ImportError, OSError) as e:
+        print(f"⚠ Skipped, the blog crew is not importable here: {e}")
+        return
+
+    with get_agent_pool(BlogAgents).lease() as blog_agents:
+        create_research_task(bundle_agent(blog_agents, 'research'), INPUTS)
+        create_nlp_task(bundle_agent(blog_agents, 'nlp'), INPUTS)
+        writer_agent = bundle_agent(blog_agents, 'writer')
+        prompt = build_writer_prompt(writer_agent, create_writing_task(writer_agent, INPUTS), 'context')
+        assert 'Word Limit: 800 words' in prompt
+        assert bundle_agent(blog_agents, 'plagiarism_checker') is not None
+        assert hasattr(bundle_llm(blog_agents), 'stream')
+
+
+if __name__ == "__main__":
+    test_pipeline_builds_with_merge_blog_agents()
+    print("✓ test_pipeline_builds_with_merge_blog_agents")
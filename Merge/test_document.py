@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Test script to verify markdown parsing and HTML rendering of the document model.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('TRACE_ENABLED', '0')
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+sys.path.insert(0, os.path.dirname(current_dir))
+
+from document import ListBlock, parse_markdown, render_html
+
+
+def test_marker_change_starts_new_list():
+    blocks = parse_markdown('- one\n- two\n1. a\n2. b')
+    assert [(b.ordered, len(b.items)) for b in blocks] == [(False, 2), (True, 2)]
+    assert render_html(blocks) == '<ul><li>one</li><li>two</li></ul>\n<ol><li>a</li><li>b</li></ol>'
+
+
+def test_nested_list_stays_in_its_parent():
+    blocks = parse_markdown('1. a\n  - nested\n2. b')
+    assert len(blocks) == 1 and isinstance(blocks[0], ListBlock)
+    assert [depth for depth, _ in blocks[0].items] == [0, 1, 0]
+
+
+def test_only_safe_links_are_rendered():
+    html = render_html(parse_markdown(
+        '[site](https://example.com) [mail](mailto:a@example.com) [bad](javascript:alert(1)) [x](JavaScript:x)'
+    ))
+    assert '<a href="https://example.com">site</a>' in html
+    assert '<a href="mailto:a@example.com">mail</a>' in html
+    assert 'javascript' not in html.lower()
+    assert 'bad' in html and 'x' in html
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith('test_'):
+            test()
+            print(f"✓ {name}")
+    print("All document tests passed!")
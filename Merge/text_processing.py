@@ -0,0 +1,351 @@
+"""
+Text decoding and cleanup for extracted PDF text.
+
+Kept free of Streamlit so the functions can be benchmarked and reused
+outside the app.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import pickle
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from chardet.universaldetector import UniversalDetector
+from PyPDF2 import PdfReader
+
+from tracing import span
+
+
+DETECT_SAMPLE_BYTES = int(os.getenv('ENCODING_SAMPLE_KB', '64')) * 1024
+DETECT_CHUNK_BYTES = 4096
+DETECT_CACHE_SIZE = 256
+# Sample slices are moved to the next space so they do not start or end inside a character
+_ALIGN_WINDOW = 256
+
+_detect_cache = OrderedDict()
+_detect_lock = threading.Lock()
+
+
+def page_workers_for(sharing=1):
+    """Page pool size for one of ``sharing`` processes extracting at once on this host (``PDF_WORKERS`` overrides)."""
+    return int(os.getenv('PDF_WORKERS', '0')) or max(1, (os.cpu_count() or 1) // max(1, sharing))
+
+
+PDF_WORKERS = page_workers_for()
+# Below this many pages, starting the pool costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '16'))
+
+_page_pool = None
+_page_pool_size = 0
+_page_workers = PDF_WORKERS
+_page_pool_lock = threading.Lock()
+_worker_reader = None
+
+
+def _align(data, pos):
+    space = data.find(b' ', pos, pos + _ALIGN_WINDOW)
+    return pos if space == -1 else space
+
+
+def encoding_sample(text_bytes, size=DETECT_SAMPLE_BYTES):
+    """Up to ``size`` bytes taken from the start, middle and end of ``text_bytes``."""
+    if len(text_bytes) <= size:
+        return text_bytes
+    part = size // 3
+    middle = _align(text_bytes, (len(text_bytes) - part) // 2)
+    tail = _align(text_bytes, len(text_bytes) - part)
+    return b''.join((
+        text_bytes[:_align(text_bytes, part)],
+        text_bytes[middle:_align(text_bytes, middle + part)],
+        text_bytes[tail:],
+    ))
+
+
+def detect_encoding(text_bytes, use_cache=True):
+    """
+    Detect the encoding of the given bytes from a bounded sample.
+
+    The sample is fed to chardet's incremental detector in chunks, stopping
+    as soon as it is confident. Verdicts are cached by the sample's hash,
+    so a document is detected once however many panels or reruns ask.
+    Returns chardet's ``{'encoding', 'confidence', 'language'}`` dict.
+    """
+    sample = encoding_sample(text_bytes)
+    key = hashlib.sha1(sample).digest()
+    if use_cache:
+        with _detect_lock:
+            cached = _detect_cache.get(key)
+            if cached is not None:
+                _detect_cache.move_to_end(key)
+                return dict(cached)
+
+    with span('text.detect_encoding', bytes=len(text_bytes), sample_bytes=len(sample)) as detect_span:
+        detector = UniversalDetector()
+        fed = 0
+        while fed < len(sample) and not detector.done:
+            detector.feed(sample[fed:fed + DETECT_CHUNK_BYTES])
+            fed += DETECT_CHUNK_BYTES
+        result = detector.close()
+        detect_span.set(fed_bytes=min(fed, len(sample)), encoding=result['encoding'])
+
+    with _detect_lock:
+        _detect_cache[key] = result
+        _detect_cache.move_to_end(key)
+        while len(_detect_cache) > DETECT_CACHE_SIZE:
+            _detect_cache.popitem(last=False)
+    return dict(result)
+
+
+# Glyph codes of legacy (pre-Unicode) Devanagari fonts, as PyPDF2 extracts them,
+# and the Devanagari they stand for
+LEGACY_DEVANAGARI = {
+    '(R)': 'र',
+    '+/-': 'ल',
+    'ú': 'र', 'û': 'र', 'ü': 'र', 'ý': 'र',
+    'É': 'ा',
+    'è': 'ै', 'é': 'ै', 'ê': 'ै', 'ë': 'ै', 'ì': 'ै', 'í': 'ै', 'î': 'ै', 'ï': 'ै', 'ð': 'ै', 'ñ': 'ै',
+    'ù': 'द',
+    'þ': 'ह', '½': 'ह', 'ÿ': 'ह',
+    'ò': 'क', 'ó': 'क', 'ô': 'क',
+    'ä': 'े', 'å': 'े',
+    'æ': 'ो', 'ç': 'ो',
+    'Î': 'ि', 'Ê': 'ि',
+    'õ': 'ट', 'ö': 'ट', '÷': 'ट', 'ø': 'ट',
+    '¨': 'म',
+    'º': 'स',
+    'Æ': 'ं',
+    'Ç': 'च',
+    'ª': 'य',
+    '¦': 'भ',
+    'P': 'श',
+    'Ò': 'ी', 'Ó': 'ी', 'Ô': 'ी', 'Õ': 'ी', 'Ö': 'ी', '×': 'ी', 'Ø': 'ी', 'Ù': 'ी', 'Ú': 'ी',
+    'Û': 'ी', 'Ü': 'ी', 'Ý': 'ी', 'Þ': 'ी', 'ß': 'ी', 'à': 'ी', 'á': 'ी', 'â': 'ी', 'ã': 'ी',
+}
+
+# Glyphs that mark a page as set in a legacy font
+INDIC_MARKERS = 'ÉúùþòäæÎõ'
+
+# Legacy fonts store the 'ि' matra before its consonant (cluster), where it is
+# drawn; Unicode puts it after. Legacy matras are translated to a sentinel (a
+# Unicode noncharacter, which extracted text does not contain) first, so only
+# they are moved and Unicode 'ि' already on the page stays where it is. A cluster is consonants joined by virama, each with an
+# optional nukta.
+_LEGACY_I_MATRA = '\uFDD0'
+_CONSONANT = '[\u0915-\u0939\u0958-\u095F]\u093C?'
+_PRE_BASE_MATRA_RE = re.compile(f'{_LEGACY_I_MATRA}((?:{_CONSONANT}\u094D)*{_CONSONANT})')
+
+# Compiled once: single glyphs go through str.translate, and the multi-character
+# glyphs through one alternation, longest first, so a longer sequence always wins
+_GLYPH_TABLE = str.maketrans({
+    k: _LEGACY_I_MATRA if v == '\u093F' else v for k, v in LEGACY_DEVANAGARI.items() if len(k) == 1
+})
+_MULTI_GLYPHS = {k: v for k, v in LEGACY_DEVANAGARI.items() if len(k) > 1}
+_MULTI_GLYPH_RE = re.compile('|'.join(map(re.escape, sorted(_MULTI_GLYPHS, key=len, reverse=True))))
+_INDIC_MARKER_RE = re.compile(f'[{re.escape(INDIC_MARKERS)}]')
+
+
+def transcode_legacy_devanagari(text):
+    """Convert legacy-font glyph codes to Unicode Devanagari, with the legacy 'ि' matra moved after its consonant."""
+    text = _MULTI_GLYPH_RE.sub(lambda m: _MULTI_GLYPHS[m.group()], text)
+    text = text.translate(_GLYPH_TABLE)
+    text = _PRE_BASE_MATRA_RE.sub(f'\\1{_LEGACY_I_MATRA}', text)
+    return text.replace(_LEGACY_I_MATRA, '\u093F')
+
+
+def decode_indic_text(text):
+    """
+    Return extracted PDF text as Unicode, transcoding legacy-font Devanagari.
+
+    Text extracted by PyPDF2 is already a str, so only pages with legacy
+    glyph codes are changed. Bytes are decoded with the detected encoding.
+    """
+    if isinstance(text, bytes):
+        detected = detect_encoding(text)
+        try:
+            text = text.decode(detected['encoding'] or 'utf-8')
+        except (LookupError, UnicodeDecodeError):
+            text = text.decode('utf-8', errors='replace')
+    if _INDIC_MARKER_RE.search(text):
+        text = transcode_legacy_devanagari(text)
+    return text
+
+
+def normalize_text(text):
+    """Normalize text by removing control characters and normalizing whitespace."""
+    # Remove control characters except newlines and tabs
+    text = ''.join(char for char in text if char.isprintable() or char in '\n\t')
+    
+    # Normalize whitespace
+    text = re.sub(r'\s+', ' ', text)
+    
+    # Fix common encoding artifacts
+    text = text.replace('â€™', "'")
+    text = text.replace('â€œ', '"')
+    text = text.replace('â€', '"')
+    text = text.replace('Â', '')
+    
+    # Fix common Indic text artifacts
+    text = text.replace('degü', 'deg')
+    text = text.replace('(c)', '©')
+    text = re.sub(r'\s+', ' ', text)  # Remove multiple spaces
+    text = re.sub(r'\n\s*\n', '\n\n', text)  # Normalize multiple newlines
+    
+    return text.strip()
+
+
+def _exit_with_parent(parent):
+    parent.join()
+    os._exit(0)
+
+
+def _init_page_worker():
+    # Pool workers block on their task queue, so they would outlive a killed parent
+    parent = multiprocessing.parent_process()
+    if parent is not None:
+        threading.Thread(target=_exit_with_parent, args=(parent,), daemon=True).start()
+
+
+def set_page_workers(workers):
+    """Set the default page pool size for this process; a pool already started keeps its size."""
+    global _page_workers
+    _page_workers = max(1, int(workers))
+
+
+def _get_page_pool(workers):
+    """
+    Return ``(pool, size)`` for the process-wide page pool, starting it with ``workers`` processes.
+
+    The pool is shared by concurrent extractions, so it is never resized or
+    shut down on behalf of one caller; only a broken pool is replaced.
+    """
+    global _page_pool, _page_pool_size
+    with _page_pool_lock:
+        if _page_pool is None:
+            _page_pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_page_worker
+            )
+            _page_pool_size = workers
+        return _page_pool, _page_pool_size
+
+
+def _reset_page_pool(pool):
+    global _page_pool
+    with _page_pool_lock:
+        if _page_pool is pool:
+            _page_pool = None
+
+
+def _process_page(reader, index, clean=None):
+    """Return ``(raw_text, normalized_text, timings)`` for one page, or None if it has no text."""
+    started = time.perf_counter()
+    page_text = reader.pages[index].extract_text()
+    extracted = time.perf_counter()
+    if not page_text:
+        return None
+    normalized_text = normalize_text(decode_indic_text(page_text))
+    if clean is not None:
+        normalized_text = clean(normalized_text)
+    return page_text, normalized_text, {
+        'extract_ms': round((extracted - started) * 1000, 1),
+        'process_ms': round((time.perf_counter() - extracted) * 1000, 1),
+    }
+
+
+def _process_page_in_worker(path, index, clean):
+    # Each worker parses the document once and keeps it for the pages that follow
+    global _worker_reader
+    if _worker_reader is None or _worker_reader[0] != path:
+        _worker_reader = (path, PdfReader(path))
+    return _process_page(_worker_reader[1], index, clean)
+
+
+def _picklable(fn):
+    try:
+        pickle.dumps(fn)
+        return True
+    except Exception:
+        return False
+
+
+def _iter_pages_serial(pdf_reader, clean):
+    for index in range(len(pdf_reader.pages)):
+        # Spans close before each yield so the caller's work is not attributed to them
+        with span('pdf.page', page=index + 1) as page_span:
+            result = _process_page(pdf_reader, index, clean)
+            if result is not None:
+                page_span.set(chars=len(result[0]), **result[2])
+        if result is not None:
+            yield index + 1, result[0], result[1]
+
+
+def _iter_pages_parallel(pdf_bytes, page_count, workers, clean, max_in_flight):
+    pool, size = _get_page_pool(workers)
+    max_in_flight = max_in_flight or 2 * size
+    pending = deque()
+    fd, path = tempfile.mkstemp(suffix='.pdf')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(pdf_bytes)
+        next_index = 0
+        while pending or next_index < page_count:
+            while next_index < page_count and len(pending) < max_in_flight:
+                pending.append((next_index, pool.submit(_process_page_in_worker, path, next_index, clean)))
+                next_index += 1
+            index, future = pending.popleft()
+            # The span covers the wait for this page; the worker's own timings are attributes
+            with span('pdf.page', page=index + 1, parallel=True) as page_span:
+                try:
+                    result = future.result()
+                except BrokenProcessPool:
+                    _reset_page_pool(pool)
+                    raise
+                if result is not None:
+                    page_span.set(chars=len(result[0]), **result[2])
+            if result is not None:
+                yield index + 1, result[0], result[1]
+    finally:
+        for _, future in pending:
+            future.cancel()
+        os.remove(path)
+
+
+def iter_pdf_pages(pdf_bytes, workers=None, clean=None, max_in_flight=None):
+    """
+    Yield ``(page_number, raw_text, normalized_text)`` for each PDF page with text, in page order.
+
+    Pages are extracted, decoded with ``decode_indic_text``, normalized and,
+    if given, passed through ``clean``. Documents of ``PDF_PARALLEL_MIN_PAGES``
+    pages or more are spread over the process's page pool, started with
+    ``workers`` processes (default ``PDF_WORKERS``, or the share set with
+    ``set_page_workers``); ``workers=1`` keeps them in this process. At most
+    ``max_in_flight`` pages (default twice the pool size) are submitted
+    ahead of the one being yielded, so the first pages arrive straight away
+    and memory stays bounded.
+    """
+    workers = workers or _page_workers
+    with span('pdf.open', bytes=len(pdf_bytes)) as open_span:
+        pdf_reader = PdfReader(io.BytesIO(pdf_bytes))
+        page_count = len(pdf_reader.pages)
+        parallel = workers > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+        open_span.set(pages=page_count, workers=workers if parallel else 1)
+
+    if clean is not None and parallel and not _picklable(clean):
+        # e.g. a class that module_loader loaded from its file; the workers
+        # extract and normalize, and this process cleans what they return
+        for i, page_text, normalized_text in _iter_pages_parallel(
+            pdf_bytes, page_count, workers, None, max_in_flight
+        ):
+            yield i, page_text, clean(normalized_text)
+    elif parallel:
+        yield from _iter_pages_parallel(pdf_bytes, page_count, workers, clean, max_in_flight)
+    else:
+        yield from _iter_pages_serial(pdf_reader, clean)
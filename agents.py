@@ -1,22 +1,20 @@
 from crewai import Agent
 from textwrap import dedent
-import google.generativeai as genai
-from dotenv import load_dotenv
-import os
-from langchain_google_genai import ChatGoogleGenerativeAI
-
-load_dotenv()
+from llm_pool import configure_genai, create_chat_llm
 
 # Configure Gemini API
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
+configure_genai()
 
 class BlogAgents:
-    def __init__(self):
-        self.llm = ChatGoogleGenerativeAI(
-            model="gemini-2.0-flash",
-            google_api_key=os.getenv('GOOGLE_API_KEY'),
-            temperature=0.7
-        )
+    def __init__(self, llm=None):
+        self.llm = llm or create_chat_llm(model="gemini-2.0-flash", temperature=0.7)
+        self._agents = {}
+
+    def get_agent(self, name):
+        """Return a reusable agent by name, e.g. 'research' or 'plagiarism_checker'."""
+        if name not in self._agents:
+            self._agents[name] = getattr(self, f'create_{name}_agent')()
+        return self._agents[name]
 
     def create_research_agent(self):
         return Agent(
@@ -1,34 +1,22 @@
+import os
+import sys
+import uuid
 import streamlit as st
-from crewai import Crew, Task
+from crewai import Task
 from agents import BlogAgents
-from PyPDF2 import PdfWriter
-import tempfile
-import os
+from llm_pool import INTERACTIVE_LEASE_TIMEOUT, PoolTimeout, get_agent_pool, get_generative_model
+from blog_export import render_blog
 from datetime import datetime
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-from reportlab.lib.units import inch
-import google.generativeai as genai
 from dotenv import load_dotenv
-import re
 
-load_dotenv()
+# Blog generation runs as a background job (see Merge/jobs.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Merge'))
+import job_client
 
-# Configure Gemini API
-genai.configure(api_key=os.getenv('GOOGLE_API_KEY'))
-model = genai.GenerativeModel('gemini-2.0-flash')
+load_dotenv()
 
-def clean_markdown(text):
-    # Remove markdown headers
-    text = re.sub(r'^#+\s*', '', text, flags=re.MULTILINE)
-    # Remove bold/italic markers
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text)
-    text = re.sub(r'\*(.*?)\*', r'\1', text)
-    # Remove any remaining markdown symbols
-    text = re.sub(r'[#*_~`]', '', text)
-    return text
+# Shared Gemini model, configured once per process
+model = get_generative_model('gemini-2.0-flash')
 
 st.set_page_config(page_title="AI Blog Writer", page_icon="✍️", layout="wide")
 
@@ -88,194 +76,88 @@ with col2:
         help="Set the desired word count for the generated blog post."
     )
 
-if st.button("Generate Blog"):
-    if topic:
-        with st.spinner("Generating your blog post..."):
-            # Initialize agents
-            blog_agents = BlogAgents()
-            research_agent = blog_agents.create_research_agent()
-            nlp_agent = blog_agents.create_nlp_agent()
-            writer_agent = blog_agents.create_writer_agent()
-
-            # Create tasks
-            research_task = Task(
-                description=f"""Research and gather information about: {topic}
-                Target Audience: {audience}
-                Industry/Domain: {industry}
-                Blog Type: {blog_type}
-                Content Goal: {content_goal}""",
-                agent=research_agent,
-                expected_output="A detailed research report containing key information, facts, and data points about the topic."
-            )
-
-            nlp_task = Task(
-                description=f"""Process and analyze the gathered information using NLP techniques.
-                Consider the following parameters:
-                - Target Audience: {audience}
-                - Writing Tone: {tone}
-                - Industry/Domain: {industry}
-                - Blog Type: {blog_type}
-                - Content Goal: {content_goal}""",
-                agent=nlp_agent,
-                expected_output="An analyzed and processed version of the research data, optimized for the target audience and content goals."
-            )
+use_stage_cache = st.checkbox(
+    "Reuse cached research",
+    value=True,
+    help="Skip the research and NLP agents when their inputs have not changed since an earlier run."
+)
 
-            writing_task = Task(
-                description=f"""Write an engaging blog post based on the processed information.
-                Follow these guidelines:
-                - Target Audience: {audience}
-                - Writing Tone: {tone}
-                - Industry/Domain: {industry}
-                - Blog Type: {blog_type}
-                - Content Goal: {content_goal}
-                - Word Limit: {word_limit} words (strictly adhere to this range)
-                Ensure the content is well-structured and meets the specified requirements.""",
-                agent=writer_agent,
-                expected_output="A complete, well-structured blog post that meets all specified requirements and guidelines."
-            )
+def session_owner():
+    """Id of this browser's user, for fair scheduling of their jobs; kept in the URL."""
+    owner = st.query_params.get('user')
+    if not owner:
+        owner = uuid.uuid4().hex[:12]
+        st.query_params['user'] = owner
+    return owner
 
-            # Create and run the crew
-            crew = Crew(
-                agents=[research_agent, nlp_agent, writer_agent],
-                tasks=[research_task, nlp_task, writing_task],
-                verbose=True
-            )
+if st.button("Generate Blog"):
+    if topic:
+        inputs = {
+            'topic': topic,
+            'audience': audience,
+            'tone': tone,
+            'industry': industry,
+            'blog_type': blog_type,
+            'content_goal': content_goal,
+            'word_limit': word_limit,
+        }
+        # The page renders its own styled exports, so the job only writes the HTML
+        job = job_client.submit_blog(
+            inputs, owner=session_owner(), use_cache=use_stage_cache, formats=['html'], agents='root'
+        )
+        # The job id lives in the URL, so a refresh follows the same job instead of starting over
+        st.query_params['blog_job'] = job['id']
+    else:
+        st.error("Please enter a topic to generate a blog post.")
 
-            result = crew.kickoff()
-            
+job_id = st.query_params.get('blog_job')
+if job_id:
+    with st.spinner("Generating your blog post..."):
+        try:
+            job = job_client.wait_for_job(job_id)
+        except job_client.ApiError as e:
+            st.error(f"Blog generation failed: {str(e)}")
+        else:
             # Store results in session state
-            st.session_state.blog_content = result
+            st.session_state.blog_content = job['result']['content']
             st.session_state.content_analysis = None
-
-    else:
-        st.error("Please enter a topic to generate a blog post.")
+    del st.query_params['blog_job']
 
 # Display results
 if st.session_state.blog_content:
     st.subheader("Generated Blog Post")
     st.write(st.session_state.blog_content)
 
-    # Clean markdown from content
-    cleaned_content = clean_markdown(st.session_state.blog_content)
-
-    # Create HTML preview
-    html_template = """
-    <html>
-        <head>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 40px;
-                    line-height: 1.6;
-                }}
-                h1 {{
-                    color: #2c3e50;
-                    font-size: 24px;
-                    margin-bottom: 20px;
-                }}
-                p {{
-                    margin-bottom: 15px;
-                }}
-                .section {{
-                    margin-bottom: 25px;
-                }}
-            </style>
-        </head>
-        <body>
-            <h1>{0}</h1>
-            <div class="content">
-                {1}
-            </div>
-        </body>
-    </html>
-    """
-    
-    html_content = html_template.format(
-        topic,
-        cleaned_content.replace('\n', '<br>')
-    )
-
-    # Create temporary files
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.html', mode='w') as f:
-        f.write(html_content)
-        html_path = f.name
-
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as f:
-        pdf_path = f.name
-
-    # Generate PDF using reportlab
+    # Rendered bytes are cached by content hash, so reruns skip the PDF build
     try:
-        # Create the PDF document
-        doc = SimpleDocTemplate(
-            pdf_path,
-            pagesize=letter,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72
-        )
-
-        # Create styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=30
-        )
-        body_style = ParagraphStyle(
-            'CustomBody',
-            parent=styles['Normal'],
-            fontSize=12,
-            spaceAfter=12
-        )
-
-        # Create content
-        content = []
-        content.append(Paragraph(topic, title_style))
-        content.append(Spacer(1, 12))
-
-        # Add the blog content
-        for paragraph in cleaned_content.split('\n\n'):
-            if paragraph.strip():
-                content.append(Paragraph(paragraph, body_style))
-                content.append(Spacer(1, 12))
-
-        # Build the PDF
-        doc.build(content)
+        html_bytes = render_blog(topic, st.session_state.blog_content, 'html', style='styled')
+        pdf_bytes = render_blog(topic, st.session_state.blog_content, 'pdf', style='styled')
         
         # Display preview and download options
         col1, col2 = st.columns(2)
         
         with col1:
             st.subheader("HTML Preview")
-            st.components.v1.html(html_content, height=600, scrolling=True)
+            st.components.v1.html(html_bytes.decode('utf-8'), height=600, scrolling=True)
             
         with col2:
             st.subheader("Download Options")
-            with open(html_path, 'rb') as f:
-                st.download_button(
-                    label="Download HTML",
-                    data=f,
-                    file_name=f"blog_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
-                    mime="text/html"
-                )
+            st.download_button(
+                label="Download HTML",
+                data=html_bytes,
+                file_name=f"blog_{datetime.now().strftime('%Y%m%d_%H%M%S')}.html",
+                mime="text/html"
+            )
             
-            with open(pdf_path, 'rb') as f:
-                st.download_button(
-                    label="Download PDF",
-                    data=f,
-                    file_name=f"blog_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                    mime="application/pdf"
-                )
+            st.download_button(
+                label="Download PDF",
+                data=pdf_bytes,
+                file_name=f"blog_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+                mime="application/pdf"
+            )
 
     except Exception as e:
         st.error(f"Error generating PDF: {str(e)}")
-    
-    finally:
-        # Clean up temporary files
-        os.unlink(html_path)
-        os.unlink(pdf_path)
 
     # Add content analysis and plagiarism check buttons
     col1, col2 = st.columns(2)
@@ -300,27 +182,30 @@ if st.session_state.blog_content:
     with col2:
         if st.button("Check Plagiarism"):
             with st.spinner("Checking for plagiarism..."):
-                # Initialize plagiarism checker agent
-                blog_agents = BlogAgents()
-                plagiarism_agent = blog_agents.create_plagiarism_checker_agent()
-                
-                # Create plagiarism check task
-                plagiarism_task = Task(
-                    description=f"""Analyze the following content and provide:
-                    1. A plagiarism score (0-100, where 100 is completely original)
-                    2. Detailed analysis of writing patterns
-                    3. Specific areas that might need improvement
-                    4. Recommendations for enhancing originality
-
-                    Content to analyze:
-                    {st.session_state.blog_content}
-                    """,
-                    agent=plagiarism_agent
-                )
-                
-                # Run the plagiarism check
-                result = plagiarism_task.execute()
-                st.session_state.plagiarism_score = result
+                try:
+                    with get_agent_pool(BlogAgents).lease(INTERACTIVE_LEASE_TIMEOUT) as blog_agents:
+                        plagiarism_agent = blog_agents.get_agent('plagiarism_checker')
+                    
+                        # Create plagiarism check task
+                        plagiarism_task = Task(
+                            description=f"""Analyze the following content and provide:
+                        1. A plagiarism score (0-100, where 100 is completely original)
+                        2. Detailed analysis of writing patterns
+                        3. Specific areas that might need improvement
+                        4. Recommendations for enhancing originality
+
+                        Content to analyze:
+                        {st.session_state.blog_content}
+                        """,
+                            agent=plagiarism_agent
+                        )
+                    
+                        # Run the plagiarism check
+                        result = plagiarism_task.execute()
+                except PoolTimeout:
+                    st.warning("All writers are busy right now. Please try again in a moment.")
+                else:
+                    st.session_state.plagiarism_score = result
 
     # Display content analysis if available
     if st.session_state.content_analysis:
@@ -0,0 +1,245 @@
+"""
+Bulk blog generation.
+
+Reads blog topics and customization options from a CSV or JSONL file and
+runs the blog crew for each row with bounded concurrency and per-row
+retries. HTML/PDF files are written to the output directory as each row
+finishes, and progress is recorded next to them so an interrupted batch
+picks up where it left off when run again.
+
+Usage:
+    python batch.py topics.csv --workers 4 --retries 2 --format both
+"""
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from blog_export import render_blog_formats
+from blog_pipeline import generate_blog
+from llm_pool import POOL_SIZE, get_agent_pool
+from originality import get_originality_index
+from rate_limit import priority
+from sections import create_draft, draft_content, fit_to_length
+from tracing import start_run
+
+# Defaults match the first option of each selectbox on the Blog Writer page
+DEFAULT_INPUTS = {
+    'audience': 'Student',
+    'tone': 'Conversational',
+    'industry': 'EdTech',
+    'blog_type': 'How-to Guide',
+    'content_goal': 'Educate',
+    'word_limit': 1000,
+}
+INPUT_FIELDS = ('topic',) + tuple(DEFAULT_INPUTS)
+PROGRESS_FILE = 'batch_progress.jsonl'
+
+
+def parse_rows(text, fmt):
+    """Parse CSV or JSONL text into a list of blog input dicts."""
+    if fmt == 'jsonl':
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+    elif fmt == 'csv':
+        records = list(csv.DictReader(io.StringIO(text)))
+    else:
+        raise ValueError(f"Unsupported batch file format: {fmt}")
+
+    rows = []
+    for number, record in enumerate(records, 1):
+        record = {str(k).strip(): v for k, v in record.items() if k is not None}
+        topic = str(record.get('topic') or '').strip()
+        if not topic:
+            raise ValueError(f"Row {number} has no topic")
+        row = dict(DEFAULT_INPUTS)
+        row.update({
+            k: str(v).strip() for k, v in record.items()
+            if k in INPUT_FIELDS and v is not None and str(v).strip()
+        })
+        row['topic'] = topic
+        row['word_limit'] = int(row['word_limit'])
+        rows.append(row)
+    return rows
+
+
+def load_rows(path):
+    path = Path(path)
+    fmt = 'jsonl' if path.suffix.lower() in ('.jsonl', '.ndjson') else 'csv'
+    return parse_rows(path.read_text(encoding='utf-8'), fmt)
+
+
+def row_id(row):
+    """Stable id for a row, used to skip rows already finished in an earlier run."""
+    payload = json.dumps({k: row[k] for k in INPUT_FIELDS}, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def _slugify(text, max_length=60):
+    slug = re.sub(r'[^A-Za-z0-9]+', '-', text).strip('-').lower()
+    return slug[:max_length] or 'blog'
+
+
+def _write_atomic(path, write):
+    tmp_path = path.with_name(path.name + '.part')
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def row_base_name(index, row):
+    """File name, without extension, of a row's outputs."""
+    return f"{index:04d}_{_slugify(row['topic'])}"
+
+
+class BatchProgress:
+    """
+    Append-only record of rows in ``<out_dir>/batch_progress.jsonl``.
+
+    ``done`` holds finished rows. ``jobs`` holds rows handed to a background
+    job that has not finished yet (status 'submitted'), so a page that was
+    closed can follow the same job again.
+    """
+
+    def __init__(self, out_dir):
+        self.path = Path(out_dir) / PROGRESS_FILE
+        self._lock = threading.Lock()
+        self.done = {}
+        self.jobs = {}
+        if self.path.exists():
+            for line in self.path.read_text(encoding='utf-8').splitlines():
+                if not line.strip():
+                    continue
+                self._apply(json.loads(line))
+
+    def _apply(self, entry):
+        if entry['status'] == 'done':
+            self.done[entry['row_id']] = entry
+        if entry['status'] == 'submitted':
+            self.jobs[entry['row_id']] = entry
+        else:
+            self.jobs.pop(entry['row_id'], None)
+
+    def record(self, entry):
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry) + '\n')
+            self._apply(entry)
+
+
+def export_blog(topic, content, out_dir, base_name, formats=('html', 'pdf')):
+    """Write the blog in each format and return the written paths."""
+    outputs = []
+    for fmt, data in render_blog_formats(topic, content, formats).items():
+        path = Path(out_dir) / f"{base_name}.{fmt}"
+        _write_atomic(path, lambda p: p.write_bytes(data))
+        outputs.append(str(path))
+    return outputs
+
+
+def _run_row(index, row, agent_pool, out_dir, formats, retries, use_cache, research_width, fit_length):
+    rid = row_id(row)
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            # Rows yield Gemini capacity to interactive requests
+            with start_run('batch_row', topic=row['topic'], attempt=attempt), priority('batch'):
+                with agent_pool.lease() as blog_agents:
+                    contexts = {}
+                    content = str(generate_blog(
+                        row, blog_agents, use_cache=use_cache, research_width=research_width, contexts=contexts
+                    ))
+                    if fit_length:
+                        draft, _ = fit_to_length(
+                            create_draft(content, row, research_width, contexts['writer']), blog_agents,
+                            use_cache=use_cache
+                        )
+                        content = draft_content(draft)
+                outputs = export_blog(row['topic'], content, out_dir, row_base_name(index, row), formats)
+            get_originality_index().add(content, source=f"blog:{row['topic']}", title=row['topic'])
+            return {'row_id': rid, 'index': index, 'topic': row['topic'], 'status': 'done',
+                    'attempts': attempt, 'outputs': outputs}
+        except Exception as e:
+            if attempt > retries:
+                return {'row_id': rid, 'index': index, 'topic': row['topic'], 'status': 'failed',
+                        'attempts': attempt, 'error': str(e)}
+            time.sleep(min(60, 2 ** attempt))
+
+
+def run_batch(rows, out_dir, agents_cls, workers=4, retries=2, formats=('html', 'pdf'), use_cache=True,
+              research_width=1, fit_length=False):
+    """
+    Generate a blog for every row, yielding a result dict as each row finishes.
+
+    Rows already marked done in the output directory's progress file are
+    yielded straight away with status 'skipped'.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    progress = BatchProgress(out_dir)
+    agent_pool = get_agent_pool(agents_cls, size=max(workers, POOL_SIZE))
+
+    pending = []
+    for index, row in enumerate(rows, 1):
+        rid = row_id(row)
+        if rid in progress.done:
+            yield dict(progress.done[rid], status='skipped', index=index)
+        else:
+            pending.append((index, row))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [
+            executor.submit(_run_row, index, row, agent_pool, out_dir, formats, retries, use_cache,
+                            research_width, fit_length)
+            for index, row in pending
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            result['finished_at'] = time.time()
+            progress.record(result)
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate blog posts in bulk from a CSV or JSONL file.")
+    parser.add_argument('input', help="CSV or JSONL file with a 'topic' column and optional customization columns")
+    parser.add_argument('--out', help="Output directory (default: exports/batch-<input name>)")
+    parser.add_argument('--workers', type=int, default=4, help="Rows generated concurrently")
+    parser.add_argument('--retries', type=int, default=2, help="Retries per row before it is marked failed")
+    parser.add_argument('--format', choices=['pdf', 'html', 'both'], default='both')
+    parser.add_argument('--no-cache', action='store_true', help="Do not reuse cached research/NLP outputs")
+    parser.add_argument('--research-width', type=int, default=1,
+                        help="Research this many sub-questions of each topic concurrently (1 = single pass)")
+    parser.add_argument('--fit-length', action='store_true',
+                        help="Trim or extend the sections that put a post off its word limit")
+    args = parser.parse_args(argv)
+
+    from agents import BlogAgents
+
+    rows = load_rows(args.input)
+    out_dir = Path(args.out) if args.out else Path('exports') / f"batch-{Path(args.input).stem}"
+    formats = ('html', 'pdf') if args.format == 'both' else (args.format,)
+
+    failed = 0
+    for result in run_batch(rows, out_dir, BlogAgents, workers=args.workers, retries=args.retries,
+                            formats=formats, use_cache=not args.no_cache,
+                            research_width=args.research_width, fit_length=args.fit_length):
+        if result['status'] == 'failed':
+            failed += 1
+            print(f"✗ [{result['index']}/{len(rows)}] {result['topic']}: {result['error']}")
+        else:
+            print(f"✓ [{result['index']}/{len(rows)}] {result['topic']} ({result['status']})")
+
+    print(f"Finished: {len(rows) - failed} of {len(rows)} rows written to {out_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,3 @@
+"""
+Benchmarks for the CPU-bound parts of the app.
+"""
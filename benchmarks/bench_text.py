@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Throughput and peak memory of the document-processing hot paths.
+
+Covers the research converter's text pipeline (``decode_indic_text``,
+the legacy Devanagari transcoder, encoding detection, ``normalize_text``
+and per-page PDF extraction, in one process and through the page pool)
+on English, legacy-font Hindi and mixed corpora, plus markdown-to-text
+and the reportlab PDF build. Each case reports the median time over ``--repeat`` runs, its
+throughput, and the peak memory of one extra run under tracemalloc.
+
+Results can be saved as JSON and compared against a stored baseline; a
+case that got slower or hungrier than the tolerance allows is reported as
+a regression and the exit status is 1. Each timed run is paired with a
+short calibration loop run just before it, and cases are compared by the
+median ratio of the two, so a slower or busier machine, or one whose speed
+drifts during the run, does not read as a regression. A baseline recorded on another
+machine or Python version is shown but not used as a gate.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_text --json results.json
+    python -m benchmarks.bench_text --save-baseline
+    python -m benchmarks.bench_text --quick
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Time the code itself, not trace export (set before anything imports tracing)
+os.environ.setdefault('TRACE_ENABLED', '0')
+
+from benchmarks.bench_document import make_markdown
+from benchmarks.corpora import KINDS, make_pdf, make_text
+from document import markdown_to_text, parse_markdown, render_pdf
+from Merge.text_processing import (
+    PDF_PARALLEL_MIN_PAGES, PDF_WORKERS, decode_indic_text, detect_encoding, iter_pdf_pages, normalize_text,
+    transcode_legacy_devanagari
+)
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'baseline.json'
+TEXT_WORDS = 20000
+PDF_PAGES = (1, 50, 500)
+# A long legacy-font circular, decoded page by page as iter_pdf_pages does
+CIRCULAR_PAGES = 300
+WORDS_PER_PAGE = 350
+QUICK_PDF_PAGES = (1, 50)
+POOL_WORKERS = max(2, PDF_WORKERS)
+# Short cases are repeated until they have run this long, so one slow run cannot skew the median
+MIN_CASE_SECONDS = 0.25
+
+
+def _calibration_work():
+    # Plain interpreter work (loops, dict and string operations), independent of the code under test
+    counts = {}
+    for i in range(50_000):
+        key = str(i % 97)
+        counts[key] = counts.get(key, 0) + i
+    return len(counts)
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _median_times(fn, repeat, min_seconds=0.0, max_runs=50):
+    """
+    Return ``(median seconds, median relative time)`` over at least ``repeat`` runs.
+
+    Runs continue until ``min_seconds`` have passed (up to ``max_runs``).
+    Each run is preceded by the calibration loop, and the relative time is
+    the run's time in units of that loop's.
+    """
+    times = []
+    ratios = []
+    while len(times) < repeat or (sum(times) < min_seconds and len(times) < max_runs):
+        calibration = _timed(_calibration_work)
+        times.append(_timed(fn))
+        ratios.append(times[-1] / calibration)
+    return statistics.median(times), statistics.median(ratios)
+
+
+def machine_id():
+    """CPU model and count, so baselines from other hardware are not used as a gate."""
+    model = platform.processor() or platform.machine()
+    try:
+        with open('/proc/cpuinfo') as f:
+            model = next(line.split(':', 1)[1].strip() for line in f if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    return f"{platform.machine()} {model} x{os.cpu_count()}"
+
+
+def _peak_memory(fn):
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(fn, repeat, units, unit_name):
+    seconds, relative = _median_times(fn, repeat, MIN_CASE_SECONDS)
+    return {
+        'seconds': seconds,
+        'relative': relative,
+        'units': units,
+        'unit': unit_name,
+        'throughput': units / seconds if seconds else None,
+        'peak_bytes': _peak_memory(fn),
+    }
+
+
+def cases(quick=False):
+    """Yield ``(name, fn, units, unit_name)`` for every benchmark case."""
+    for kind in KINDS:
+        text = make_text(kind, TEXT_WORDS)
+        mb = len(text.encode('utf-8')) / 1e6
+        yield f'decode_indic_text/{kind}', lambda t=text: decode_indic_text(t), mb, 'MB'
+        yield f'normalize_text/{kind}', lambda t=text: normalize_text(t), mb, 'MB'
+        # Uncached, as for a new document
+        data = decode_indic_text(text).encode('utf-8')
+        yield f'detect_encoding/{kind}', lambda d=data: detect_encoding(d, use_cache=False), len(data) / 1e6, 'MB'
+
+    hindi = make_text('hindi', TEXT_WORDS)
+    yield 'transcode_devanagari/hindi', lambda: transcode_legacy_devanagari(hindi), \
+        len(hindi.encode('utf-8')) / 1e6, 'MB'
+    pages = [make_text('hindi', WORDS_PER_PAGE, seed=page) for page in range(CIRCULAR_PAGES)]
+    yield f'decode_pages/{CIRCULAR_PAGES}p-hindi', lambda: [decode_indic_text(p) for p in pages], \
+        CIRCULAR_PAGES, 'pages'
+
+    for pages in (QUICK_PDF_PAGES if quick else PDF_PAGES):
+        pdf_bytes = make_pdf(pages).read_bytes()
+        yield f'pdf_extract/{pages}p', lambda b=pdf_bytes: list(iter_pdf_pages(b, workers=1)), pages, 'pages'
+        if pages >= PDF_PARALLEL_MIN_PAGES:
+            # Always through the page pool, even on one core, so its cost or speedup is measured
+            yield f'pdf_extract/{pages}p-pool', \
+                lambda b=pdf_bytes: list(iter_pdf_pages(b, workers=POOL_WORKERS)), pages, 'pages'
+
+    markdown = make_markdown(80)
+    mb = len(markdown.encode('utf-8')) / 1e6
+    yield 'markdown_to_text', lambda: markdown_to_text(markdown), mb, 'MB'
+    yield 'render_pdf', lambda: render_pdf(parse_markdown(markdown), io.BytesIO(), title="Benchmark"), mb, 'MB'
+
+
+def run(repeat=5, quick=False, only=None):
+    results = {}
+    for name, fn, units, unit_name in cases(quick):
+        if only and only not in name:
+            continue
+        # The 500-page extraction takes seconds per run, so it is timed fewer times
+        results[name] = measure(fn, min(repeat, 3) if units >= 500 else repeat, units, unit_name)
+    return results
+
+
+def compare(output, baseline, tolerance, memory_tolerance):
+    """
+    Return ``[(name, metric, ratio)]`` for cases that regressed beyond the tolerances.
+
+    Times are compared by their ``relative`` value, in units of the
+    calibration loop.
+    """
+    regressions = []
+    for name, result in output['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        if base.get('seconds'):
+            ratio = result['relative'] / base['relative']
+            if ratio > 1 + tolerance:
+                regressions.append((name, 'seconds', ratio))
+        if base.get('peak_bytes'):
+            ratio = result['peak_bytes'] / base['peak_bytes']
+            if ratio > 1 + memory_tolerance:
+                regressions.append((name, 'peak_bytes', ratio))
+    return regressions
+
+
+def comparable(output, baseline):
+    """Whether ``baseline`` was recorded on this machine and Python, and can gate this run."""
+    return (
+        all('relative' in result for result in baseline['results'].values())
+        and baseline.get('machine') == output['machine']
+        and baseline.get('python', '').rsplit('.', 1)[0] == output['python'].rsplit('.', 1)[0]
+    )
+
+
+def print_results(output, baseline=None):
+    print(f"{'case':<28} {'median ms':>10} {'throughput':>16} {'peak KiB':>10} {'vs baseline':>12}")
+    for name, r in output['results'].items():
+        throughput = f"{r['throughput']:.2f} {r['unit']}/s" if r['throughput'] else '-'
+        change = ''
+        base = (baseline or {}).get('results', {}).get(name)
+        if base and base.get('seconds'):
+            if 'relative' in base:
+                change = f"{r['relative'] / base['relative']:.2f}x"
+            else:
+                change = f"{r['seconds'] / base['seconds']:.2f}x"
+        print(f"{name:<28} {r['seconds'] * 1000:>10.2f} {throughput:>16} "
+              f"{r['peak_bytes'] / 1024:>10.0f} {change:>12}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark text decoding, normalization, PDF extraction and rendering.")
+    parser.add_argument('--repeat', type=int, default=5, help="Runs per measurement; the median is reported")
+    parser.add_argument('--quick', action='store_true', help="Skip the 500-page PDF")
+    parser.add_argument('--only', help="Run only cases whose name contains this string")
+    parser.add_argument('--json', help="Also write the results to this JSON file")
+    parser.add_argument('--baseline', default=str(BASELINE_PATH), help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="Store the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.5,
+                        help="Allowed slowdown, relative to the calibration loop, before a case counts as a regression")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25,
+                        help="Allowed peak memory growth before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run(repeat=args.repeat, quick=args.quick, only=args.only)
+    output = {
+        'python': platform.python_version(),
+        'machine': machine_id(),
+        'results': results,
+    }
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(output, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(output, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(output, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if baseline and not comparable(output, baseline):
+        print(f"Baseline is from {baseline.get('machine')} (Python {baseline.get('python')}); "
+              f"not gating this run on {output['machine']} (Python {output['python']})")
+    elif baseline:
+        regressions = compare(output, baseline, args.tolerance, args.memory_tolerance)
+        for name, metric, ratio in regressions:
+            print(f"REGRESSION {name}: {metric} is {ratio:.2f}x the baseline")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
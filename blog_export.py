@@ -0,0 +1,146 @@
+"""
+HTML and PDF rendering for generated blog posts.
+
+Content is parsed into the document model once and rendered to each
+format from the same tree. ``render_blog`` memoizes the rendered bytes in
+a bounded, process-wide cache keyed on the topic, content and style, so
+Streamlit reruns reuse the previous render and PDFs are only rebuilt when
+the content changes.
+"""
+
+import hashlib
+import html
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from document import parse_markdown, render_html, render_pdf, render_text
+from tracing import span
+
+HTML_TEMPLATES = {
+    'minimal': '<html><head></head><body><h1>{0}</h1><div>{1}</div></body></html>',
+    'styled': """
+    <html>
+        <head>
+            <style>
+                body {{
+                    font-family: Arial, sans-serif;
+                    margin: 40px;
+                    line-height: 1.6;
+                }}
+                h1 {{
+                    color: #2c3e50;
+                    font-size: 24px;
+                    margin-bottom: 20px;
+                }}
+                h2, h3 {{
+                    color: #2c3e50;
+                }}
+                p {{
+                    margin-bottom: 15px;
+                }}
+                .section {{
+                    margin-bottom: 25px;
+                }}
+            </style>
+        </head>
+        <body>
+            <h1>{0}</h1>
+            <div class="content">
+                {1}
+            </div>
+        </body>
+    </html>
+    """,
+}
+
+# Bump when the rendered layout changes so cached renders are not reused
+LAYOUT_VERSION = 2
+RENDER_CACHE_MAX_BYTES = int(float(os.getenv('RENDER_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+
+class RenderCache:
+    """LRU cache of rendered bytes, bounded by their total size."""
+
+    def __init__(self, max_bytes=RENDER_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+_render_cache = RenderCache()
+
+
+def render_key(topic, content, fmt, style):
+    payload = '\x00'.join([fmt, style, str(LAYOUT_VERSION), str(topic), str(content)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def render_blog_formats(topic, content, formats=('html', 'pdf'), style='minimal'):
+    """
+    Return ``{fmt: bytes}`` for each requested format ('html', 'pdf', 'txt').
+
+    Cached renders are reused; the content is parsed at most once for the
+    formats that still have to be rendered.
+    """
+    rendered = {}
+    missing = []
+    for fmt in formats:
+        data = _render_cache.get(render_key(topic, content, fmt, style))
+        if data is None:
+            missing.append(fmt)
+        else:
+            rendered[fmt] = data
+
+    if missing:
+        with span('export.parse', chars=len(str(content))):
+            blocks = parse_markdown(str(content))
+        for fmt in missing:
+            with span('export.render', format=fmt, style=style) as render_span:
+                if fmt == 'html':
+                    data = HTML_TEMPLATES[style].format(html.escape(str(topic)), render_html(blocks)).encode('utf-8')
+                elif fmt == 'pdf':
+                    buffer = io.BytesIO()
+                    render_pdf(blocks, buffer, title=topic)
+                    data = buffer.getvalue()
+                elif fmt == 'txt':
+                    data = render_text(blocks).encode('utf-8')
+                else:
+                    raise ValueError(f"Unsupported render format: {fmt}")
+                render_span.set(bytes=len(data))
+            _render_cache.set(render_key(topic, content, fmt, style), data)
+            rendered[fmt] = data
+    return rendered
+
+
+def render_blog(topic, content, fmt, style='minimal'):
+    """Return the blog rendered as 'html', 'pdf' or 'txt' bytes, reusing a cached render when possible."""
+    return render_blog_formats(topic, content, (fmt,), style)[fmt]
@@ -0,0 +1,369 @@
+"""
+Research -> NLP -> writer pipeline for the blog crew.
+
+The tasks run one stage at a time, the same way a sequential crew passes
+each task's output to the next, so research and NLP outputs can be served
+from the stage cache. Each stage is keyed only on the inputs its task
+description interpolates, so a word limit change reruns just the writer.
+
+Between stages, the upstream output is condensed to the next stage's
+token budget (see ``context_budget``) so a long research report does not
+inflate every later prompt.
+
+With a research width above 1, research fans out: the topic is split into
+that many sub-questions, which are researched concurrently and merged
+into one report, so research takes about as long as a single sub-question.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from textwrap import dedent
+
+from crewai import Task
+
+from context_budget import STAGE_BUDGETS, compact_context, record_usage
+from llm_pool import DEFAULT_MODEL, bundle_agent, bundle_llm
+from stage_cache import StageCache, get_stage_cache
+from tracing import span, wrap
+
+# Bump when a task description or expected output changes so stale
+# cached outputs are not reused for the new prompt.
+PROMPT_VERSION = 1
+
+RESEARCH_FIELDS = ('topic', 'audience', 'industry', 'blog_type', 'content_goal')
+NLP_FIELDS = ('audience', 'tone', 'industry', 'blog_type', 'content_goal')
+
+# Upper bound on concurrent sub-question agents, whatever width a request asks for
+RESEARCH_MAX_PARALLEL = int(os.getenv('RESEARCH_MAX_PARALLEL', '4'))
+MAX_RESEARCH_WIDTH = 8
+
+STAGE_LABELS = {
+    'research': 'Research',
+    'research_plan': 'Research plan',
+    'research_subquestion': 'Research sub-question',
+    'nlp': 'NLP analysis',
+    'writer': 'Writing',
+}
+
+
+def create_research_task(agent, inputs):
+    return Task(
+        description=f"""Research and gather information about: {inputs['topic']}
+        Target Audience: {inputs['audience']}
+        Industry/Domain: {inputs['industry']}
+        Blog Type: {inputs['blog_type']}
+        Content Goal: {inputs['content_goal']}""",
+        agent=agent,
+        expected_output="A comprehensive research summary with key points, statistics, and relevant information about the topic."
+    )
+
+
+def build_research_plan_prompt(inputs, width):
+    return dedent(f"""\
+        Split the blog topic below into {width} distinct research sub-questions that together
+        cover what a {inputs['blog_type']} for {inputs['audience']} readers in {inputs['industry']}
+        needs in order to {inputs['content_goal'].lower()}. Avoid overlap between them.
+
+        Topic: {inputs['topic']}
+
+        Reply with exactly {width} questions, one per line, without numbering or commentary.""")
+
+
+def parse_subquestions(text, width):
+    """Return up to ``width`` questions from a one-per-line plan, dropping list markers."""
+    questions = []
+    for line in str(text).splitlines():
+        line = re.sub(r'^\s*(?:[-*•]|\d+[.)])\s*', '', line).strip()
+        if line and line not in questions:
+            questions.append(line)
+    return questions[:width]
+
+
+def create_subtopic_research_task(agent, inputs, question):
+    return Task(
+        description=f"""Research this sub-question of the blog topic "{inputs['topic']}": {question}
+        Target Audience: {inputs['audience']}
+        Industry/Domain: {inputs['industry']}
+        Focus only on this sub-question; other researchers cover the rest of the topic.""",
+        agent=agent,
+        expected_output="Concise findings for the sub-question with key points, statistics, and relevant information."
+    )
+
+
+def create_nlp_task(agent, inputs):
+    return Task(
+        description=f"""Process and analyze the gathered information using NLP techniques.
+        Consider the following parameters:
+        - Target Audience: {inputs['audience']}
+        - Writing Tone: {inputs['tone']}
+        - Industry/Domain: {inputs['industry']}
+        - Blog Type: {inputs['blog_type']}
+        - Content Goal: {inputs['content_goal']}""",
+        agent=agent,
+        expected_output="An analyzed and structured outline with key points organized for blog writing, incorporating NLP insights."
+    )
+
+
+def plan_word_budgets(word_limit):
+    """
+    Split ``word_limit`` into an intro, a number of H2 sections and a conclusion.
+
+    Returns the section count and the word budget of each part.
+    """
+    word_limit = int(word_limit)
+    intro = conclusion = max(40, round(word_limit * 0.1))
+    body = max(1, word_limit - intro - conclusion)
+    sections = min(8, max(2, round(body / 200)))
+    return {'intro': intro, 'sections': sections, 'section': round(body / sections), 'conclusion': conclusion}
+
+
+def create_writing_task(agent, inputs):
+    plan = plan_word_budgets(inputs['word_limit'])
+    return Task(
+        description=f"""Write an engaging blog post based on the processed information.
+        Follow these guidelines:
+        - Target Audience: {inputs['audience']}
+        - Writing Tone: {inputs['tone']}
+        - Industry/Domain: {inputs['industry']}
+        - Blog Type: {inputs['blog_type']}
+        - Content Goal: {inputs['content_goal']}
+        - Word Limit: {inputs['word_limit']} words (strictly adhere to this range)
+        - Structure: an introduction of about {plan['intro']} words, {plan['sections']} sections with
+          H2 headings of about {plan['section']} words each, and a conclusion of about {plan['conclusion']} words
+        Ensure the content is well-structured and meets the specified requirements.""",
+        agent=agent,
+        expected_output="A complete, well-structured blog post that meets all specified requirements and guidelines."
+    )
+
+
+def stage_key(stage, fields, inputs, upstream_key=None, **params):
+    """
+    Cache key for a stage, built from the fields its task reads, its upstream
+    stage and any run parameters that change its output (e.g. context_budget).
+    """
+    values = {name: inputs[name] for name in fields}
+    values['prompt_version'] = PROMPT_VERSION
+    if upstream_key:
+        values['upstream'] = upstream_key
+    values.update((name, value) for name, value in params.items() if value)
+    return StageCache.make_key(stage, values)
+
+
+def _run_cached_stage(cache, key, stage, run):
+    if cache is not None:
+        output = cache.get(key)
+        if output is not None:
+            return output, True
+    output = str(run())
+    if cache is not None:
+        cache.set(key, stage, output)
+    return output, False
+
+
+def _trace_stage(stage_span, entry):
+    stage_span.set(cached=entry['cached'], context_tokens=entry['context_tokens'])
+    stage_span.record_tokens(DEFAULT_MODEL, entry['tokens_in'], entry['tokens_out'])
+
+
+def _research_subquestion(blog_agents, inputs, question):
+    # Agents keep per-run state, so each concurrent sub-question gets its own
+    agent = blog_agents.create_research_agent()
+    task = create_subtopic_research_task(agent, inputs, question)
+    with span('research.subquestion', question=question):
+        return task.description, str(task.execute())
+
+
+def run_fanout_research(inputs, blog_agents, width):
+    """
+    Plan ``width`` sub-questions, research them concurrently and merge the findings.
+
+    Returns the merged report and the model calls made for it, as
+    ``(stage, prompt, output, question)`` tuples: the plan, then one per
+    sub-question.
+    """
+    plan_prompt = build_research_plan_prompt(inputs, width)
+    with span('research.plan', width=width):
+        plan = bundle_llm(blog_agents).invoke(plan_prompt).content
+    calls = [('research_plan', plan_prompt, plan, None)]
+    questions = parse_subquestions(plan, width)
+    if not questions:
+        questions = [inputs['topic']]
+
+    workers = max(1, min(len(questions), RESEARCH_MAX_PARALLEL))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='research') as executor:
+        futures = [
+            executor.submit(wrap(_research_subquestion), blog_agents, inputs, question)
+            for question in questions
+        ]
+        results = [future.result() for future in futures]
+
+    calls.extend(
+        ('research_subquestion', prompt, finding, question)
+        for question, (prompt, finding) in zip(questions, results)
+    )
+    report = '\n\n'.join(f"## {question}\n\n{finding}" for question, (_, finding) in zip(questions, results))
+    return report, calls
+
+
+def _run_upstream_stages(inputs, blog_agents, use_cache, on_stage, budgets, usage, research_width=1):
+    """
+    Run (or load from cache) the research and NLP stages.
+
+    Returns the NLP output condensed for the writer and its token count
+    before condensing.
+    """
+    cache = get_stage_cache() if use_cache else None
+    research_width = max(1, min(int(research_width or 1), MAX_RESEARCH_WIDTH))
+
+    with span('crew.task', stage='research', width=research_width) as stage_span:
+        research_key = stage_key(
+            'research', RESEARCH_FIELDS, inputs, research_width=research_width if research_width > 1 else None
+        )
+        if research_width > 1:
+            calls = []
+
+            def run_fanout():
+                report, fanout_calls = run_fanout_research(inputs, blog_agents, research_width)
+                calls.extend(fanout_calls)
+                return report
+
+            research_output, cached = _run_cached_stage(cache, research_key, 'research', run_fanout)
+            if cached:
+                entry = record_usage(usage, 'research', build_research_plan_prompt(inputs, research_width),
+                                     '', research_output, cached)
+            else:
+                # One entry per model call: the plan and each sub-question's research
+                entries = [
+                    record_usage(usage, stage, prompt, '', output, question=question)
+                    for stage, prompt, output, question in calls
+                ]
+                entry = {
+                    'cached': False,
+                    'context_tokens': 0,
+                    'tokens_in': sum(e['tokens_in'] for e in entries),
+                    'tokens_out': sum(e['tokens_out'] for e in entries),
+                }
+            _trace_stage(stage_span, entry)
+        else:
+            research_task = create_research_task(bundle_agent(blog_agents, 'research'), inputs)
+            research_output, cached = _run_cached_stage(
+                cache, research_key, 'research', lambda: research_task.execute()
+            )
+            _trace_stage(stage_span, record_usage(
+                usage, 'research', research_task.description, '', research_output, cached
+            ))
+    if on_stage:
+        on_stage('research', cached)
+
+    with span('context.compact', stage='nlp'):
+        nlp_context, context_tokens = compact_context(research_output, 'nlp', inputs, budgets)
+    with span('crew.task', stage='nlp') as stage_span:
+        nlp_budget = {**STAGE_BUDGETS, **(budgets or {})}.get('nlp')
+        nlp_task = create_nlp_task(bundle_agent(blog_agents, 'nlp'), inputs)
+        nlp_key = stage_key('nlp', NLP_FIELDS, inputs, research_key, context_budget=nlp_budget)
+        nlp_output, cached = _run_cached_stage(
+            cache, nlp_key, 'nlp', lambda: nlp_task.execute(context=nlp_context)
+        )
+        _trace_stage(stage_span, record_usage(
+            usage, 'nlp', nlp_task.description, nlp_context, nlp_output, cached, context_tokens
+        ))
+    if on_stage:
+        on_stage('nlp', cached)
+
+    with span('context.compact', stage='writer'):
+        return compact_context(nlp_output, 'writer', inputs, budgets)
+
+
+def prepare_writer_context(inputs, blog_agents, use_cache=True, budgets=None, research_width=1):
+    """
+    Return the writer's condensed context for the inputs.
+
+    With the stage cache on, this reuses the research and NLP outputs of an
+    earlier run. Follow-up writer calls (e.g. regenerating one section)
+    should prefer the context kept from generation (see ``contexts``) and
+    only fall back to this.
+    """
+    writer_context, _ = _run_upstream_stages(
+        inputs, blog_agents, use_cache, None, budgets, None, research_width
+    )
+    return writer_context
+
+
+def generate_blog(inputs, blog_agents, use_cache=True, on_stage=None, budgets=None, usage=None,
+                  research_width=1, contexts=None):
+    """
+    Run the research, NLP and writer tasks for the given blog inputs.
+
+    ``inputs`` holds topic, audience, tone, industry, blog_type,
+    content_goal and word_limit. ``on_stage(stage, cached)`` is called after
+    each stage finishes. ``budgets`` overrides the per-stage context token
+    budgets, and if ``usage`` is a list, one token accounting entry per
+    stage is appended to it. ``research_width`` above 1 researches that many
+    sub-questions concurrently. If ``contexts`` is a dict, the condensed
+    context given to the writer is stored in it under 'writer'. Returns the
+    writer's blog post.
+    """
+    writer_context, context_tokens = _run_upstream_stages(
+        inputs, blog_agents, use_cache, on_stage, budgets, usage, research_width
+    )
+    if contexts is not None:
+        contexts['writer'] = writer_context
+
+    with span('crew.task', stage='writer') as stage_span:
+        writing_task = create_writing_task(bundle_agent(blog_agents, 'writer'), inputs)
+        result = writing_task.execute(context=writer_context)
+        _trace_stage(stage_span, record_usage(
+            usage, 'writer', writing_task.description, writer_context, result,
+            context_tokens_before=context_tokens
+        ))
+    if on_stage:
+        on_stage('writer', False)
+    return result
+
+
+def build_writer_prompt(agent, task, context):
+    """Render the writer agent and task as a single prompt for direct streaming."""
+    return '\n\n'.join([
+        f"You are {agent.role}.\n{dedent(agent.backstory).strip()}",
+        f"Your personal goal is: {agent.goal}",
+        "Task: " + '\n'.join(line.strip() for line in task.description.strip().splitlines()),
+        f"This is the context you're working with:\n{context}",
+        f"Your final answer must be: {task.expected_output}\n"
+        "Reply with the blog post only, formatted in Markdown.",
+    ])
+
+
+def stream_blog(inputs, blog_agents, use_cache=True, on_stage=None, budgets=None, usage=None,
+                research_width=1, contexts=None):
+    """
+    Like ``generate_blog``, but yields the writer's output as it arrives.
+
+    The writer runs as one streamed LLM call built from the same agent and
+    task definitions, instead of the agent's reasoning loop, so only the
+    blog text reaches the page. Joining the chunks gives the full post.
+    """
+    writer_context, context_tokens = _run_upstream_stages(
+        inputs, blog_agents, use_cache, on_stage, budgets, usage, research_width
+    )
+    if contexts is not None:
+        contexts['writer'] = writer_context
+
+    with span('crew.task', stage='writer', streamed=True) as stage_span:
+        writer_agent = bundle_agent(blog_agents, 'writer')
+        writing_task = create_writing_task(writer_agent, inputs)
+        prompt = build_writer_prompt(writer_agent, writing_task, writer_context)
+        chunks = []
+        for chunk in bundle_llm(blog_agents).stream(prompt):
+            if chunk.content:
+                if not chunks:
+                    stage_span.set(first_chunk_ms=round((time.time_ns() - stage_span.start_ns) / 1e6, 1))
+                chunks.append(chunk.content)
+                yield chunk.content
+        _trace_stage(stage_span, record_usage(
+            usage, 'writer', prompt.replace(writer_context, '', 1), writer_context, ''.join(chunks),
+            context_tokens_before=context_tokens
+        ))
+    if on_stage:
+        on_stage('writer', False)
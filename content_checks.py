@@ -0,0 +1,70 @@
+"""
+Post-generation checks for a blog post: the Gemini content analysis report
+and the plagiarism checker agent.
+
+Both checks can run as background jobs on a shared thread pool, so the
+total wait is the slower of the two calls rather than their sum.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from crewai import Task
+
+from llm_pool import bundle_agent
+from tracing import span, wrap
+
+CHECK_WORKERS = int(os.getenv('CONTENT_CHECK_WORKERS', '8'))
+
+_executor = ThreadPoolExecutor(max_workers=CHECK_WORKERS, thread_name_prefix='content-check')
+
+
+def analyze_content(content, model):
+    """Ask Gemini for a content analysis report and return its text."""
+    prompt = f"""Analyze the following blog content and provide a detailed report including:
+    1. Content Quality Assessment
+    2. Key Points and Main Arguments
+    3. Writing Style Analysis
+    4. Potential Improvements
+    5. Originality Assessment (based on common patterns and structures)
+
+    Blog Content:
+    {content}
+    """
+    with span('check.analysis'):
+        response = model.generate_content(prompt)
+    return response.text
+
+
+def check_plagiarism(content, agent_pool):
+    """Run the plagiarism checker agent on the content and return its report."""
+    with span('check.plagiarism'), agent_pool.lease() as blog_agents:
+        plagiarism_agent = bundle_agent(blog_agents, 'plagiarism_checker')
+
+        plagiarism_task = Task(
+            description=f"""Analyze the following content and provide:
+            1. A plagiarism score (0-100, where 100 is completely original)
+            2. Detailed analysis of writing patterns
+            3. Specific areas that might need improvement
+            4. Recommendations for enhancing originality
+
+            Content to analyze:
+            {content}
+            """,
+            agent=plagiarism_agent,
+            expected_output="A detailed plagiarism analysis report with score and recommendations."
+        )
+        return str(plagiarism_task.execute())
+
+
+def start_checks(content, model, agent_pool, checks=('analysis', 'plagiarism')):
+    """
+    Submit the named checks in the background and return their futures by name.
+
+    The checks are traced under the caller's current run.
+    """
+    calls = {
+        'analysis': (analyze_content, content, model),
+        'plagiarism': (check_plagiarism, content, agent_pool),
+    }
+    return {name: _executor.submit(wrap(calls[name][0]), *calls[name][1:]) for name in checks}
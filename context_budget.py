@@ -0,0 +1,195 @@
+"""
+Token-budgeted context handoff between crew stages.
+
+Before a stage receives the previous stage's output as context, the
+output is condensed to that stage's token budget. Condensation is
+extractive: sentences are scored on how much they say about the blog's
+topic and on how central their terms are to the whole text, and the best
+ones are kept in their original order. Token counts are local
+estimates; Gemini's ``count_tokens`` is only asked when an estimate is
+close enough to a budget for the difference to matter.
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from llm_pool import DEFAULT_MODEL, get_generative_model
+
+STAGE_BUDGETS = {
+    'nlp': int(os.getenv('CONTEXT_BUDGET_NLP', '3000')),
+    'writer': int(os.getenv('CONTEXT_BUDGET_WRITER', '2000')),
+}
+CHARS_PER_TOKEN = 4
+# Estimates within this fraction of a budget are checked with the tokenizer
+NEAR_BUDGET = float(os.getenv('CONTEXT_EXACT_COUNT_MARGIN', '0.25'))
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(\[])|(?<=[\u0964\u0965])\s+')
+_STOPWORDS = frozenset("""
+a an and are as at be been but by for from has have in into is it its of on or that the their
+this to was were will with which who what when where how why can could should would may might
+also more most such than then there these those they we you your our not no
+""".split())
+
+_token_cache = {}
+_token_cache_lock = threading.Lock()
+_TOKEN_CACHE_SIZE = 2048
+
+
+def estimate_tokens(text):
+    return max(1, math.ceil(len(text) / CHARS_PER_TOKEN)) if text else 0
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """Count tokens with the model's tokenizer, falling back to a local estimate."""
+    if not text:
+        return 0
+    key = (model, hashlib.sha1(text.encode('utf-8')).hexdigest())
+    with _token_cache_lock:
+        if key in _token_cache:
+            return _token_cache[key]
+    try:
+        tokens = get_generative_model(model).count_tokens(text).total_tokens
+    except Exception:
+        return estimate_tokens(text)
+    with _token_cache_lock:
+        if len(_token_cache) >= _TOKEN_CACHE_SIZE:
+            _token_cache.clear()
+        _token_cache[key] = tokens
+    return tokens
+
+
+def tokens_against(text, budget, model=DEFAULT_MODEL):
+    """
+    Token count of ``text`` for comparing with ``budget``.
+
+    The local estimate is used unless it is within ``NEAR_BUDGET`` of the
+    budget, where a wrong side of the line would change what is kept.
+    """
+    estimate = estimate_tokens(text)
+    if budget and abs(estimate - budget) <= budget * NEAR_BUDGET:
+        return count_tokens(text, model)
+    return estimate
+
+
+def _terms(text):
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOPWORDS and len(w) > 2]
+
+
+def split_units(text):
+    """Split text into sentences, keeping headings and list items as their own units."""
+    units = []
+    for line in text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith(('#', '-', '*', '|')) or re.match(r'^\d+[.)]\s', line):
+            units.append(line)
+        else:
+            units.extend(s.strip() for s in _SENTENCE_RE.split(line) if s.strip())
+    return units
+
+
+def _truncate(unit, max_chars):
+    """Cut ``unit`` to ``max_chars``, at a word boundary when there is one in the second half."""
+    if len(unit) <= max_chars:
+        return unit
+    cut = unit[:max_chars]
+    space = cut.rfind(' ')
+    return cut[:space] if space > max_chars // 2 else cut
+
+
+def condense(text, budget_tokens, focus='', model=DEFAULT_MODEL, total_tokens=None):
+    """
+    Return ``text`` condensed to roughly ``budget_tokens`` tokens.
+
+    Text already within budget is returned unchanged. ``focus`` (e.g. the
+    topic and audience) boosts sentences that mention its terms. When no
+    single sentence fits, the best one is cut to the budget. ``total_tokens``
+    is the text's token count, if the caller already has it.
+    """
+    if total_tokens is None:
+        total_tokens = tokens_against(text, budget_tokens, model)
+    if total_tokens <= budget_tokens:
+        return text
+
+    units = split_units(text)
+    if not units:
+        return text
+
+    # Scale local estimates so they add up to the real token count
+    scale = total_tokens / max(1, sum(estimate_tokens(u) for u in units))
+    frequencies = Counter(_terms(text))
+    focus_terms = set(_terms(focus))
+
+    scored = []
+    for position, unit in enumerate(units):
+        terms = _terms(unit)
+        if not terms:
+            score = 0.0
+        else:
+            centrality = sum(math.log1p(frequencies[t]) for t in set(terms)) / math.sqrt(len(terms))
+            relevance = len(focus_terms.intersection(terms))
+            score = centrality + 2.0 * relevance
+        if unit.startswith('#'):
+            score += 3.0
+        # Slight preference for earlier material, which usually carries the summary
+        score *= 1.0 + 0.2 * (1 - position / len(units))
+        scored.append((score, position))
+
+    selected = set()
+    used = 0.0
+    ranked = sorted(scored, reverse=True)
+    for score, position in ranked:
+        cost = estimate_tokens(units[position]) * scale
+        if used + cost > budget_tokens:
+            continue
+        selected.add(position)
+        used += cost
+    if not selected:
+        # e.g. a long Hindi paragraph with no sentence break the splitter knows
+        return _truncate(units[ranked[0][1]], int(budget_tokens / scale * CHARS_PER_TOKEN))
+    return '\n'.join(units[p] for p in sorted(selected))
+
+
+def compact_context(text, stage, inputs, budgets=None, model=DEFAULT_MODEL):
+    """
+    Condense an upstream stage's output to the budget of ``stage``.
+
+    ``budgets`` overrides entries of ``STAGE_BUDGETS``; a budget of 0 or
+    None passes the context through unchanged. Returns the context and its
+    token count before condensing.
+    """
+    budget = {**STAGE_BUDGETS, **(budgets or {})}.get(stage)
+    tokens_before = tokens_against(text, budget, model)
+    if not budget or tokens_before <= budget:
+        return text, tokens_before
+    focus = ' '.join(str(inputs.get(name, '')) for name in ('topic', 'audience', 'industry', 'blog_type', 'content_goal'))
+    return condense(text, budget, focus, model, tokens_before), tokens_before
+
+
+def record_usage(usage, stage, prompt, context, output, cached=False, context_tokens_before=None, **fields):
+    """
+    Return a stage's token accounting, appending it to ``usage`` if a list was given.
+
+    Counts are local estimates, so accounting adds no model calls. Cached
+    stages made no model call, so their tokens in and out are 0. ``fields``
+    (e.g. a research sub-question) are added to the entry.
+    """
+    context_tokens = estimate_tokens(context) if context else 0
+    entry = {
+        'stage': stage,
+        'cached': cached,
+        'context_tokens_before': context_tokens if context_tokens_before is None else context_tokens_before,
+        'context_tokens': context_tokens,
+        'tokens_in': 0 if cached else estimate_tokens(prompt) + context_tokens,
+        'tokens_out': 0 if cached else estimate_tokens(str(output)),
+        **fields,
+    }
+    if usage is not None:
+        usage.append(entry)
+    return entry
@@ -0,0 +1,398 @@
+"""
+Lightweight document model for LLM markdown output.
+
+``parse_markdown`` turns markdown into a flat list of blocks (headings,
+paragraphs, lists, code blocks, tables and rules) whose text is a list of
+inline spans (plain text, strong, emphasis, code and links). HTML, plain
+text and PDF are all rendered from that tree, so exporting one piece of
+content to several formats parses it only once.
+"""
+
+import html
+import re
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import tracing
+
+# Blocks
+Heading = namedtuple('Heading', 'level inlines')
+Paragraph = namedtuple('Paragraph', 'inlines')
+ListBlock = namedtuple('ListBlock', 'ordered items')  # items: [(depth, inlines)]
+CodeBlock = namedtuple('CodeBlock', 'language text')
+Table = namedtuple('Table', 'header rows')  # cells are inline lists
+Rule = namedtuple('Rule', '')
+
+# Inlines
+Text = namedtuple('Text', 'text')
+Strong = namedtuple('Strong', 'children')
+Emphasis = namedtuple('Emphasis', 'children')
+Code = namedtuple('Code', 'text')
+Link = namedtuple('Link', 'children url')
+
+_HEADING_RE = re.compile(r'^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^\s*(```|~~~)\s*([\w+-]*)\s*$')
+_RULE_RE = re.compile(r'^\s{0,3}([-*_])(\s*\1){2,}\s*$')
+_LIST_RE = re.compile(r'^(\s*)([-*+]|\d+[.)])\s+(.*)$')
+_TABLE_SEP_RE = re.compile(r'^\s*\|?\s*:?-{2,}:?\s*(\|\s*:?-{2,}:?\s*)*\|?\s*$')
+_INLINE_RE = re.compile(
+    r'(?P<code>`+)(?P<code_text>.+?)(?P=code)'
+    r'|\[(?P<link_text>[^\]]+)\]\((?P<link_url>[^)\s]+)\)'
+    r'|(?P<strong>\*\*|__)(?P<strong_text>.+?)(?P=strong)'
+    r'|(?<!\w)(?P<em>[*_])(?P<em_text>[^\s*_](?:.*?[^\s])?)(?P=em)(?!\w)'
+)
+# Links to anything else (e.g. javascript:) keep their text but lose the link
+LINK_SCHEMES = ('http', 'https', 'mailto')
+
+
+def parse_inline(text):
+    """Split a line of markdown into inline spans."""
+    spans = []
+    pos = 0
+    for match in _INLINE_RE.finditer(text):
+        if match.start() > pos:
+            spans.append(Text(text[pos:match.start()]))
+        if match.group('code'):
+            spans.append(Code(match.group('code_text').strip()))
+        elif match.group('link_text'):
+            children = parse_inline(match.group('link_text'))
+            if urlsplit(match.group('link_url')).scheme.lower() in LINK_SCHEMES:
+                spans.append(Link(children, match.group('link_url')))
+            else:
+                spans.extend(children)
+        elif match.group('strong'):
+            spans.append(Strong(parse_inline(match.group('strong_text'))))
+        else:
+            spans.append(Emphasis(parse_inline(match.group('em_text'))))
+        pos = match.end()
+    if pos < len(text):
+        spans.append(Text(text[pos:]))
+    return spans
+
+
+def _split_row(line):
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|'):
+        line = line[:-1]
+    return [parse_inline(cell.strip()) for cell in line.split('|')]
+
+
+def parse_markdown(text):
+    """Parse markdown into a list of blocks."""
+    lines = str(text).replace('\r\n', '\n').split('\n')
+    blocks = []
+    paragraph = []
+    i = 0
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(Paragraph(parse_inline(' '.join(paragraph))))
+            paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        stripped = line.strip()
+
+        if not stripped:
+            flush_paragraph()
+            i += 1
+            continue
+
+        fence = _FENCE_RE.match(line)
+        if fence:
+            flush_paragraph()
+            code_lines = []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(fence.group(1)):
+                code_lines.append(lines[i])
+                i += 1
+            blocks.append(CodeBlock(fence.group(2), '\n'.join(code_lines)))
+            i += 1
+            continue
+
+        heading = _HEADING_RE.match(line)
+        if heading:
+            flush_paragraph()
+            blocks.append(Heading(len(heading.group(1)), parse_inline(heading.group(2))))
+            i += 1
+            continue
+
+        if _RULE_RE.match(line):
+            flush_paragraph()
+            blocks.append(Rule())
+            i += 1
+            continue
+
+        if '|' in line and i + 1 < len(lines) and _TABLE_SEP_RE.match(lines[i + 1]):
+            flush_paragraph()
+            header = _split_row(line)
+            rows = []
+            i += 2
+            while i < len(lines) and '|' in lines[i] and lines[i].strip():
+                rows.append(_split_row(lines[i]))
+                i += 1
+            blocks.append(Table(header, rows))
+            continue
+
+        item = _LIST_RE.match(line)
+        if item:
+            flush_paragraph()
+            ordered = item.group(2)[0].isdigit()
+            base_depth = len(item.group(1).expandtabs(4)) // 2
+            items = []
+            while i < len(lines):
+                item = _LIST_RE.match(lines[i])
+                if item:
+                    depth = len(item.group(1).expandtabs(4)) // 2
+                    if items and depth <= base_depth and item.group(2)[0].isdigit() != ordered:
+                        # A top-level item of the other marker type starts a new list
+                        break
+                    items.append([depth, item.group(3)])
+                elif lines[i].strip() and lines[i].startswith((' ', '\t')) and items:
+                    # Indented continuation of the previous item
+                    items[-1][1] += ' ' + lines[i].strip()
+                else:
+                    break
+                i += 1
+            blocks.append(ListBlock(ordered, [(depth, parse_inline(text)) for depth, text in items]))
+            continue
+
+        paragraph.append(stripped)
+        i += 1
+
+    flush_paragraph()
+    return blocks
+
+
+# Plain text
+
+def _inline_text(spans):
+    parts = []
+    for span in spans:
+        if isinstance(span, (Text, Code)):
+            parts.append(span.text)
+        else:
+            parts.append(_inline_text(span.children))
+    return ''.join(parts)
+
+
+def render_text(blocks):
+    """Render blocks as plain text with markdown syntax removed."""
+    out = []
+    for block in blocks:
+        if isinstance(block, (Heading, Paragraph)):
+            out.append(_inline_text(block.inlines))
+        elif isinstance(block, ListBlock):
+            lines = []
+            for n, (depth, inlines) in enumerate(block.items, 1):
+                marker = f"{n}." if block.ordered else '-'
+                lines.append(f"{'  ' * depth}{marker} {_inline_text(inlines)}")
+            out.append('\n'.join(lines))
+        elif isinstance(block, CodeBlock):
+            out.append(block.text)
+        elif isinstance(block, Table):
+            rows = [block.header] + block.rows
+            out.append('\n'.join(' | '.join(_inline_text(cell) for cell in row) for row in rows))
+    return '\n\n'.join(out)
+
+
+def markdown_to_text(text):
+    return render_text(parse_markdown(text))
+
+
+# HTML
+
+def _inline_html(spans):
+    parts = []
+    for span in spans:
+        if isinstance(span, Text):
+            parts.append(html.escape(span.text, quote=False))
+        elif isinstance(span, Code):
+            parts.append(f"<code>{html.escape(span.text, quote=False)}</code>")
+        elif isinstance(span, Strong):
+            parts.append(f"<strong>{_inline_html(span.children)}</strong>")
+        elif isinstance(span, Emphasis):
+            parts.append(f"<em>{_inline_html(span.children)}</em>")
+        else:
+            parts.append(f'<a href="{html.escape(span.url)}">{_inline_html(span.children)}</a>')
+    return ''.join(parts)
+
+
+def _list_html(block):
+    tag = 'ol' if block.ordered else 'ul'
+    parts = []
+    depth = -1
+    for item_depth, inlines in block.items:
+        item_depth = min(item_depth, depth + 1)
+        if item_depth > depth:
+            parts.append(f"<{tag}>" * (item_depth - depth))
+        else:
+            parts.append('</li>')
+            parts.append(f"</{tag}></li>" * (depth - item_depth))
+        parts.append(f"<li>{_inline_html(inlines)}")
+        depth = item_depth
+    parts.append('</li>' + f"</{tag}></li>" * depth + f"</{tag}>")
+    return ''.join(parts)
+
+
+def render_html(blocks):
+    """Render blocks as an HTML fragment."""
+    out = []
+    for block in blocks:
+        if isinstance(block, Heading):
+            out.append(f"<h{block.level}>{_inline_html(block.inlines)}</h{block.level}>")
+        elif isinstance(block, Paragraph):
+            out.append(f"<p>{_inline_html(block.inlines)}</p>")
+        elif isinstance(block, ListBlock):
+            out.append(_list_html(block))
+        elif isinstance(block, CodeBlock):
+            out.append(f"<pre><code>{html.escape(block.text, quote=False)}</code></pre>")
+        elif isinstance(block, Table):
+            head = ''.join(f"<th>{_inline_html(cell)}</th>" for cell in block.header)
+            body = ''.join(
+                '<tr>' + ''.join(f"<td>{_inline_html(cell)}</td>" for cell in row) + '</tr>'
+                for row in block.rows
+            )
+            out.append(f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>")
+        else:
+            out.append('<hr>')
+    return '\n'.join(out)
+
+
+HTML_PAGE_TEMPLATE = """<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: Arial, sans-serif; margin: 40px; line-height: 1.6; }}
+h1, h2, h3 {{ color: #2c3e50; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 4px 8px; }}
+pre {{ background: #f5f5f5; padding: 12px; overflow-x: auto; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+{body}
+</body>
+</html>"""
+
+
+def render_html_page(blocks, title):
+    return HTML_PAGE_TEMPLATE.format(title=html.escape(str(title)), body=render_html(blocks))
+
+
+# PDF
+
+def _inline_pdf(spans):
+    """Render inline spans as reportlab paragraph markup."""
+    parts = []
+    for span in spans:
+        if isinstance(span, Text):
+            parts.append(html.escape(span.text, quote=False))
+        elif isinstance(span, Code):
+            parts.append(f'<font face="Courier">{html.escape(span.text, quote=False)}</font>')
+        elif isinstance(span, Strong):
+            parts.append(f"<b>{_inline_pdf(span.children)}</b>")
+        elif isinstance(span, Emphasis):
+            parts.append(f"<i>{_inline_pdf(span.children)}</i>")
+        else:
+            parts.append(f'<link href="{html.escape(span.url)}" color="blue">{_inline_pdf(span.children)}</link>')
+    return ''.join(parts)
+
+
+def render_pdf_flowables(blocks, title=None):
+    """Render blocks as a list of reportlab flowables."""
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import Paragraph as PdfParagraph, Preformatted, Spacer
+    from reportlab.platypus import Table as PdfTable, TableStyle
+    from reportlab.platypus.flowables import HRFlowable
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=24, spaceAfter=30)
+    body_style = ParagraphStyle('CustomBody', parent=styles['Normal'], fontSize=12, spaceAfter=12)
+    heading_styles = {1: styles['Heading1'], 2: styles['Heading2'], 3: styles['Heading3']}
+
+    story = []
+    if title:
+        story.append(PdfParagraph(html.escape(str(title), quote=False), title_style))
+        story.append(Spacer(1, 12))
+
+    for block in blocks:
+        if isinstance(block, Heading):
+            story.append(PdfParagraph(_inline_pdf(block.inlines), heading_styles.get(block.level, styles['Heading4'])))
+        elif isinstance(block, Paragraph):
+            story.append(PdfParagraph(_inline_pdf(block.inlines), body_style))
+        elif isinstance(block, ListBlock):
+            for n, (depth, inlines) in enumerate(block.items, 1):
+                item_style = ParagraphStyle(
+                    f'ListItem{depth}', parent=body_style, leftIndent=18 * (depth + 1), spaceAfter=4
+                )
+                bullet = f"{n}." if block.ordered else '•'
+                story.append(PdfParagraph(_inline_pdf(inlines), item_style, bulletText=bullet))
+            story.append(Spacer(1, 8))
+        elif isinstance(block, CodeBlock):
+            story.append(Preformatted(block.text, styles['Code']))
+            story.append(Spacer(1, 8))
+        elif isinstance(block, Table):
+            cell_style = styles['BodyText']
+            data = [[PdfParagraph(_inline_pdf(cell), cell_style) for cell in row]
+                    for row in [block.header] + block.rows]
+            width = max(len(row) for row in data)
+            data = [row + [''] * (width - len(row)) for row in data]
+            table = PdfTable(data, repeatRows=1)
+            table.setStyle(TableStyle([
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('BACKGROUND', (0, 0), (-1, 0), colors.whitesmoke),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ]))
+            story.append(table)
+            story.append(Spacer(1, 12))
+        else:
+            story.append(HRFlowable(width='100%', color=colors.grey))
+    return story
+
+
+def render_pdf(blocks, output, title=None):
+    """Build a PDF from blocks into ``output`` (a path or a binary file object)."""
+    from reportlab.lib.pagesizes import letter
+    from reportlab.platypus import SimpleDocTemplate
+
+    doc = SimpleDocTemplate(
+        output,
+        pagesize=letter,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72
+    )
+    doc.build(render_pdf_flowables(blocks, title))
+
+
+def export_document(content, filename_base, output_dir, formats=('pdf', 'html'), title=None):
+    """
+    Parse ``content`` once and write it in each requested format.
+
+    Returns the paths of the files written.
+    """
+    with tracing.span('export.parse', chars=len(content)):
+        blocks = parse_markdown(content)
+    title = title or filename_base
+    outputs = []
+    for fmt in formats:
+        path = Path(output_dir) / f"{filename_base}.{fmt}"
+        with tracing.span('export.render', format=fmt):
+            if fmt == 'pdf':
+                render_pdf(blocks, str(path), title)
+            elif fmt == 'html':
+                path.write_text(render_html_page(blocks, title), encoding='utf-8')
+            elif fmt == 'txt':
+                path.write_text(render_text(blocks), encoding='utf-8')
+            else:
+                raise ValueError(f"Unsupported export format: {fmt}")
+        outputs.append(path)
+    return outputs
@@ -0,0 +1,344 @@
+"""
+Pluggable LLM backend for offline runs and benchmarks.
+
+``LLM_BACKEND`` selects how model calls are served:
+
+- ``live`` (default): call Gemini directly.
+- ``record``: call Gemini and save every prompt/response pair to
+  ``LLM_RECORDINGS_DIR``.
+- ``replay``: serve recorded responses without network access, sleeping
+  for the recorded latency times ``LLM_REPLAY_LATENCY_SCALE``.
+- ``synthetic``: generate deterministic fake responses of
+  ``LLM_SYNTHETIC_WORDS`` words (or the prompt's word limit), with
+  ``LLM_SYNTHETIC_LATENCY_MS`` + ``LLM_SYNTHETIC_MS_PER_TOKEN`` latency.
+
+Both the LangChain chat model used by the crews and the GenerativeModel
+used for translation and analysis go through the same backend, so a
+replayed run exercises all of our own code with the model's latency
+taken out (or simulated).
+
+``RateLimitedChatModel`` puts a live chat model behind the shared
+``rate_limit`` limiter and ``single_flight`` coalescing.
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from single_flight import request_key
+from stage_cache import CACHE_DIR
+
+MODES = ('live', 'record', 'replay', 'synthetic')
+BACKEND_MODE = os.getenv('LLM_BACKEND', 'live').lower()
+RECORDINGS_DIR = Path(os.getenv('LLM_RECORDINGS_DIR', str(CACHE_DIR / 'llm_recordings')))
+REPLAY_LATENCY_SCALE = float(os.getenv('LLM_REPLAY_LATENCY_SCALE', '1.0'))
+SYNTHETIC_WORDS = int(os.getenv('LLM_SYNTHETIC_WORDS', '600'))
+SYNTHETIC_LATENCY_MS = float(os.getenv('LLM_SYNTHETIC_LATENCY_MS', '0'))
+SYNTHETIC_MS_PER_TOKEN = float(os.getenv('LLM_SYNTHETIC_MS_PER_TOKEN', '0'))
+
+if BACKEND_MODE not in MODES:
+    raise ValueError(f"LLM_BACKEND must be one of {', '.join(MODES)}, not {BACKEND_MODE!r}")
+
+_WORD_LIMIT_RE = re.compile(r'Word Limit:\s*(\d+)', re.IGNORECASE)
+_VOCABULARY = """
+content audience strategy growth data insight market customer value quality process
+research analysis result example practice team product service experience platform
+approach trend impact solution performance design system model industry opportunity
+""".split()
+_STREAM_CHUNK_WORDS = 8
+
+
+class ReplayMiss(LookupError):
+    """Raised in replay mode when no recording exists for a prompt."""
+
+
+def prompt_key(model, prompt, temperature=None):
+    payload = json.dumps([model, temperature, prompt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RecordingStore:
+    """One JSON file per prompt/response pair, named by the prompt's key."""
+
+    def __init__(self, directory=RECORDINGS_DIR):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        path = self.directory / f'{key}.json'
+        if not path.exists():
+            return None
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def put(self, key, record):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{key}.json'
+        tmp_path = path.with_name(f'{path.name}.{threading.get_ident()}.part')
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False, indent=1)
+            os.replace(tmp_path, path)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_recording_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = RecordingStore()
+        return _store
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4) if text else 0
+
+
+def synthetic_response(prompt, words=None):
+    """
+    Deterministic fake reply sized from the prompt's word limit.
+
+    Agent prompts ask for a "Final Answer:" line, which the crew's output
+    parser needs, so replies to them are wrapped in that format.
+    """
+    if words is None:
+        match = _WORD_LIMIT_RE.search(prompt)
+        words = int(match.group(1)) if match else SYNTHETIC_WORDS
+    rng = random.Random(hashlib.sha256(prompt.encode('utf-8')).digest())
+    lines = [f"# {' '.join(rng.choice(_VOCABULARY) for _ in range(4)).title()}", '']
+    written = 0
+    while written < words:
+        lines.append(f"## {' '.join(rng.choice(_VOCABULARY) for _ in range(3)).title()}")
+        for _ in range(rng.randint(1, 3)):
+            length = min(rng.randint(40, 90), max(1, words - written))
+            sentence = ' '.join(rng.choice(_VOCABULARY) for _ in range(length))
+            lines.append(sentence[0].upper() + sentence[1:] + '.')
+            lines.append('')
+            written += length
+            if written >= words:
+                break
+    text = '\n'.join(lines).strip()
+    if 'Final Answer:' in prompt:
+        return f"Thought: I now know the final answer\nFinal Answer: {text}"
+    return text
+
+
+def _sleep_ms(ms):
+    if ms > 0:
+        time.sleep(ms / 1000)
+
+
+def serve_offline(model, prompt, temperature=None):
+    """Return ``(text, latency_ms)`` for a replay or synthetic call without sleeping."""
+    if BACKEND_MODE == 'replay':
+        record = get_recording_store().get(prompt_key(model, prompt, temperature))
+        if record is None:
+            raise ReplayMiss(
+                f"No recorded response for this {model} prompt in {RECORDINGS_DIR}; "
+                "run once with LLM_BACKEND=record"
+            )
+        return record['response'], record.get('latency_ms', 0) * REPLAY_LATENCY_SCALE
+    text = synthetic_response(prompt)
+    return text, SYNTHETIC_LATENCY_MS + SYNTHETIC_MS_PER_TOKEN * estimate_tokens(text)
+
+
+def record(model, prompt, temperature, response, latency_ms):
+    get_recording_store().put(prompt_key(model, prompt, temperature), {
+        'model': model,
+        'temperature': temperature,
+        'prompt': prompt,
+        'response': response,
+        'latency_ms': round(latency_ms, 1),
+        'recorded_at': time.time(),
+    })
+
+
+def _messages_to_prompt(messages):
+    return '\n\n'.join(f'{m.type}: {m.content}' for m in messages)
+
+
+def _apply_stop(text, stop):
+    for token in stop or ():
+        index = text.find(token)
+        if index != -1:
+            text = text[:index]
+    return text
+
+
+class BackendChatModel(BaseChatModel):
+    """
+    LangChain chat model served by the configured backend.
+
+    In record mode ``inner`` is the live chat model; its responses are
+    saved keyed on the rendered messages.
+    """
+
+    model_name: str = 'gemini-2.0-flash'
+    temperature: float = 0.7
+    inner: Any = None
+
+    @property
+    def _llm_type(self):
+        return f'backend-{BACKEND_MODE}'
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        prompt = _messages_to_prompt(messages)
+        if BACKEND_MODE == 'record':
+            start = time.perf_counter()
+            text = self.inner.invoke(messages, stop=stop, **kwargs).content
+            record(self.model_name, prompt, self.temperature, text, (time.perf_counter() - start) * 1000)
+        else:
+            text, latency_ms = serve_offline(self.model_name, prompt, self.temperature)
+            _sleep_ms(latency_ms)
+        text = _apply_stop(text, stop)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        prompt = _messages_to_prompt(messages)
+        if BACKEND_MODE == 'record':
+            start = time.perf_counter()
+            parts = []
+            for chunk in self.inner.stream(messages, stop=stop, **kwargs):
+                parts.append(chunk.content)
+                yield ChatGenerationChunk(message=AIMessageChunk(content=chunk.content))
+            record(self.model_name, prompt, self.temperature, ''.join(parts),
+                   (time.perf_counter() - start) * 1000)
+            return
+
+        text, latency_ms = serve_offline(self.model_name, prompt, self.temperature)
+        text = _apply_stop(text, stop)
+        # Spread the latency over the chunks so streaming consumers see it arrive gradually
+        words = re.findall(r'\S+\s*', text)
+        chunks = [''.join(words[i:i + _STREAM_CHUNK_WORDS]) for i in range(0, len(words), _STREAM_CHUNK_WORDS)]
+        for chunk in chunks:
+            _sleep_ms(latency_ms / max(1, len(chunks)))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    LangChain chat model that sends every call to ``inner`` through ``limiter``.
+
+    A streamed call holds its permit until the stream ends. With
+    ``single_flight`` set, identical calls in flight share one request.
+    """
+
+    model_name: str = 'gemini-2.0-flash'
+    temperature: float = 0.7
+    inner: Any = None
+    limiter: Any = None
+    single_flight: Any = None
+
+    @property
+    def _llm_type(self):
+        return f'rate-limited-{self.inner._llm_type}'
+
+    def _key(self, prompt, stop):
+        return request_key(self.model_name, prompt, self.temperature, {'stop': stop} if stop else None)
+
+    def _generate(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        prompt = _messages_to_prompt(messages)
+        prompt_tokens = estimate_tokens(prompt)
+
+        def call():
+            return self.limiter.call(
+                lambda: self.inner.invoke(messages, stop=stop, **kwargs).content,
+                tokens=prompt_tokens,
+                count_tokens=lambda text: prompt_tokens + estimate_tokens(text),
+            )
+
+        if self.single_flight is None:
+            text = call()
+        else:
+            text, _ = self.single_flight.do(
+                self._key(prompt, stop), self.model_name, call,
+                encode=lambda text: {'text': text, 'tokens': prompt_tokens + estimate_tokens(text)},
+                decode=lambda value: value['text'],
+            )
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages, stop: Optional[List[str]] = None, run_manager=None, **kwargs):
+        prompt = _messages_to_prompt(messages)
+        prompt_tokens = estimate_tokens(prompt)
+
+        def open_stream():
+            return (chunk.content for chunk in self.limiter.stream(
+                lambda: self.inner.stream(messages, stop=stop, **kwargs),
+                tokens=prompt_tokens,
+                count_tokens=lambda parts: prompt_tokens + estimate_tokens(''.join(c.content for c in parts)),
+            ))
+
+        if self.single_flight is None:
+            chunks = open_stream()
+        else:
+            chunks = self.single_flight.stream(
+                self._key(prompt, stop), self.model_name, open_stream,
+                encode=lambda parts: {
+                    'text': ''.join(parts), 'tokens': prompt_tokens + estimate_tokens(''.join(parts))
+                },
+                decode=lambda value: [value['text']],
+            )
+        for chunk in chunks:
+            if run_manager:
+                run_manager.on_llm_new_token(chunk)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+
+class _Response:
+    def __init__(self, text):
+        self.text = text
+
+
+class _TokenCount:
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+
+class BackendGenerativeModel:
+    """
+    Stand-in for ``genai.GenerativeModel`` served by the configured backend.
+
+    Supports ``generate_content(prompt).text`` and ``count_tokens(text)``,
+    the parts of the SDK this project uses.
+    """
+
+    def __init__(self, model_name, inner=None):
+        self.model_name = model_name
+        self.inner = inner
+
+    @staticmethod
+    def _prompt_text(contents):
+        if isinstance(contents, (list, tuple)):
+            return '\n'.join(str(part) for part in contents)
+        return str(contents)
+
+    def generate_content(self, contents, **kwargs):
+        prompt = self._prompt_text(contents)
+        if BACKEND_MODE == 'record':
+            start = time.perf_counter()
+            text = self.inner.generate_content(contents, **kwargs).text
+            record(self.model_name, prompt, None, text, (time.perf_counter() - start) * 1000)
+            return _Response(text)
+        text, latency_ms = serve_offline(self.model_name, prompt)
+        _sleep_ms(latency_ms)
+        return _Response(text)
+
+    def count_tokens(self, contents):
+        if BACKEND_MODE == 'record':
+            return self.inner.count_tokens(contents)
+        return _TokenCount(estimate_tokens(self._prompt_text(contents)))
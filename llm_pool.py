@@ -0,0 +1,357 @@
+"""
+Process-wide pool of Gemini clients and blog agent bundles.
+
+Streamlit re-executes the page script on every rerun, but imported modules
+stay loaded, so the state kept here is shared by all sessions on a server.
+Bundles are leased to one caller at a time and recycled when they get too
+old or keep failing.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from rate_limit import get_rate_limiter
+from single_flight import get_single_flight, request_key
+from tracing import span
+
+load_dotenv()
+
+DEFAULT_MODEL = 'gemini-2.0-flash'
+BACKEND_MODE = os.getenv('LLM_BACKEND', 'live').lower()
+POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', '4'))
+MAX_AGE_SECONDS = float(os.getenv('LLM_POOL_MAX_AGE_MINUTES', '60')) * 60
+MAX_FAILURES = int(os.getenv('LLM_POOL_MAX_FAILURES', '3'))
+LEASE_TIMEOUT = float(os.getenv('LLM_POOL_LEASE_TIMEOUT', '300'))
+# Pages give up sooner than background work and ask the user to retry
+INTERACTIVE_LEASE_TIMEOUT = float(os.getenv('LLM_POOL_INTERACTIVE_TIMEOUT', '15'))
+
+_lock = threading.Lock()
+_configured_key = None
+_models = {}
+_agent_pools = {}
+_bundle_llm = None
+
+
+def configure_genai(api_key=None):
+    """Configure the Gemini SDK once per API key."""
+    global _configured_key
+    api_key = api_key or os.getenv('GOOGLE_API_KEY')
+    with _lock:
+        if api_key and api_key != _configured_key:
+            import google.generativeai as genai
+
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+            _models.clear()
+
+
+class TracedModel:
+    """
+    Wraps a GenerativeModel so each ``generate_content`` call is a tracing span.
+
+    Calls that reach Gemini, ``count_tokens`` included, go through
+    ``limiter`` (see ``rate_limit``), and
+    identical calls in flight at the same time share one request (see
+    ``single_flight``).
+    """
+
+    def __init__(self, model, name, limiter=None):
+        self._model = model
+        self._limiter = limiter
+        self.model_name = name
+
+    def generate_content(self, contents, **kwargs):
+        with span('llm.generate_content', model=self.model_name) as s:
+            if self._limiter is None:
+                response, shared = self._model.generate_content(contents, **kwargs), False
+            else:
+                response, shared = get_single_flight().do(
+                    request_key(self.model_name, _prompt_text(contents), options=kwargs or None),
+                    self.model_name,
+                    lambda: self._limiter.call(
+                        lambda: self._model.generate_content(contents, **kwargs),
+                        tokens=_estimate_tokens(contents),
+                        count_tokens=lambda r: sum(_usage_tokens(contents, r)),
+                        trace_span=s,
+                    ),
+                    encode=lambda r: {'text': r.text, 'tokens': sum(_usage_tokens(contents, r))},
+                    decode=lambda value: SharedResponse(value['text']),
+                )
+            if shared:
+                # Another caller's request paid for this response
+                s.set(coalesced=True)
+            else:
+                prompt_tokens, response_tokens = _usage_tokens(contents, response)
+                s.record_tokens(self.model_name, prompt_tokens, response_tokens)
+            return response
+
+    def count_tokens(self, contents, **kwargs):
+        """Count the tokens of ``contents``; each count is a Gemini request, so it is throttled too."""
+        if self._limiter is None:
+            return self._model.count_tokens(contents, **kwargs)
+        return self._limiter.call(lambda: self._model.count_tokens(contents, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class SharedResponse:
+    """A response received from another caller's identical request; only ``text`` is kept."""
+
+    usage_metadata = None
+
+    def __init__(self, text):
+        self.text = text
+
+
+def _prompt_text(contents):
+    if isinstance(contents, (list, tuple)):
+        return '\n'.join(str(part) for part in contents)
+    return str(contents)
+
+
+def _estimate_tokens(contents):
+    return len(_prompt_text(contents)) // 4
+
+
+def _usage_tokens(contents, response):
+    """(prompt, response) tokens from the response's usage metadata, else estimated."""
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        return usage.prompt_token_count, usage.candidates_token_count
+    return _estimate_tokens(contents), _estimate_tokens(response.text)
+
+
+def get_generative_model(name=DEFAULT_MODEL):
+    """
+    Return a shared, traced GenerativeModel for the given model name.
+
+    Outside the live backend (see ``llm_backend``) the wrapped model is a
+    stand-in with the same ``generate_content`` and ``count_tokens`` methods.
+    """
+    configure_genai()
+    with _lock:
+        if name not in _models:
+            # The SDK is imported on first use, so offline backends never load it
+            if BACKEND_MODE in ('live', 'record'):
+                import google.generativeai as genai
+            if BACKEND_MODE == 'live':
+                model = genai.GenerativeModel(name)
+            else:
+                from llm_backend import BackendGenerativeModel
+
+                inner = genai.GenerativeModel(name) if BACKEND_MODE == 'record' else None
+                model = BackendGenerativeModel(name, inner)
+            # Replayed and synthetic calls never reach Gemini, so only live calls are throttled
+            limiter = get_rate_limiter() if BACKEND_MODE in ('live', 'record') else None
+            _models[name] = TracedModel(model, name, limiter)
+        return _models[name]
+
+
+def create_chat_llm(model=DEFAULT_MODEL, temperature=0.7):
+    """
+    Build a LangChain chat client for Gemini, served by the configured backend.
+
+    Live calls go through the shared rate limiter, and identical calls in
+    flight share one request.
+    """
+    if BACKEND_MODE in ('replay', 'synthetic'):
+        from llm_backend import BackendChatModel
+
+        return BackendChatModel(model_name=model, temperature=temperature)
+
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    llm = rate_limited(ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=os.getenv('GOOGLE_API_KEY'),
+        temperature=temperature
+    ), model, temperature)
+    if BACKEND_MODE == 'record':
+        from llm_backend import BackendChatModel
+
+        return BackendChatModel(model_name=model, temperature=temperature, inner=llm)
+    return llm
+
+
+def rate_limited(llm, model=DEFAULT_MODEL, temperature=0.7):
+    """Put a live LangChain chat model behind the shared rate limiter and single-flight table."""
+    from llm_backend import RateLimitedChatModel
+
+    return RateLimitedChatModel(
+        model_name=model, temperature=temperature, inner=llm, limiter=get_rate_limiter(),
+        single_flight=get_single_flight()
+    )
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Slot:
+    def __init__(self, value):
+        self.value = value
+        self.created_at = time.time()
+        self.uses = 0
+        self.failures = 0
+
+
+class ResourcePool:
+    """
+    Thread-safe pool of reusable objects built by ``factory``.
+
+    At most ``size`` objects exist at once. A slot is rebuilt before it is
+    handed out if it is older than ``max_age`` seconds, has failed
+    ``max_failures`` times in a row, or ``health_check(value)`` returns False.
+    """
+
+    def __init__(self, factory, size=POOL_SIZE, max_age=MAX_AGE_SECONDS,
+                 max_failures=MAX_FAILURES, health_check=None):
+        self.factory = factory
+        self.size = max(1, size)
+        self.max_age = max_age
+        self.max_failures = max_failures
+        self.health_check = health_check
+        self._idle = []
+        self._total = 0
+        self._cond = threading.Condition()
+        self._created = 0
+        self._recycled = 0
+
+    def _is_healthy(self, slot):
+        if self.max_age and time.time() - slot.created_at > self.max_age:
+            return False
+        if slot.failures >= self.max_failures:
+            return False
+        if self.health_check is not None:
+            try:
+                return bool(self.health_check(slot.value))
+            except Exception:
+                return False
+        return True
+
+    def _acquire(self, timeout):
+        deadline = time.time() + timeout
+        with self._cond:
+            while True:
+                if self._idle:
+                    slot = self._idle.pop()
+                    if self._is_healthy(slot):
+                        return slot
+                    self._total -= 1
+                    self._recycled += 1
+                    continue
+                if self._total < self.size:
+                    self._total += 1
+                    break
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise PoolTimeout(f"No pooled client became free within {timeout:.0f}s")
+                self._cond.wait(remaining)
+
+        # Build outside the lock so slow client setup does not block releases
+        try:
+            slot = _Slot(self.factory())
+        except Exception:
+            with self._cond:
+                self._total -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._created += 1
+        return slot
+
+    def _release(self, slot):
+        with self._cond:
+            self._idle.append(slot)
+            self._cond.notify()
+
+    @contextmanager
+    def lease(self, timeout=LEASE_TIMEOUT):
+        """Check out a pooled object for the duration of the with-block."""
+        slot = self._acquire(timeout)
+        slot.uses += 1
+        try:
+            yield slot.value
+        except Exception:
+            slot.failures += 1
+            raise
+        else:
+            slot.failures = 0
+        finally:
+            self._release(slot)
+
+    def grow(self, size):
+        """Raise the pool's size limit. The limit is never lowered."""
+        with self._cond:
+            if size > self.size:
+                self.size = size
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                'size': self.size,
+                'open': self._total,
+                'idle': len(self._idle),
+                'in_use': self._total - len(self._idle),
+                'created': self._created,
+                'recycled': self._recycled,
+            }
+
+
+def get_agent_pool(agents_cls, size=POOL_SIZE):
+    """
+    Return the shared pool of ``agents_cls`` instances, creating it on first use.
+
+    Asking for a larger ``size`` than the pool has (e.g. a wide batch run)
+    grows it to that size.
+    """
+    configure_genai()
+    with _lock:
+        pool = _agent_pools.get(agents_cls)
+        if pool is None:
+            pool = ResourcePool(agents_cls, size=size)
+            _agent_pools[agents_cls] = pool
+    pool.grow(size)
+    return pool
+
+
+def bundle_agent(blog_agents, name):
+    """
+    Return the bundle's agent for ``name``, e.g. 'research' or 'plagiarism_checker'.
+
+    The root ``agents.BlogAgents`` keeps one agent per name (``get_agent``);
+    bundles without it, like the Merge app's ``Blog.agents``, build a new one
+    with ``create_<name>_agent``.
+    """
+    get_agent = getattr(blog_agents, 'get_agent', None)
+    if get_agent is not None:
+        return get_agent(name)
+    return getattr(blog_agents, f'create_{name}_agent')()
+
+
+def bundle_llm(blog_agents):
+    """
+    Return the chat model for direct calls (streaming, plans, rewrites) made for a bundle.
+
+    Bundles without an ``llm`` attribute share one client from ``create_chat_llm``.
+    """
+    global _bundle_llm
+    llm = getattr(blog_agents, 'llm', None)
+    if llm is not None:
+        return llm
+    with _lock:
+        if _bundle_llm is None:
+            _bundle_llm = create_chat_llm(DEFAULT_MODEL)
+        return _bundle_llm
+
+
+def pool_stats():
+    with _lock:
+        pools = dict(_agent_pools)
+    return {cls.__name__: pool.stats() for cls, pool in pools.items()}
@@ -0,0 +1,269 @@
+"""
+Local originality index over previously generated content.
+
+Each document is split into overlapping word shingles and summarized with a
+MinHash signature. Signatures are bucketed with LSH, so near-duplicate
+candidates are found without comparing against every document. Candidates
+are then scored on their exact shingle overlap with the query, and the
+overlapping passages are reported.
+
+The index is stored in SQLite with signatures and shingle hashes packed as
+binary blobs, so startup only has to read the blobs back into arrays.
+"""
+
+import hashlib
+import html
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+
+from stage_cache import CACHE_DIR
+
+SHINGLE_SIZE = 5
+NUM_PERM = 128
+# One row per band favours recall on partial overlaps: a reused paragraph has
+# a low Jaccard similarity with the whole post. Candidates are then filtered
+# on exact shingle overlap, which is cheap.
+BANDS = 128
+MIN_PASSAGE_WORDS = 8
+
+_MAX_HASH = (1 << 64) - 1
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+_TAG_RE = re.compile(r'<(script|style)[^>]*>.*?</\1>|<[^>]+>', re.DOTALL | re.IGNORECASE)
+
+# Shingle hashes are already uniformly distributed, so XOR with a random
+# mask is enough to permute them, and min(map(mask.__xor__, ...)) runs in C.
+# The seed is fixed so signatures stored on disk stay comparable.
+_rng = random.Random(20240601)
+_MASKS = [_rng.getrandbits(64) for _ in range(NUM_PERM)]
+
+
+def tokenize(text):
+    return _WORD_RE.findall(text.lower())
+
+
+def _hash_shingle(words):
+    digest = hashlib.blake2b(' '.join(words).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def shingle_hashes(words, size=SHINGLE_SIZE):
+    """Hash every run of ``size`` consecutive words; short texts give one shingle."""
+    if len(words) < size:
+        return [_hash_shingle(words)] if words else []
+    return [_hash_shingle(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def minhash_signature(hashes):
+    unique = set(hashes)
+    if not unique:
+        return [_MAX_HASH] * NUM_PERM
+    return [min(map(mask.__xor__, unique)) for mask in _MASKS]
+
+
+def document_id(text):
+    return hashlib.sha1(' '.join(tokenize(text)).encode('utf-8')).hexdigest()
+
+
+def extract_document_text(path):
+    """Return the plain text of an exported HTML or PDF file."""
+    path = Path(path)
+    if path.suffix.lower() in ('.html', '.htm'):
+        raw = path.read_text(encoding='utf-8', errors='ignore')
+        return html.unescape(_TAG_RE.sub(' ', raw))
+    if path.suffix.lower() == '.pdf':
+        from PyPDF2 import PdfReader
+
+        reader = PdfReader(str(path))
+        return '\n'.join(page.extract_text() or '' for page in reader.pages)
+    return path.read_text(encoding='utf-8', errors='ignore')
+
+
+class OriginalityIndex:
+    def __init__(self, path=None, bands=BANDS):
+        self.path = Path(path) if path else CACHE_DIR / 'originality.sqlite3'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.bands = bands
+        self.rows_per_band = NUM_PERM // bands
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                title TEXT,
+                source_mtime REAL,
+                added_at REAL NOT NULL,
+                signature BLOB NOT NULL,
+                shingles BLOB NOT NULL,
+                text TEXT NOT NULL
+            )
+        """)
+        self._conn.commit()
+        self._docs = {}
+        self._buckets = {}
+        self._sources = {}
+        self._load()
+
+    def _load(self):
+        rows = self._conn.execute(
+            'SELECT doc_id, source, title, source_mtime, signature, shingles FROM documents'
+        )
+        for doc_id, source, title, source_mtime, signature_blob, shingles_blob in rows:
+            signature = array('Q')
+            signature.frombytes(signature_blob)
+            shingles = array('Q')
+            shingles.frombytes(shingles_blob)
+            self._register(doc_id, source, title, source_mtime, signature, shingles)
+
+    def _band_keys(self, signature):
+        r = self.rows_per_band
+        return [(band, tuple(signature[band * r:(band + 1) * r])) for band in range(self.bands)]
+
+    def _register(self, doc_id, source, title, source_mtime, signature, shingles):
+        self._docs[doc_id] = {
+            'source': source,
+            'title': title,
+            'signature': signature,
+            'shingles': shingles,
+        }
+        self._sources[source] = source_mtime
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(doc_id)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def add(self, text, source, title=None, source_mtime=None):
+        """Index a document. Returns its id, or None if the same text is already indexed."""
+        words = tokenize(text)
+        if not words:
+            return None
+        doc_id = document_id(text)
+        with self._lock:
+            if doc_id in self._docs:
+                return None
+            hashes = shingle_hashes(words)
+            signature = array('Q', minhash_signature(hashes))
+            shingles = array('Q', sorted(set(hashes)))
+            self._conn.execute(
+                'INSERT OR IGNORE INTO documents '
+                '(doc_id, source, title, source_mtime, added_at, signature, shingles, text) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (doc_id, source, title, source_mtime, time.time(),
+                 signature.tobytes(), shingles.tobytes(), text)
+            )
+            self._conn.commit()
+            self._register(doc_id, source, title, source_mtime, signature, shingles)
+        return doc_id
+
+    def index_directory(self, directory, extensions=('.html', '.pdf')):
+        """Index exported files under ``directory`` that are new or changed since last time."""
+        added = 0
+        for path in sorted(Path(directory).rglob('*')):
+            if path.suffix.lower() not in extensions or not path.is_file():
+                continue
+            mtime = path.stat().st_mtime
+            if self._sources.get(str(path)) == mtime:
+                continue
+            try:
+                text = extract_document_text(path)
+            except Exception as e:
+                print(f"Originality index: skipping {path}: {str(e)}")
+                continue
+            if self.add(text, source=str(path), title=path.stem, source_mtime=mtime):
+                added += 1
+        return added
+
+    def query(self, text, top_k=5, min_overlap=0.02):
+        """
+        Find indexed documents that share passages with ``text``.
+
+        Returns up to ``top_k`` matches, most overlapping first. Each match
+        has the document's source and title, its estimated and exact Jaccard
+        similarity, the share of the query's shingles found in it
+        (``overlap``), and the overlapping passages from the query.
+        """
+        spans = [m.span() for m in _WORD_RE.finditer(text)]
+        words = [text[start:end].lower() for start, end in spans]
+        hashes = shingle_hashes(words)
+        if not hashes:
+            return []
+        query_id = document_id(text)
+        signature = minhash_signature(hashes)
+        query_set = set(hashes)
+
+        with self._lock:
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            candidates.discard(query_id)
+            docs = [(doc_id, self._docs[doc_id]) for doc_id in candidates]
+
+        matches = []
+        for doc_id, doc in docs:
+            doc_set = set(doc['shingles'])
+            shared = query_set & doc_set
+            overlap = len(shared) / len(query_set)
+            if overlap < min_overlap:
+                continue
+            estimated = sum(1 for x, y in zip(signature, doc['signature']) if x == y) / NUM_PERM
+            matches.append({
+                'doc_id': doc_id,
+                'source': doc['source'],
+                'title': doc['title'],
+                'estimated_similarity': estimated,
+                'similarity': len(shared) / len(query_set | doc_set),
+                'overlap': overlap,
+                'passages': self._passages(text, spans, hashes, shared),
+            })
+        matches.sort(key=lambda m: m['overlap'], reverse=True)
+        return matches[:top_k]
+
+    @staticmethod
+    def _passages(text, spans, hashes, shared):
+        """Merge runs of shared shingles into passages of the original query text."""
+        if len(spans) < SHINGLE_SIZE:
+            return [text[spans[0][0]:spans[-1][1]]] if hashes and hashes[0] in shared else []
+        runs = []
+        start = end = None
+        for i, h in enumerate(hashes):
+            if h in shared:
+                if start is None:
+                    start = i
+                end = i + SHINGLE_SIZE
+            elif start is not None and i >= end:
+                runs.append((start, end))
+                start = None
+        if start is not None:
+            runs.append((start, end))
+        return [
+            text[spans[s][0]:spans[e - 1][1]] for s, e in runs if e - s >= MIN_PASSAGE_WORDS
+        ]
+
+
+def originality_score(matches):
+    """0-100 score, where 100 means no indexed document shares passages with the text."""
+    if not matches:
+        return 100
+    return round(100 * (1 - max(m['overlap'] for m in matches)))
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_originality_index(export_dir='exports'):
+    """Return the process-wide index, catching up on new files in ``export_dir`` on first use."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = OriginalityIndex()
+            if os.path.isdir(export_dir):
+                _default_index.index_directory(export_dir)
+        return _default_index
@@ -0,0 +1,445 @@
+"""
+Host-wide throttling for Gemini calls.
+
+Every live model call (the crews' chat model, content analysis,
+translation and token counts) takes a permit from the limiter before it
+is sent:
+
+- Two token buckets cap requests per minute (``LLM_RPM``) and tokens per
+  minute (``LLM_TPM``). A call reserves its estimated prompt tokens up
+  front and settles the difference once the real count is known. The
+  buckets live in a small SQLite table (``LLM_RATE_DB``, default
+  ``.cache/rate_limit.sqlite3``), so the app, the API and every job worker
+  on the host spend one budget. Set ``LLM_RATE_SHARED=0`` to give each
+  process its own buckets.
+- Concurrency adapts AIMD-style: the limit grows by one after a window of
+  successful calls, up to ``LLM_MAX_CONCURRENCY``, and is halved when
+  Gemini reports a quota error.
+- Quota and transient server errors are retried up to ``LLM_MAX_RETRIES``
+  times with full-jitter exponential backoff.
+- Waiting callers are served by priority class: 'interactive' (the
+  default) before 'batch'. Use ``priority('batch')`` around bulk work. A
+  caller that has to wait is recorded in the shared table, and no process
+  sends a batch call while an interactive one is waiting anywhere.
+
+Under peak load calls queue and slow down instead of failing the run.
+"""
+
+import contextvars
+import heapq
+import itertools
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from stage_cache import CACHE_DIR
+
+REQUESTS_PER_MINUTE = float(os.getenv('LLM_RPM', '60'))
+TOKENS_PER_MINUTE = float(os.getenv('LLM_TPM', '1000000'))
+MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', '8'))
+MIN_CONCURRENCY = 1
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '4'))
+BACKOFF_BASE_SECONDS = float(os.getenv('LLM_BACKOFF_BASE_SECONDS', '1'))
+BACKOFF_MAX_SECONDS = float(os.getenv('LLM_BACKOFF_MAX_SECONDS', '60'))
+# Several in-flight calls usually fail together; only the first cut counts
+DECREASE_COOLDOWN_SECONDS = 2.0
+SHARED = os.getenv('LLM_RATE_SHARED', '1') != '0'
+RATE_DB = Path(os.getenv('LLM_RATE_DB', CACHE_DIR / 'rate_limit.sqlite3'))
+# Other processes spend the shared buckets too, so a waiting caller checks again at least this often
+SHARED_POLL_SECONDS = 0.5
+# A waiter not seen for this long belonged to a process that has gone away
+WAITER_TTL_SECONDS = 5.0
+
+PRIORITIES = ('interactive', 'batch')
+
+# Exception class names (google.api_core, HTTP clients) and status codes worth retrying
+_QUOTA_ERRORS = {'ResourceExhausted', 'TooManyRequests'}
+_TRANSIENT_ERRORS = {'ServiceUnavailable', 'InternalServerError', 'DeadlineExceeded', 'GatewayTimeout'}
+_QUOTA_CODES = {429}
+_TRANSIENT_CODES = {500, 502, 503, 504}
+
+_priority = contextvars.ContextVar('llm_priority', default='interactive')
+
+
+@contextmanager
+def priority(name):
+    """Run the with-block's model calls in the given priority class."""
+    if name not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}, not {name!r}")
+    token = _priority.set(name)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def _status_code(error):
+    code = getattr(error, 'code', None)
+    if callable(code):
+        code = None
+    if code is None:
+        code = getattr(getattr(error, 'response', None), 'status_code', None)
+    return code if isinstance(code, int) else None
+
+
+def is_quota_error(error):
+    if type(error).__name__ in _QUOTA_ERRORS or _status_code(error) in _QUOTA_CODES:
+        return True
+    message = str(error).lower()
+    return '429' in message or 'quota' in message or 'rate limit' in message
+
+
+def is_retryable(error):
+    return (
+        is_quota_error(error)
+        or type(error).__name__ in _TRANSIENT_ERRORS
+        or _status_code(error) in _TRANSIENT_CODES
+    )
+
+
+def backoff_seconds(attempt):
+    """Full-jitter exponential backoff for the given retry (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4) if text else 0
+
+
+class TokenBucket:
+    """Refills at ``per_minute / 60`` per second up to ``per_minute``; may go into debt when settled."""
+
+    def __init__(self, per_minute):
+        self.capacity = max(1.0, per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until ``amount`` is available; amounts over capacity wait for a full bucket."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, amount):
+        """Remove ``amount``; a negative amount gives tokens back, up to capacity."""
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class LocalBuckets:
+    """The request and token buckets of this process alone."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+
+    def take(self, tokens, rank, waiter):
+        """Take one request and ``tokens``, or return the seconds to wait before trying again."""
+        now = time.monotonic()
+        wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+        if wait == 0:
+            self.requests.take(1)
+            self.tokens.take(tokens)
+        return wait
+
+    def forget(self, waiter):
+        pass
+
+    def settle(self, amount):
+        self.tokens.take(amount)
+
+    def available(self):
+        return self.requests.tokens, self.tokens.tokens
+
+
+class SharedBuckets:
+    """
+    Request and token buckets kept in SQLite and spent by every process that opens the file.
+
+    A caller that has to wait is recorded with its priority rank, and no
+    caller takes a permit while one of a higher priority is waiting.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute, path=RATE_DB):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_waiters (
+                id TEXT PRIMARY KEY,
+                rank INTEGER NOT NULL,
+                seen_at REAL NOT NULL
+            )
+        """)
+
+    def _load(self, now):
+        rows = {name: (tokens, updated_at) for name, tokens, updated_at in self._conn.execute(
+            'SELECT name, tokens, updated_at FROM rate_buckets'
+        ).fetchall()}
+        for name, bucket in (('requests', self.requests), ('tokens', self.tokens)):
+            bucket.tokens, bucket.updated = rows.get(name, (bucket.capacity, now))
+            bucket._refill(now)
+
+    def _store(self):
+        for name, bucket in (('requests', self.requests), ('tokens', self.tokens)):
+            self._conn.execute(
+                'INSERT INTO rate_buckets (name, tokens, updated_at) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at',
+                (name, bucket.tokens, bucket.updated)
+            )
+
+    def _transaction(self, body):
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = body(time.time())
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return result
+
+    def take(self, tokens, rank, waiter):
+        """Take one request and ``tokens``, or record ``waiter`` and return the seconds to wait."""
+        def body(now):
+            self._load(now)
+            wait = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            self._conn.execute('DELETE FROM rate_waiters WHERE seen_at < ?', (now - WAITER_TTL_SECONDS,))
+            ahead = self._conn.execute(
+                'SELECT 1 FROM rate_waiters WHERE rank < ? AND id != ? LIMIT 1', (rank, waiter)
+            ).fetchone()
+            if ahead is not None:
+                wait = max(wait, SHARED_POLL_SECONDS)
+            if wait == 0:
+                self.requests.take(1)
+                self.tokens.take(tokens)
+                self._conn.execute('DELETE FROM rate_waiters WHERE id = ?', (waiter,))
+            else:
+                self._conn.execute(
+                    'INSERT INTO rate_waiters (id, rank, seen_at) VALUES (?, ?, ?) '
+                    'ON CONFLICT (id) DO UPDATE SET seen_at = excluded.seen_at',
+                    (waiter, rank, now)
+                )
+            self._store()
+            return min(wait, SHARED_POLL_SECONDS)
+
+        return self._transaction(body)
+
+    def forget(self, waiter):
+        with self._lock:
+            self._conn.execute('DELETE FROM rate_waiters WHERE id = ?', (waiter,))
+
+    def settle(self, amount):
+        def body(now):
+            self._load(now)
+            self.tokens.take(amount)
+            self._store()
+
+        self._transaction(body)
+
+    def available(self):
+        with self._lock:
+            self._load(time.time())
+            return self.requests.tokens, self.tokens.tokens
+
+
+def create_buckets(requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE, shared=SHARED):
+    """Return host-wide buckets, or this process's own if ``shared`` is off or the store cannot be opened."""
+    if shared:
+        try:
+            return SharedBuckets(requests_per_minute, tokens_per_minute)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Shared rate limit store unavailable ({e}), limiting this process only")
+    return LocalBuckets(requests_per_minute, tokens_per_minute)
+
+
+class RateLimiter:
+    """
+    Shared gate for model calls: token buckets, adaptive concurrency and priority queueing.
+
+    Use ``call`` for a single request/response call and ``permit`` to hold a
+    slot for the length of a streamed response. ``buckets`` (see
+    ``create_buckets``) holds the request and token budgets; concurrency is
+    limited per process.
+    """
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES, buckets=None):
+        self.buckets = buckets or create_buckets(requests_per_minute, tokens_per_minute)
+        self.max_concurrency = max(MIN_CONCURRENCY, max_concurrency)
+        self.max_retries = max_retries
+        self.limit = self.max_concurrency
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._successes = 0
+        self._last_decrease = 0.0
+        self._stats = {'calls': 0, 'retries': 0, 'throttled': 0, 'waited_seconds': 0.0}
+
+    def _acquire(self, tokens):
+        ticket = (PRIORITIES.index(current_priority()), next(self._seq))
+        waiter = uuid.uuid4().hex
+        acquired = False
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket and self._in_flight < self.limit:
+                        timeout = self.buckets.take(tokens, ticket[0], waiter)
+                        if timeout == 0:
+                            self._in_flight += 1
+                            acquired = True
+                            break
+                    self._cond.wait(timeout)
+            finally:
+                if not acquired:
+                    self.buckets.forget(waiter)
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            waited = time.monotonic() - started
+            self._stats['calls'] += 1
+            self._stats['waited_seconds'] += waited
+        return waited
+
+    def _release(self, outcome):
+        with self._cond:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if outcome == 'throttled':
+                self._stats['throttled'] += 1
+                self._successes = 0
+                if now - self._last_decrease >= DECREASE_COOLDOWN_SECONDS:
+                    self.limit = max(MIN_CONCURRENCY, self.limit // 2)
+                    self._last_decrease = now
+            elif outcome == 'ok':
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+            self._cond.notify_all()
+
+    def settle(self, reserved, actual):
+        """Charge the token bucket for the difference between a call's estimate and its real usage."""
+        with self._cond:
+            self.buckets.settle(actual - reserved)
+
+    @contextmanager
+    def permit(self, tokens=0):
+        """
+        Hold one concurrency slot, charged ``tokens`` up front, for the with-block.
+
+        Yields the seconds spent waiting for the slot.
+        """
+        waited = self._acquire(tokens)
+        outcome = 'ok'
+        try:
+            yield waited
+        except Exception as e:
+            outcome = 'throttled' if is_quota_error(e) else 'error'
+            raise
+        finally:
+            self._release(outcome)
+
+    def call(self, fn, tokens=0, count_tokens=None, trace_span=None):
+        """
+        Run ``fn()`` under a permit, retrying quota and transient errors with backoff.
+
+        ``count_tokens(result)``, if given, returns the call's real token
+        usage, which replaces the ``tokens`` estimate in the bucket. The
+        time spent waiting and the retries are added to ``trace_span``.
+        """
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self.permit(tokens) as slot_wait:
+                    waited += slot_wait
+                    result = fn()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                with self._cond:
+                    self._stats['retries'] += 1
+                delay = backoff_seconds(attempt)
+                waited += delay
+                time.sleep(delay)
+                continue
+            if count_tokens is not None:
+                self.settle(tokens, count_tokens(result))
+            if trace_span is not None:
+                trace_span.set(rate_limit_wait_ms=round(waited * 1000, 1), retries=attempt)
+            return result
+
+    def stream(self, open_stream, tokens=0, count_tokens=None):
+        """
+        Yield from ``open_stream()`` under a permit held until the stream ends.
+
+        A stream that fails before its first item is retried like ``call``;
+        once items have been yielded, errors go to the caller.
+        ``count_tokens(items)`` settles the bucket when the stream ends.
+        """
+        for attempt in range(self.max_retries + 1):
+            items = []
+            try:
+                with self.permit(tokens):
+                    for item in open_stream():
+                        items.append(item)
+                        yield item
+            except Exception as e:
+                if items or attempt == self.max_retries or not is_retryable(e):
+                    raise
+                with self._cond:
+                    self._stats['retries'] += 1
+                time.sleep(backoff_seconds(attempt))
+                continue
+            if count_tokens is not None:
+                self.settle(tokens, count_tokens(items))
+            return
+
+    def stats(self):
+        with self._cond:
+            requests_available, tokens_available = self.buckets.available()
+            return dict(
+                self._stats, limit=self.limit, in_flight=self._in_flight, waiting=len(self._waiting),
+                requests_available=round(requests_available, 1), tokens_available=round(tokens_available)
+            )
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter():
+    """Return this process's limiter, creating it on first use."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
@@ -0,0 +1,313 @@
+"""
+Generated blog posts as addressable sections.
+
+A post is split at its H2 headings into an intro (everything before the
+first H2, including the title), one section per H2 and, when the last H2
+reads like one, a conclusion. A draft keeps the sections together with the
+inputs and the writer context they were generated from, so a single section
+can be regenerated, made more technical or shortened against that context,
+and spliced back in without rerunning the whole pipeline.
+
+The same machinery keeps posts on length: ``fit_to_length`` compares each
+section's word count with its share of the word limit and rewrites only
+the sections responsible for a miss.
+"""
+
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from blog_pipeline import create_writing_task, plan_word_budgets, prepare_writer_context
+from document import markdown_to_text
+from llm_pool import bundle_agent, bundle_llm
+from tracing import span, wrap
+
+Section = namedtuple('Section', 'key kind title text')
+
+_H2_RE = re.compile(r'^\s{0,3}##\s+(.*?)\s*#*\s*$')
+_FENCE_RE = re.compile(r'^\s*(```|~~~)')
+_CONCLUSION_RE = re.compile(r'\b(conclusion|final thoughts|wrapping up|summary|takeaways?|in closing)\b', re.I)
+_WORD_RE = re.compile(r"\w[\w'’-]*")
+
+# Share of the word limit a post may miss by before sections are rewritten
+LENGTH_TOLERANCE = float(os.getenv('LENGTH_TOLERANCE', '0.1'))
+LENGTH_MAX_PASSES = 2
+
+SECTION_ACTIONS = {
+    'regenerate': "Rewrite this section from scratch, keeping its heading and its role in the post.",
+    'technical': "Rewrite this section to be more technical: add precise terminology, mechanisms and concrete "
+                 "details, while keeping it readable for the target audience.",
+    'shorten': "Shorten this section to about {words} words, keeping its most important points.",
+    'extend': "Expand this section to about {words} words with concrete details, examples or data from the "
+              "research context. Do not pad or repeat other sections.",
+    'custom': "{instruction}",
+}
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '-', text.lower()).strip('-') or 'section'
+
+
+def count_words(markdown):
+    """Count the words a reader sees, ignoring markdown syntax."""
+    return len(_WORD_RE.findall(markdown_to_text(markdown)))
+
+
+def split_sections(markdown):
+    """Split a markdown post into intro, H2 sections and conclusion."""
+    chunks = [[None, []]]
+    in_fence = False
+    for line in str(markdown).replace('\r\n', '\n').split('\n'):
+        if _FENCE_RE.match(line):
+            in_fence = not in_fence
+        heading = None if in_fence else _H2_RE.match(line)
+        if heading:
+            chunks.append([heading.group(1), []])
+        chunks[-1][1].append(line)
+
+    sections = []
+    seen = set()
+    for n, (title, lines) in enumerate(chunks):
+        text = '\n'.join(lines).strip()
+        if title is None:
+            if text:
+                sections.append(Section('intro', 'intro', 'Introduction', text))
+            continue
+        is_last = n == len(chunks) - 1
+        kind = 'conclusion' if is_last and _CONCLUSION_RE.search(title) else 'section'
+        key = 'conclusion' if kind == 'conclusion' else _slug(title)
+        base, suffix = key, 2
+        while key in seen:
+            key = f'{base}-{suffix}'
+            suffix += 1
+        seen.add(key)
+        sections.append(Section(key, kind, title, text))
+    return sections
+
+
+def join_sections(sections):
+    return '\n\n'.join(section.text.strip() for section in sections if section.text.strip())
+
+
+def create_draft(content, inputs, research_width=1, context=None):
+    """Bundle a generated post's sections with the inputs and writer context it was generated from."""
+    return {
+        'inputs': dict(inputs),
+        'research_width': research_width,
+        'context': context,
+        'sections': split_sections(content),
+    }
+
+
+def draft_context(draft, blog_agents, use_cache=True):
+    """
+    The writer context for follow-up calls on a draft.
+
+    Drafts made without one (e.g. from an older session) rebuild it through
+    the stage cache, which reruns research and NLP if the cache is off.
+    """
+    if draft.get('context'):
+        return draft['context']
+    return prepare_writer_context(
+        draft['inputs'], blog_agents, use_cache=use_cache, research_width=draft.get('research_width', 1)
+    )
+
+
+def draft_content(draft):
+    return join_sections(draft['sections'])
+
+
+def find_section(draft, key):
+    for index, section in enumerate(draft['sections']):
+        if section.key == key:
+            return index, section
+    raise KeyError(f"No section {key!r} in this draft")
+
+
+def build_section_prompt(agent, task, sections, index, instruction, context):
+    """Prompt for rewriting ``sections[index]`` with the rest of the post for continuity."""
+    section = sections[index]
+    outline = '\n'.join(
+        f"- {s.title}" + ("  <- this section" if n == index else '') for n, s in enumerate(sections)
+    )
+    neighbours = []
+    if index > 0:
+        neighbours.append(f"Previous section:\n{sections[index - 1].text}")
+    if index + 1 < len(sections):
+        neighbours.append(f"Next section:\n{sections[index + 1].text}")
+    heading_rule = (
+        "Start with the same heading line." if section.kind != 'intro'
+        else "Keep the post's title heading if the section has one."
+    )
+    return '\n\n'.join([
+        f"You are {agent.role}. Your personal goal is: {agent.goal}",
+        "You are revising one section of an existing blog post written for this brief:\n"
+        + '\n'.join(line.strip() for line in task.description.strip().splitlines()),
+        f"Post outline:\n{outline}",
+        *neighbours,
+        f"This is the research context the post was written from:\n{context}",
+        f"Section to revise:\n{section.text}",
+        f"Instruction: {instruction}\n{heading_rule} Reply with the revised section only, formatted in Markdown.",
+    ])
+
+
+def _restore_heading(section, text):
+    text = text.strip()
+    if section.kind == 'intro' or _H2_RE.match(text.split('\n', 1)[0]):
+        return text
+    return f"## {section.title}\n\n{text}"
+
+
+def rewrite_section(draft, key, blog_agents, instruction, use_cache=True, context=None):
+    """
+    Rewrite one section with ``instruction`` and return a new draft with it spliced in.
+
+    The writer context is ``context``, or the one kept in the draft, so only
+    one writer call is made.
+    """
+    index, section = find_section(draft, key)
+    inputs = draft['inputs']
+    with span('section.rewrite', section=key, words_before=count_words(section.text)) as section_span:
+        if context is None:
+            context = draft_context(draft, blog_agents, use_cache=use_cache)
+        writer_agent = bundle_agent(blog_agents, 'writer')
+        prompt = build_section_prompt(
+            writer_agent, create_writing_task(writer_agent, inputs), draft['sections'], index, instruction, context
+        )
+        text = _restore_heading(section, bundle_llm(blog_agents).invoke(prompt).content)
+        section_span.set(words_after=count_words(text))
+
+    sections = list(draft['sections'])
+    sections[index] = section._replace(text=text)
+    return dict(draft, sections=sections)
+
+
+def regenerate_section(draft, key, blog_agents, action='regenerate', words=None, instruction=None,
+                       use_cache=True):
+    """
+    Apply one of ``SECTION_ACTIONS`` to a section and return the updated draft.
+
+    'shorten' and 'extend' need ``words``; 'custom' needs ``instruction``.
+    """
+    if action not in SECTION_ACTIONS:
+        raise ValueError(f"Unknown section action: {action}")
+    if action in ('shorten', 'extend') and not words:
+        raise ValueError("Resizing a section needs a target word count")
+    if action == 'custom' and not (instruction or '').strip():
+        raise ValueError("A custom rewrite needs an instruction")
+    text = SECTION_ACTIONS[action].format(words=words, instruction=(instruction or '').strip())
+    return rewrite_section(draft, key, blog_agents, text, use_cache=use_cache)
+
+
+def count_stream_words(chunks, on_count):
+    """Pass streamed chunks through, calling ``on_count(words)`` with the running word count."""
+    words = 0
+    tail = ''
+    for chunk in chunks:
+        # Only the last word can still go on in the next chunk, so only it is carried over
+        text = tail + chunk
+        tail = ''
+        matches = list(_WORD_RE.finditer(text))
+        if matches and matches[-1].end() == len(text):
+            tail = text[matches[-1].start():]
+            matches.pop()
+        words += len(matches)
+        on_count(words + (1 if tail else 0))
+        yield chunk
+
+
+def section_budgets(sections, word_limit):
+    """
+    Word budget for each section of a post, following ``plan_word_budgets``.
+
+    The intro and conclusion get their planned share when present; the body
+    sections split the rest evenly.
+    """
+    plan = plan_word_budgets(word_limit)
+    fixed = {
+        'intro': plan['intro'] if any(s.kind == 'intro' for s in sections) else 0,
+        'conclusion': plan['conclusion'] if any(s.kind == 'conclusion' for s in sections) else 0,
+    }
+    body = [s for s in sections if s.kind == 'section']
+    body_budget = (int(word_limit) - sum(fixed.values())) / len(body) if body else 0
+    if not body:
+        # Only an intro and/or a conclusion: share the whole limit between them
+        share = int(word_limit) / max(1, len(sections))
+        return [round(share) for _ in sections]
+    return [fixed[s.kind] if s.kind in fixed else round(body_budget) for s in sections]
+
+
+def plan_length_fixes(sections, word_limit, tolerance=LENGTH_TOLERANCE):
+    """
+    Pick the sections to resize so the post lands within ``tolerance`` of the limit.
+
+    Returns ``[(index, action, budget)]``, largest offender first; empty when
+    the post is already on length.
+    """
+    word_limit = int(word_limit)
+    counts = [count_words(s.text) for s in sections]
+    error = sum(counts) - word_limit
+    allowed = tolerance * word_limit
+    if abs(error) <= allowed:
+        return []
+
+    budgets = section_budgets(sections, word_limit)
+    sign = 1 if error > 0 else -1
+    offenders = sorted(
+        ((counts[i] - budgets[i]) * sign, i) for i in range(len(sections)) if (counts[i] - budgets[i]) * sign > 0
+    )
+    fixes = []
+    remaining = abs(error)
+    for deviation, index in reversed(offenders):
+        fixes.append((index, 'shorten' if sign > 0 else 'extend', budgets[index]))
+        remaining -= deviation
+        if remaining <= allowed:
+            break
+    return fixes
+
+
+def fit_to_length(draft, blog_agents, word_limit=None, tolerance=LENGTH_TOLERANCE,
+                  max_passes=LENGTH_MAX_PASSES, use_cache=True):
+    """
+    Bring a draft within ``tolerance`` of its word limit by resizing offending sections.
+
+    Sections on budget are left alone; the ones that are resized are rewritten
+    concurrently in one targeted call each. Returns the new draft and a list
+    of ``{'key', 'action', 'budget', 'before', 'after'}`` changes.
+    """
+    word_limit = int(word_limit or draft['inputs']['word_limit'])
+    changes = []
+    context = None
+    for _ in range(max_passes):
+        fixes = plan_length_fixes(draft['sections'], word_limit, tolerance)
+        if not fixes:
+            break
+        with span('section.fit_length', word_limit=word_limit, sections=len(fixes)):
+            if context is None:
+                context = draft_context(draft, blog_agents, use_cache=use_cache)
+            sections = draft['sections']
+
+            def resize(fix):
+                index, action, budget = fix
+                updated = rewrite_section(
+                    draft, sections[index].key, blog_agents,
+                    SECTION_ACTIONS[action].format(words=budget), context=context
+                )
+                return updated['sections'][index]
+
+            with ThreadPoolExecutor(max_workers=len(fixes), thread_name_prefix='fit-length') as executor:
+                resized = [future.result() for future in [executor.submit(wrap(resize), fix) for fix in fixes]]
+
+        sections = list(sections)
+        for (index, action, budget), section in zip(fixes, resized):
+            changes.append({
+                'key': section.key,
+                'action': action,
+                'budget': budget,
+                'before': count_words(sections[index].text),
+                'after': count_words(section.text),
+            })
+            sections[index] = section
+        draft = dict(draft, sections=sections)
+    return draft, changes
@@ -0,0 +1,250 @@
+"""
+Single-flight coalescing of identical Gemini calls.
+
+When several sessions send the same request at the same time (one
+circular uploaded twice, one trending topic researched twice), only the
+first caller, the leader, calls Gemini. The others wait for its result and
+return that. Requests match on (model, prompt hash, temperature).
+Callers coordinate through a small SQLite table (``LLM_SINGLE_FLIGHT_DB``,
+default ``.cache/single_flight.sqlite3``), so this works across job worker
+processes as well as threads.
+
+Only calls in flight are shared: once the leader has finished, the next
+identical call goes to Gemini again. The stage cache covers reuse over
+time. If the leader fails, or stops updating for
+``LLM_SINGLE_FLIGHT_TIMEOUT`` seconds, a follower makes the call itself.
+A follower of a streamed call receives the leader's text as one chunk.
+
+Hits (calls answered by another caller's request), misses and the tokens
+the hits saved are counted per model; ``python single_flight.py`` prints
+them. Set ``LLM_SINGLE_FLIGHT=0`` to turn coalescing off.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from stage_cache import CACHE_DIR
+
+ENABLED = os.getenv('LLM_SINGLE_FLIGHT', '1') != '0'
+FLIGHT_DB = Path(os.getenv('LLM_SINGLE_FLIGHT_DB', CACHE_DIR / 'single_flight.sqlite3'))
+LEADER_TIMEOUT = float(os.getenv('LLM_SINGLE_FLIGHT_TIMEOUT', '300'))
+POLL_SECONDS = 0.1
+# A streaming leader marks its flight as alive at most this often
+TOUCH_SECONDS = 5.0
+# Finished flights are kept this long for followers that have not polled yet
+KEEP_SECONDS = 60.0
+
+
+def request_key(model, prompt, temperature=None, options=None):
+    """Key of a model call: the model, a hash of the prompt, the temperature and any other options."""
+    prompt_hash = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+    payload = json.dumps([model, prompt_hash, temperature, options], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SingleFlight:
+    """Shares the result of a call among identical callers that overlap in time."""
+
+    def __init__(self, path=FLIGHT_DB):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS flights (
+                id TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                model TEXT NOT NULL,
+                status TEXT NOT NULL,
+                value TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_flights_key ON flights (key, status)')
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS flight_stats (
+                model TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                tokens_saved INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+
+    def _count(self, model, hits=0, misses=0, tokens_saved=0):
+        self._conn.execute(
+            'INSERT INTO flight_stats (model, hits, misses, tokens_saved) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (model) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses, '
+            'tokens_saved = tokens_saved + excluded.tokens_saved',
+            (model, hits, misses, tokens_saved)
+        )
+
+    def _join(self, key, model):
+        """Return ``(flight_id, is_leader)``: the live flight for ``key``, or a new one this caller leads."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    "SELECT id, updated_at FROM flights WHERE key = ? AND status = 'running'", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= LEADER_TIMEOUT:
+                    self._conn.execute('COMMIT')
+                    return row[0], False
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE flights SET status = 'failed', error = 'leader timed out', updated_at = ? "
+                        "WHERE id = ?", (now, row[0])
+                    )
+                self._conn.execute(
+                    "DELETE FROM flights WHERE status != 'running' AND updated_at < ?", (now - KEEP_SECONDS,)
+                )
+                flight_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO flights (id, key, model, status, updated_at) VALUES (?, ?, ?, 'running', ?)",
+                    (flight_id, key, model, now)
+                )
+                self._count(model, misses=1)
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return flight_id, True
+
+    def _touch(self, flight_id):
+        with self._lock:
+            self._conn.execute('UPDATE flights SET updated_at = ? WHERE id = ?', (time.time(), flight_id))
+
+    def _finish(self, flight_id, value=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE flights SET status = ?, value = ?, error = ?, updated_at = ? WHERE id = ?',
+                ('failed' if error else 'done', json.dumps(value) if value is not None else None, error,
+                 time.time(), flight_id)
+            )
+
+    def _wait(self, flight_id):
+        """Poll a flight until it ends; return its value, or None if the caller should try again."""
+        while True:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT model, status, value, updated_at FROM flights WHERE id = ?', (flight_id,)
+                ).fetchone()
+            if row is None:
+                return None
+            model, status, value, updated_at = row
+            if status == 'done':
+                value = json.loads(value)
+                with self._lock:
+                    self._count(model, hits=1, tokens_saved=int(value.get('tokens', 0)))
+                return value
+            if status == 'failed' or time.time() - updated_at > LEADER_TIMEOUT:
+                return None
+            time.sleep(POLL_SECONDS)
+
+    def do(self, key, model, fn, encode, decode):
+        """
+        Return ``(result, shared)``: ``fn()``'s result, or that of an identical call in flight.
+
+        ``encode(result)`` turns the leader's result into a JSON-ready dict,
+        with the tokens it used under 'tokens'; followers get
+        ``decode(value)`` and ``shared`` is True.
+        """
+        if not ENABLED:
+            return fn(), False
+        while True:
+            flight_id, leader = self._join(key, model)
+            if leader:
+                try:
+                    result = fn()
+                except BaseException as e:
+                    self._finish(flight_id, error=f'{type(e).__name__}: {e}')
+                    raise
+                self._finish(flight_id, value=encode(result))
+                return result, False
+            value = self._wait(flight_id)
+            if value is not None:
+                return decode(value), True
+
+    def stream(self, key, model, open_stream, encode, decode):
+        """
+        Like ``do`` for a stream: the leader yields ``open_stream()``'s items as they arrive.
+
+        ``encode(items)`` stores the whole stream; followers yield the
+        items of ``decode(value)``.
+        """
+        if not ENABLED:
+            yield from open_stream()
+            return
+        while True:
+            flight_id, leader = self._join(key, model)
+            if leader:
+                items = []
+                touched = time.monotonic()
+                try:
+                    for item in open_stream():
+                        items.append(item)
+                        yield item
+                        if time.monotonic() - touched > TOUCH_SECONDS:
+                            self._touch(flight_id)
+                            touched = time.monotonic()
+                except BaseException as e:
+                    # Also reached when the consumer stops reading, so followers do not wait on it
+                    self._finish(flight_id, error=f'{type(e).__name__}: {e}')
+                    raise
+                self._finish(flight_id, value=encode(items))
+                return
+            value = self._wait(flight_id)
+            if value is not None:
+                yield from decode(value)
+                return
+
+    def stats(self):
+        """Hits, misses and tokens saved per model."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT model, hits, misses, tokens_saved FROM flight_stats ORDER BY model'
+            ).fetchall()
+        return {model: {'hits': hits, 'misses': misses, 'tokens_saved': saved} for model, hits, misses, saved in rows}
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    """Return this process's handle on the shared flight table, opening it on first use."""
+    global _single_flight
+    with _single_flight_lock:
+        if _single_flight is None:
+            _single_flight = SingleFlight()
+        return _single_flight
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show how many Gemini calls were coalesced.")
+    parser.add_argument('--json', action='store_true', help="Print the counters as JSON")
+    args = parser.parse_args(argv)
+
+    stats = get_single_flight().stats()
+    if args.json:
+        print(json.dumps(stats, indent=2))
+        return 0
+    print(f"{'Model':<24} {'Hits':>8} {'Misses':>8} {'Hit rate':>9} {'Tokens saved':>13}")
+    for model, counts in stats.items():
+        calls = counts['hits'] + counts['misses']
+        rate = counts['hits'] / calls if calls else 0.0
+        print(f"{model:<24} {counts['hits']:>8} {counts['misses']:>8} {rate:>9.1%} {counts['tokens_saved']:>13}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,104 @@
+"""
+Disk-backed cache for crew stage outputs.
+
+Entries live in a small SQLite file so they survive Streamlit reruns and
+server restarts. Entries older than the TTL are dropped, and the least
+recently used ones are evicted once the cache grows past its size limit.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv('BLOG_CACHE_DIR', Path(__file__).parent / '.cache'))
+MAX_ENTRIES = int(os.getenv('BLOG_CACHE_MAX_ENTRIES', '512'))
+TTL_SECONDS = float(os.getenv('BLOG_CACHE_TTL_HOURS', '168')) * 3600
+
+
+class StageCache:
+    def __init__(self, path=None, max_entries=MAX_ENTRIES, ttl_seconds=TTL_SECONDS):
+        self.path = Path(path) if path else CACHE_DIR / 'stage_cache.sqlite3'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS stage_outputs (
+                key TEXT PRIMARY KEY,
+                stage TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_stage_outputs_accessed ON stage_outputs (accessed_at)')
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(stage, fields):
+        """Build a stable key from a stage name and the inputs it depends on."""
+        payload = json.dumps({'stage': stage, 'fields': fields}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached value for key, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM stage_outputs WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute('DELETE FROM stage_outputs WHERE key = ?', (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute('UPDATE stage_outputs SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+        return value
+
+    def set(self, key, stage, value):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO stage_outputs (key, stage, value, created_at, accessed_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, stage, str(value), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        if self.ttl_seconds:
+            self._conn.execute('DELETE FROM stage_outputs WHERE created_at < ?', (now - self.ttl_seconds,))
+        count = self._conn.execute('SELECT COUNT(*) FROM stage_outputs').fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                'DELETE FROM stage_outputs WHERE key IN '
+                '(SELECT key FROM stage_outputs ORDER BY accessed_at ASC LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM stage_outputs')
+            self._conn.commit()
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_stage_cache():
+    """Return the process-wide stage cache, creating it on first use."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = StageCache()
+        return _default_cache
@@ -0,0 +1,343 @@
+"""
+Tracing spans for generation and document runs.
+
+A run ("Generate Blog", "Process PDF", one batch row) gets a run id, and
+every span opened while it is active (crew tasks, model calls, text
+extraction, decoding, export) is recorded under it with its parent, its
+duration and, for model calls, token counts and estimated cost. The
+current run and span live in context variables; use ``wrap`` to carry
+them into worker threads.
+
+Spans opened outside a run are not recorded, so library code (text
+extraction, model calls) costs next to nothing when it is used on its own,
+e.g. in the benchmarks.
+
+Finished spans go to a JSONL file (``TRACE_FILE``, default
+``.cache/traces.jsonl``, rotated at ``TRACE_MAX_MB``) and, when
+``OTEL_EXPORTER_OTLP_ENDPOINT`` is set, to an OpenTelemetry collector over
+OTLP/HTTP JSON, with the run id as the trace id. Set ``TRACE_ENABLED=0`` to
+turn tracing off.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from stage_cache import CACHE_DIR
+
+TRACE_ENABLED = os.getenv('TRACE_ENABLED', '1') != '0'
+TRACE_FILE = os.getenv('TRACE_FILE', str(CACHE_DIR / 'traces.jsonl'))
+TRACE_MAX_BYTES = int(float(os.getenv('TRACE_MAX_MB', '50')) * 1024 * 1024)
+OTLP_ENDPOINT = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT', '').rstrip('/')
+SERVICE_NAME = os.getenv('OTEL_SERVICE_NAME', 'ai-content-tools')
+
+# USD per million (prompt, response) tokens
+MODEL_PRICES = {
+    'gemini-2.0-flash': (0.10, 0.40),
+    'gemini-1.5-flash': (0.075, 0.30),
+    'gemini-1.5-pro': (1.25, 5.00),
+}
+
+_current_run = contextvars.ContextVar('trace_run', default=None)
+_current_span = contextvars.ContextVar('trace_span', default=None)
+
+
+def estimate_cost(model, prompt_tokens, response_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    return (prompt_tokens * prices[0] + response_tokens * prices[1]) / 1e6
+
+
+class Run:
+    def __init__(self, name):
+        self.name = name
+        self.run_id = uuid.uuid4().hex
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.cost_usd = 0.0
+        self._lock = threading.Lock()
+
+    def add_tokens(self, prompt_tokens, response_tokens, cost):
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.response_tokens += response_tokens
+            self.cost_usd += cost or 0.0
+
+
+class Span:
+    def __init__(self, name, run, parent, attributes):
+        self.name = name
+        self.run = run
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = dict(attributes)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_tokens(self, model, prompt_tokens, response_tokens):
+        """Attach token counts and estimated cost, and add them to the run's totals."""
+        cost = estimate_cost(model, prompt_tokens, response_tokens)
+        self.set(model=model, prompt_tokens=prompt_tokens, response_tokens=response_tokens, cost_usd=cost)
+        self.run.add_tokens(prompt_tokens, response_tokens, cost)
+
+    def to_dict(self):
+        return {
+            'run_id': self.run.run_id,
+            'run': self.run.name,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start_ns / 1e9,
+            'duration_ms': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'status': 'error' if self.error else 'ok',
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span opened outside a run; what is set on it is dropped."""
+
+    def __init__(self):
+        self.start_ns = time.time_ns()
+
+    def set(self, **attributes):
+        pass
+
+    def record_tokens(self, model, prompt_tokens, response_tokens):
+        pass
+
+
+class JsonlSink:
+    """
+    Append spans to a JSONL file, buffered in memory.
+
+    The buffer is written in one append when a run's root span ends, when
+    it passes ``FLUSH_BYTES`` and at exit, so lines from several processes
+    do not interleave. Past ``max_bytes`` the file is moved to
+    ``<path>.1`` (replacing the previous one) and a new file is started.
+    """
+
+    FLUSH_BYTES = 64 * 1024
+
+    def __init__(self, path=TRACE_FILE, max_bytes=TRACE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._fd = None
+        self._pending = []
+        self._pending_bytes = 0
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def export(self, span):
+        line = (json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n').encode('utf-8')
+        with self._lock:
+            self._pending.append(line)
+            self._pending_bytes += len(line)
+            if span.parent_id is None or self._pending_bytes >= self.FLUSH_BYTES:
+                self._flush()
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self._fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _flush(self):
+        if self._fd is not None:
+            try:
+                rotated = os.stat(self.path).st_ino != os.fstat(self._fd).st_ino
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                # Another process rotated the file
+                os.close(self._fd)
+                self._fd = None
+        if self._fd is None:
+            self._open()
+        if self._pending:
+            os.write(self._fd, b''.join(self._pending))
+            self._pending = []
+            self._pending_bytes = 0
+        if os.fstat(self._fd).st_size > self.max_bytes:
+            os.close(self._fd)
+            os.replace(self.path, f'{self.path}.1')
+            self._open()
+
+    def close(self):
+        with self._lock:
+            if self._pending:
+                self._flush()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class OtlpSink:
+    """
+    Send spans to an OpenTelemetry collector as OTLP/HTTP JSON.
+
+    Spans are buffered per run and posted from a background thread when
+    the run's root span ends, so exporting never blocks the page.
+    """
+
+    def __init__(self, endpoint=OTLP_ENDPOINT, service_name=SERVICE_NAME):
+        self.url = f'{endpoint}/v1/traces'
+        self.service_name = service_name
+        self._buffers = {}
+        self._flushed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def export(self, span):
+        with self._lock:
+            if span.run.run_id in self._flushed:
+                # Background work (e.g. content checks) can outlive its run's root span
+                spans = [span]
+            else:
+                self._buffers.setdefault(span.run.run_id, []).append(span)
+                if span.parent_id is not None:
+                    return
+                spans = self._buffers.pop(span.run.run_id)
+                self._flushed[span.run.run_id] = True
+                while len(self._flushed) > 1024:
+                    self._flushed.popitem(last=False)
+        threading.Thread(target=self._post, args=(spans,), daemon=True).start()
+
+    def _post(self, spans):
+        import requests
+
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [
+                {'key': 'service.name', 'value': {'stringValue': self.service_name}},
+            ]},
+            'scopeSpans': [{
+                'scope': {'name': 'tracing'},
+                'spans': [self._otlp_span(span) for span in spans],
+            }],
+        }]}
+        try:
+            requests.post(self.url, json=payload, timeout=5)
+        except Exception as e:
+            print(f"Trace export failed: {str(e)}")
+
+    @staticmethod
+    def _otlp_span(span):
+        attributes = [{'key': 'run.name', 'value': {'stringValue': span.run.name}}]
+        attributes += [
+            {'key': key, 'value': _otlp_value(value)}
+            for key, value in span.attributes.items() if value is not None
+        ]
+        otlp = {
+            'traceId': span.run.run_id,
+            'spanId': span.span_id,
+            'name': span.name,
+            'kind': 1,
+            'startTimeUnixNano': str(span.start_ns),
+            'endTimeUnixNano': str(span.end_ns),
+            'attributes': attributes,
+            'status': {'code': 2, 'message': span.error} if span.error else {'code': 1},
+        }
+        if span.parent_id:
+            otlp['parentSpanId'] = span.parent_id
+        return otlp
+
+
+_sinks = []
+if TRACE_ENABLED:
+    _sinks.append(JsonlSink())
+    if OTLP_ENDPOINT:
+        _sinks.append(OtlpSink())
+
+
+def add_sink(sink):
+    """Register another exporter; it needs an ``export(span)`` method."""
+    _sinks.append(sink)
+
+
+def _export(span):
+    for sink in _sinks:
+        try:
+            sink.export(span)
+        except Exception as e:
+            print(f"Trace sink {type(sink).__name__} failed: {str(e)}")
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Record the with-block as a span of the current run.
+
+    Yields the span, so callers can add attributes or token counts as they
+    learn them. Outside a run, or with tracing off, nothing is recorded.
+    """
+    run = _current_run.get()
+    if run is None or not TRACE_ENABLED:
+        yield _NoopSpan()
+        return
+
+    current = Span(name, run, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        _export(current)
+
+
+@contextmanager
+def start_run(name, **attributes):
+    """Start a run with a fresh run id; yields its root span."""
+    run = Run(name)
+    run_token = _current_run.set(run)
+    root = Span(name, run, None, attributes)
+    span_token = _current_span.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.error = f'{type(e).__name__}: {e}'
+        raise
+    finally:
+        _current_span.reset(span_token)
+        _current_run.reset(run_token)
+        root.end_ns = time.time_ns()
+        root.set(
+            total_prompt_tokens=run.prompt_tokens,
+            total_response_tokens=run.response_tokens,
+            total_cost_usd=round(run.cost_usd, 6),
+        )
+        if TRACE_ENABLED:
+            _export(root)
+
+
+def current_run_id():
+    run = _current_run.get()
+    return run.run_id if run else None
+
+
+def wrap(fn):
+    """Bind ``fn`` to the current run and span, for submitting to a thread pool."""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)